@@ -0,0 +1,249 @@
+# Planning many walls at once, eg every wall segment on a site. The walls are read from a job file
+# and planned in parallel worker processes, and each wall's plan is written to its own file.
+#
+#   python batch.py jobs.json --output-dir plans --planner optimal --time-budget 300
+#
+# where jobs.json looks like
+#
+#   {"walls": [
+#       {"name": "north", "bond": "stretcher", "width": 10.5, "num_courses": 32},
+#       {"name": "gable", "bond": "flemish", "width": 5.75, "num_courses": 20, "stride_height": 700, "stride_width": 430}
+#   ]}
+#
+# The CPUs are split evenly between the workers, and the time budget is for the whole batch: each
+# solver run gets an even share of what's left when it starts, so walls that finish early leave more
+# time for the rest. Walls with identical specs (other than the name) are only planned once. A wall
+# that can't be planned gets {"wall": ..., "error": "..."} written instead of its plan, and doesn't
+# stop the others.
+
+import argparse
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, replace
+from datetime import timedelta
+import json
+from math import ceil
+import os
+import sys
+import time
+import typing as ty
+
+from bonds import cross_bond, flemish_bond, native_wild_bond, stretcher_bond, wild_bond
+from brickifier import brickify_table
+from dependency_graph import brick_list_to_placeable_brick_list
+from placer import available_cpus, greedy_placement_order, optimal_placement_order, portfolio_placement_order, stride_count_lower_bound
+from solver_cache import SolverCache
+
+_BONDS: ty.Final = ('stretcher', 'flemish', 'cross', 'wild')
+_WILD_GENERATORS: ty.Final = ('solver', 'native')
+_PLANNERS: ty.Final = ('greedy', 'optimal', 'portfolio')
+
+@dataclass(frozen=True)
+class WallSpec:
+    """One wall of a job file. The fields other than `name` are what the plan depends on."""
+    name: str
+    bond: str
+    width: float
+    num_courses: int
+    stride_height: float = 1300.0
+    stride_width: int = 800
+    # for the wild bond: "solver" or "native", like --wild-generator in main.py
+    wild_generator: str = 'solver'
+    seed: int | None = None
+
+    def plan_key(self) -> tuple[ty.Any, ...]:
+        return (self.bond, self.width, self.num_courses, self.stride_height, self.stride_width, self.wild_generator, self.seed)
+
+def check_job(walls: list[WallSpec], planner: str) -> None:
+    """Raise ValueError listing everything wrong with the job that can be found without planning it"""
+    problems = []
+    if planner not in _PLANNERS:
+        problems.append(f"unknown planner {planner}")
+    names = [wall.name for wall in walls]
+    if len(set(names)) != len(names):
+        problems.append("every wall needs a different name, since it's the name of its plan file")
+    for wall in walls:
+        if wall.bond not in _BONDS:
+            problems.append(f"unknown bond {wall.bond} for wall {wall.name}")
+        if wall.wild_generator not in _WILD_GENERATORS:
+            problems.append(f"unknown wild generator {wall.wild_generator} for wall {wall.name}")
+    if len(problems) > 0:
+        raise ValueError(f"Can't plan the job: {'; '.join(problems)}")
+
+def read_job_file(path: str, planner: str = 'optimal') -> list[WallSpec]:
+    """The walls of a job file, checked with `check_job` for planning with the `planner`"""
+    with open(path) as job_file:
+        job = json.load(job_file)
+    walls = [WallSpec(**wall) for wall in job['walls']]
+    check_job(walls, planner)
+    return walls
+
+@dataclass
+class WallPlan:
+    """What gets written for each wall: the strides are brick ids, ie indices into `brickify_table`"""
+    wall: WallSpec
+    strides: list[list[int]]
+    lower_bound: int
+    # seconds spent planning, including building the bond and the dependency graph
+    seconds: float
+
+    @property
+    def num_strides(self) -> int:
+        return len(self.strides)
+
+@dataclass
+class WallFailure:
+    """What gets written instead of a plan for a wall that couldn't be planned"""
+    wall: WallSpec
+    error: str
+
+def plan_wall(
+        wall: WallSpec,
+        planner: str,
+        time_limit: timedelta,
+        processes: int,
+        cache: SolverCache | None,
+) -> WallPlan:
+    """
+    Plan one wall, in one of `run_batch`'s worker processes or in the planning service (service.py).
+    The `time_limit` is for all the solvers together, ie the wild bond's as well as the strides'.
+    """
+    start_time = time.monotonic()
+    bond_fns = {
+        'stretcher': stretcher_bond,
+        'flemish': flemish_bond,
+        'cross': cross_bond,
+        'wild': (lambda num_rows, width: native_wild_bond(num_rows, width, seed=wall.seed)) if wall.wild_generator == 'native' else (lambda num_rows, width: wild_bond(num_rows, width, cache=cache, processes=processes, time_limit=time_limit)),
+    }
+    if wall.bond not in bond_fns:
+        raise ValueError(f"Unknown bond {wall.bond} for wall {wall.name}")
+    table = brickify_table(bond_fns[wall.bond](wall.num_courses, wall.width), wall.width)
+    placeable_bricks = brick_list_to_placeable_brick_list(wall.stride_height, wall.stride_width, table)
+    # whatever the bond's solver didn't use, but the stride solver still needs a moment to return the
+    # warm start
+    time_limit = max(timedelta(seconds=1), time_limit - timedelta(seconds=time.monotonic() - start_time))
+
+    placement_order = greedy_placement_order(placeable_bricks, wall.stride_height, wall.stride_width)
+    lower_bound = stride_count_lower_bound(placeable_bricks, wall.stride_height, wall.stride_width)
+    if planner == 'optimal':
+        plan = optimal_placement_order(
+            placeable_bricks, time_limit, warm_start=placement_order, stride_height=wall.stride_height, stride_width=wall.stride_width, processes=processes, cache=cache,
+        )
+        placement_order, lower_bound = plan.placement_order, plan.lower_bound
+    elif planner == 'portfolio':
+        plan = portfolio_placement_order(
+            placeable_bricks, time_limit, warm_start=placement_order, stride_height=wall.stride_height, stride_width=wall.stride_width, processes=processes, cache=cache,
+        )
+        placement_order, lower_bound = plan.placement_order, plan.lower_bound
+    elif planner != 'greedy':
+        raise ValueError(f"Unknown planner {planner}")
+    strides = [[placeable_brick.brick_id for placeable_brick in stride] for stride in placement_order]
+    return WallPlan(wall, strides, lower_bound, time.monotonic() - start_time)
+
+def solver_time_limit(remaining_seconds: float, remaining_runs: int, workers: int) -> timedelta:
+    """
+    A fair share of the remaining time budget for the next solver run: the runs still to go take
+    this many rounds of `workers` runs at once, and each round gets an equal share.
+    """
+    rounds = max(1, ceil(remaining_runs / workers))
+    return timedelta(seconds=max(1.0, remaining_seconds / rounds))
+
+def run_batch(
+        walls: list[WallSpec],
+        output_dir: str,
+        planner: str = 'optimal',
+        time_budget: timedelta = timedelta(minutes=5),
+        max_workers: int | None = None,
+        cache: SolverCache | None = None,
+) -> dict[str, WallPlan | WallFailure]:
+    """
+    Plan all the `walls` and write each one's plan to `output_dir`/<name>.json. Returns the plans by
+    wall name, with a `WallFailure` for each wall that couldn't be planned. Raises ValueError
+    before planning anything if `check_job` finds something wrong with the job.
+    """
+    check_job(walls, planner)
+    # walls that would get the same plan are planned once, by the first of them
+    first_walls: dict[tuple[ty.Any, ...], WallSpec] = {}
+    for wall in walls:
+        first_walls.setdefault(wall.plan_key(), wall)
+    unique_walls = list(first_walls.values())
+
+    num_cpus = available_cpus()
+    if max_workers is None:
+        max_workers = min(len(unique_walls), num_cpus)
+    max_workers = max(1, max_workers)
+    # split the CPUs between the workers rather than letting every solver use all of them
+    processes_per_worker = max(1, num_cpus // max_workers)
+    deadline = time.monotonic() + time_budget.total_seconds()
+
+    print(f"Planning {len(unique_walls)} distinct walls out of {len(walls)} with {max_workers} workers...")
+    plans: dict[tuple[ty.Any, ...], WallPlan] = {}
+    errors: dict[tuple[ty.Any, ...], str] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending: dict[Future[WallPlan], WallSpec] = {}
+        to_submit = list(unique_walls)
+
+        def submit_next() -> None:
+            wall = to_submit.pop(0)
+            # the runs still to go include this one and the ones already running
+            time_limit = solver_time_limit(deadline - time.monotonic(), len(to_submit) + 1 + len(pending), max_workers)
+            pending[executor.submit(plan_wall, wall, planner, time_limit, processes_per_worker, cache)] = wall
+
+        while len(to_submit) > 0 and len(pending) < max_workers:
+            submit_next()
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                wall = pending.pop(future)
+                try:
+                    plan = future.result()
+                # eg a width the bond doesn't allow, or a wild bond the solver can't find in time
+                except Exception as e:
+                    errors[wall.plan_key()] = f"{type(e).__name__}: {e}"
+                    print(f"{wall.name}: couldn't be planned, {errors[wall.plan_key()]}")
+                    continue
+                plans[wall.plan_key()] = plan
+                print(f"{wall.name}: {plan.num_strides} strides (lower bound {plan.lower_bound}) in {plan.seconds:.2f} seconds")
+            while len(to_submit) > 0 and len(pending) < max_workers:
+                submit_next()
+
+    os.makedirs(output_dir, exist_ok=True)
+    results: dict[str, WallPlan | WallFailure] = {}
+    for wall in walls:
+        with open(os.path.join(output_dir, f"{wall.name}.json"), 'w') as plan_file:
+            if wall.plan_key() in errors:
+                results[wall.name] = WallFailure(wall, errors[wall.plan_key()])
+                json.dump(asdict(results[wall.name]), plan_file)
+            else:
+                plan = replace(plans[wall.plan_key()], wall=wall)
+                json.dump({**asdict(plan), 'num_strides': plan.num_strides}, plan_file)
+                results[wall.name] = plan
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plan every wall in a job file.")
+    parser.add_argument('job_file', type=str, help='JSON file listing the walls, see the top of batch.py.')
+    parser.add_argument('--output-dir', type=str, default='plans', help='Directory to write a <wall name>.json plan to for each wall.')
+    parser.add_argument('--planner', type=str, default='optimal', choices=_PLANNERS, help='How to split the bricks into strides, like in main.py.')
+    parser.add_argument('--time-budget', type=int, default=300, help='Time limit in seconds for the solvers of the whole batch.')
+    parser.add_argument('--workers', type=int, help='Number of walls to plan at once. Defaults to the number of CPUs.')
+    parser.add_argument('--solver-cache', type=str, default='use', choices=['use', 'refresh', 'bypass'], help='Whether to reuse solver results from previous identical runs.')
+    parser.add_argument('--cache-dir', type=str, help='Directory for the solver cache. Defaults to ~/.cache/monumental-take-home-test')
+    args = parser.parse_args()
+
+    try:
+        walls = read_job_file(args.job_file, args.planner)
+    except ValueError as e:
+        parser.error(str(e))
+    cache = SolverCache(args.cache_dir, mode=args.solver_cache)
+    start_time = time.monotonic()
+    results = run_batch(walls, args.output_dir, planner=args.planner, time_budget=timedelta(seconds=args.time_budget), max_workers=args.workers, cache=cache)
+    plans = [plan for plan in results.values() if isinstance(plan, WallPlan)]
+    total_strides = sum(plan.num_strides for plan in plans)
+    print(f"Planned {len(plans)} walls with {total_strides} strides in total in {time.monotonic() - start_time:.2f} seconds, plans are in {args.output_dir}")
+    if len(plans) < len(results):
+        print(f"{len(results) - len(plans)} walls couldn't be planned: {', '.join(name for name, plan in results.items() if isinstance(plan, WallFailure))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
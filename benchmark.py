@@ -0,0 +1,297 @@
+# Benchmarks for each stage of the pipeline in main.py, over a sweep of walls. Every stage is timed
+# separately and its peak Python memory recorded, along with how good the plan is, and the results
+# are compared against a committed baseline so that getting slower, hungrier or worse at planning
+# shows up as a failure rather than going unnoticed.
+#
+#   python benchmark.py                     # run the sweep and compare against the baseline
+#   python benchmark.py --update-baseline   # run the sweep and make it the new baseline
+#   python benchmark.py --planner optimal   # include the solver (needs minizinc)
+#
+# Every stage is timed a few times over and the quickest run kept, so that a stray hiccup on the
+# machine doesn't show up as a regression. Memory is measured with tracemalloc in a separate run,
+# since it slows down allocation-heavy stages enough to throw the timings off. Solvers run in their
+# own processes, so their memory isn't counted.
+
+import argparse
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+import io
+import json
+import sys
+import time
+import tracemalloc
+import typing as ty
+
+from bonds import cross_bond, flemish_bond, native_wild_bond, stretcher_bond, wild_bond
+from brickifier import brickify_table
+from decomposition import decomposed_placement_order
+from dependency_graph import PlaceableBrickList, brick_list_to_placeable_brick_list
+from placer import (
+    PlacementOrder, PlacementPlan, _order_strides, apply_placement_order, greedy_placement_order,
+    optimal_placement_order, portfolio_placement_order, stride_count_lower_bound,
+)
+from printer import print_bricks
+
+_DEFAULT_BASELINE: ty.Final = 'benchmark_baseline.json'
+# A stage has regressed if it takes this much longer than the baseline (as a fraction), and by at
+# least the absolute amount, so that noise in stages that take a few milliseconds doesn't count.
+_TIME_TOLERANCE: ty.Final = 0.5
+_MIN_SECONDS_REGRESSION: ty.Final = 0.05
+_MEMORY_TOLERANCE: ty.Final = 0.25
+_MIN_BYTES_REGRESSION: ty.Final = 1024 * 1024
+
+# widths that suit each bond, see the defaults in main.py: a small wall and one around the 2300mm of
+# the original problem
+_WIDTHS: ty.Final = {
+    'stretcher': (5.0, 10.5),
+    'flemish': (5.75, 10.25),
+    'cross': (5.5, 10.5),
+    'wild': (5.0, 10.25),
+}
+_NUM_COURSES: ty.Final = (10, 32, 100)
+_STRIDE_SIZES: ty.Final = ((1300.0, 800), (700.0, 430))
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    bond: str
+    width: float
+    num_courses: int
+    stride_height: float
+    stride_width: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.bond} {self.width:g}x{self.num_courses} stride {self.stride_height:g}x{self.stride_width}"
+
+def default_cases(quick: bool = False) -> list[BenchmarkCase]:
+    """The full sweep, or with `quick` just the smallest wall of each bond"""
+    return [
+        BenchmarkCase(bond, width, num_courses, stride_height, stride_width)
+        for bond, widths in _WIDTHS.items()
+        for width in widths[:1 if quick else None]
+        for num_courses in _NUM_COURSES[:1 if quick else None]
+        for stride_height, stride_width in _STRIDE_SIZES[:1 if quick else None]
+    ]
+
+@dataclass
+class StageResult:
+    seconds: float
+    peak_bytes: int
+
+@dataclass
+class CaseResult:
+    name: str
+    num_bricks: int = 0
+    num_strides: int = 0
+    lower_bound: int = 0
+    # whether the plan was proven to need no fewer strides
+    proven_optimal: bool = False
+    # for the solver planners, the solver configuration that won a portfolio race and how the
+    # solver finished (the name of its minizinc status)
+    solver: str | None = None
+    status: str | None = None
+    # stage name -> result, in the order the stages ran
+    stages: dict[str, StageResult] = field(default_factory=dict)
+
+_T = ty.TypeVar('_T')
+# runs one stage of the pipeline given its name, returning what the stage returns
+_StageRunner = ty.Callable[[str, ty.Callable[[], ty.Any]], ty.Any]
+# how the solver finished when it came up with a plan at least as good as the warm start
+_SOLVED_STATUSES: ty.Final = ('OPTIMAL_SOLUTION', 'SATISFIED', 'UNSATISFIABLE')
+
+def _quietly(fn: ty.Callable[[], _T]) -> _T:
+    # anything the stage prints (eg solver progress) would drown out the benchmark's own output
+    with redirect_stdout(io.StringIO()):
+        return fn()
+
+def _timed_stages(seconds: dict[str, float]) -> _StageRunner:
+    """Run stages keeping each one's quickest time in `seconds`"""
+    def run_stage(stage: str, fn: ty.Callable[[], _T]) -> _T:
+        start_time = time.perf_counter()
+        value = _quietly(fn)
+        elapsed = time.perf_counter() - start_time
+        seconds[stage] = min(elapsed, seconds.get(stage, elapsed))
+        return value
+    return run_stage
+
+def _traced_stages(peak_bytes: dict[str, int]) -> _StageRunner:
+    """Run stages recording in `peak_bytes` how much memory each one allocated at its peak. tracemalloc must be tracing."""
+    def run_stage(stage: str, fn: ty.Callable[[], _T]) -> _T:
+        tracemalloc.reset_peak()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        value = _quietly(fn)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        peak_bytes[stage] = peak_memory - start_memory
+        return value
+    return run_stage
+
+def _run_pipeline(
+        case: BenchmarkCase,
+        bond_fn: ty.Callable[[int, float], list[list[float]]],
+        solve: ty.Callable[[PlaceableBrickList, PlacementOrder], PlacementPlan] | None,
+        run_stage: _StageRunner,
+) -> tuple[int, PlacementPlan]:
+    """One pass over the pipeline, returning how many bricks the wall has and its plan"""
+    bond = run_stage('bond', lambda: bond_fn(case.num_courses, case.width))
+    table = run_stage('brickify', lambda: brickify_table(bond, case.width))
+    placeable_bricks = run_stage('dependency_graph', lambda: brick_list_to_placeable_brick_list(case.stride_height, case.stride_width, table))
+
+    placement_order: PlacementOrder = run_stage('greedy', lambda: greedy_placement_order(placeable_bricks, case.stride_height, case.stride_width))
+    plan = PlacementPlan(placement_order, stride_count_lower_bound(placeable_bricks, case.stride_height, case.stride_width))
+    if solve is not None:
+        plan = solve(placeable_bricks, placement_order)
+
+    # the planners already order the bricks within each stride, this times doing it again by itself
+    placement_order = run_stage('topo_sort', lambda: _order_strides(set(stride) for stride in plan.placement_order))
+    for _ in apply_placement_order(placement_order):
+        pass
+    run_stage('print', lambda: print_bricks(placeable_bricks))
+    return len(placeable_bricks), plan
+
+def run_case(
+        case: BenchmarkCase,
+        planner: str = 'greedy',
+        time_limit: timedelta = timedelta(seconds=20),
+        wild_generator: str = 'native',
+        repeats: int = 3,
+) -> CaseResult:
+    """
+    Run the pipeline on one wall. The planner is one of "greedy", "optimal", "portfolio" or
+    "decomposed"; the solver planners are warm started with the greedy plan like in main.py.
+
+    Each stage's time is the quickest of `repeats` passes, and its memory is measured in another
+    pass of its own, since tracemalloc slows down allocating so much that it would swamp the
+    timings. The solver only runs in the first pass, and the later passes reuse its plan.
+    """
+    bond_fns: dict[str, ty.Callable[[int, float], list[list[float]]]] = {
+        'stretcher': stretcher_bond,
+        'flemish': flemish_bond,
+        'cross': cross_bond,
+        'wild': (lambda num_rows, width: native_wild_bond(num_rows, width, seed=0)) if wild_generator == 'native' else wild_bond,
+    }
+    planners: dict[str, ty.Callable[[PlaceableBrickList, PlacementOrder], PlacementPlan]] = {
+        'optimal': lambda placeable_bricks, warm_start: optimal_placement_order(placeable_bricks, time_limit, warm_start=warm_start, stride_height=case.stride_height, stride_width=case.stride_width),
+        'portfolio': lambda placeable_bricks, warm_start: portfolio_placement_order(placeable_bricks, time_limit, warm_start=warm_start, stride_height=case.stride_height, stride_width=case.stride_width),
+        'decomposed': lambda placeable_bricks, warm_start: decomposed_placement_order(placeable_bricks, time_limit, stride_height=case.stride_height, stride_width=case.stride_width),
+    }
+    if planner != 'greedy' and planner not in planners:
+        raise ValueError(f"Unknown planner {planner}")
+
+    seconds: dict[str, float] = {}
+    solved: list[PlacementPlan] = []
+
+    def solve(placeable_bricks: PlaceableBrickList, warm_start: PlacementOrder) -> PlacementPlan:
+        if len(solved) == 0:
+            solved.append(_timed_stages(seconds)('solve', lambda: planners[planner](placeable_bricks, warm_start)))
+            return solved[0]
+        # the same plan, in terms of this pass's bricks
+        plan = solved[0]
+        placement_order = [[placeable_bricks[placeable_brick.brick_id] for placeable_brick in stride] for stride in plan.placement_order]
+        return PlacementPlan(placement_order, plan.lower_bound, plan.solver, plan.status)
+
+    for _ in range(max(repeats, 1)):
+        num_bricks, plan = _run_pipeline(case, bond_fns[case.bond], None if planner == 'greedy' else solve, _timed_stages(seconds))
+
+    peak_bytes: dict[str, int] = {}
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        _run_pipeline(case, bond_fns[case.bond], None if planner == 'greedy' else solve, _traced_stages(peak_bytes))
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    return CaseResult(
+        case.name,
+        num_bricks=num_bricks,
+        num_strides=plan.num_strides,
+        lower_bound=plan.lower_bound,
+        proven_optimal=plan.num_strides <= plan.lower_bound,
+        solver=plan.solver,
+        status=plan.status,
+        # the solver runs in its own processes, so its memory isn't counted anyway
+        stages={stage: StageResult(round(stage_seconds, 4), peak_bytes.get(stage, 0)) for stage, stage_seconds in seconds.items()},
+    )
+
+def compare(results: list[CaseResult], baseline: dict[str, ty.Any]) -> list[str]:
+    """
+    Everything that got worse compared to the `baseline` (as written by `write_results`): stages
+    that got slower or use more memory, plans with more strides, and plans that were proven optimal
+    or found by the solver but aren't any more. Cases that aren't in the baseline are skipped.
+    """
+    baseline_cases = {case['name']: case for case in baseline['cases']}
+    regressions: list[str] = []
+    for result in results:
+        base = baseline_cases.get(result.name)
+        if base is None:
+            continue
+        if result.num_strides > base['num_strides']:
+            regressions.append(f"{result.name}: {result.num_strides} strides, was {base['num_strides']}")
+        if base.get('proven_optimal', False) and not result.proven_optimal:
+            regressions.append(f"{result.name}: no longer proven optimal")
+        # eg the solver ran out of time and fell back on the warm start. A plan that's proven
+        # optimal is as good as it gets, however the solver got there.
+        if base.get('status') in _SOLVED_STATUSES and result.status not in _SOLVED_STATUSES and not result.proven_optimal:
+            regressions.append(f"{result.name}: the solver finished with {result.status}, was {base['status']}")
+        for stage, stage_result in result.stages.items():
+            base_stage = base['stages'].get(stage)
+            if base_stage is None:
+                continue
+            if stage_result.seconds > base_stage['seconds'] * (1 + _TIME_TOLERANCE) and stage_result.seconds - base_stage['seconds'] > _MIN_SECONDS_REGRESSION:
+                regressions.append(f"{result.name}: {stage} took {stage_result.seconds:.3f}s, was {base_stage['seconds']:.3f}s")
+            if stage_result.peak_bytes > base_stage['peak_bytes'] * (1 + _MEMORY_TOLERANCE) and stage_result.peak_bytes - base_stage['peak_bytes'] > _MIN_BYTES_REGRESSION:
+                regressions.append(f"{result.name}: {stage} peaked at {stage_result.peak_bytes / 1e6:.1f}MB, was {base_stage['peak_bytes'] / 1e6:.1f}MB")
+    return regressions
+
+def write_results(results: list[CaseResult], path: str, planner: str) -> None:
+    with open(path, 'w') as results_file:
+        json.dump({'planner': planner, 'cases': [asdict(result) for result in results]}, results_file, indent=1)
+        results_file.write('\n')
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the brick placement pipeline.")
+    parser.add_argument('--planner', type=str, default='greedy', choices=['greedy', 'optimal', 'portfolio', 'decomposed'], help='Planner to benchmark. The solver planners need minizinc.')
+    parser.add_argument('--time-limit', type=int, default=20, help='Time limit in seconds for the solver planners.')
+    parser.add_argument('--wild-generator', type=str, default='native', choices=['solver', 'native'], help='How to generate the wild bond.')
+    parser.add_argument('--repeats', type=int, default=3, help='Time each stage this many times and keep the quickest.')
+    parser.add_argument('--quick', action='store_true', help='Only run the smallest wall of each bond.')
+    parser.add_argument('--output', type=str, help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', type=str, default=_DEFAULT_BASELINE, help='Baseline JSON file to compare against.')
+    parser.add_argument('--update-baseline', action='store_true', help='Overwrite the baseline with these results instead of comparing.')
+    args = parser.parse_args()
+
+    results: list[CaseResult] = []
+    for case in default_cases(quick=args.quick):
+        result = run_case(case, planner=args.planner, time_limit=timedelta(seconds=args.time_limit), wild_generator=args.wild_generator, repeats=args.repeats)
+        stages = ", ".join(f"{stage} {stage_result.seconds:.3f}s" for stage, stage_result in result.stages.items())
+        print(f"{result.name}: {result.num_bricks} bricks, {result.num_strides} strides (lower bound {result.lower_bound}); {stages}", flush=True)
+        results.append(result)
+
+    if args.output is not None:
+        write_results(results, args.output, args.planner)
+    if args.update_baseline:
+        write_results(results, args.baseline, args.planner)
+        print(f"Wrote baseline to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}, run with --update-baseline to make one")
+        return
+    if baseline['planner'] != args.planner:
+        print(f"The baseline is for the {baseline['planner']} planner, not comparing")
+        return
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if len(regressions) > 0:
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,83 +2,342 @@
 # simplest way: A list (one for each row, first row being the bottom) of lists of head joint
 # positions (left being 0). All these units are "relative" units as described in the readme.
 
-import minizinc
-
+import asyncio
+import collections.abc as tyc
+from collections import deque
 from datetime import timedelta
-import time
+from itertools import count, islice
+import random
+import typing as ty
 
-def stretcher_bond(num_rows: int, width: float) -> list[list[float]]:
+from portfolio import SolverConfig, available_configs, available_cpus, minizinc_racer, race
+from solver_cache import SolverCache
+import tracing
+
+# The regular bonds are also available as endless streams of courses, bottom first, so that callers
+# that only need the first few courses (eg to find the period of the bond) don't have to build the
+# whole wall.
+
+def stretcher_courses(width: float) -> tyc.Iterator[list[float]]:
     # exact equality is more or less ok here because 0.5 can be represented exactly as a float.
     # Similarly with 0.25 used in other bonds later
     assert width%0.5 == 0, "proper stretcher bond needs width to be a multiple of 0.5"
 
-    all_joints: list[list[float]] = []
-    for row in range(num_rows):
-        row_joints: list[float] = []
-        i = 0.5 if row % 2 == 0 else 1.0
-        while i < width:
-            row_joints.append(i)
-            i += 1
-        all_joints.append(row_joints)
-    return all_joints
+    def courses() -> tyc.Iterator[list[float]]:
+        for row in count():
+            row_joints: list[float] = []
+            i = 0.5 if row % 2 == 0 else 1.0
+            while i < width:
+                row_joints.append(i)
+                i += 1
+            yield row_joints
+    return courses()
+
+def stretcher_bond(num_rows: int, width: float) -> list[list[float]]:
+    return list(islice(stretcher_courses(width), num_rows))
 
 # there are different methods of handling the corners in a flemish bond; I do the simplest thing and
 # assume there are three-quarters length cut bricks at the start of half of the rows, and usual
 # headers in the others.
-def flemish_bond(num_rows: int, width: float) -> list[list[float]]:
+def flemish_courses(width: float) -> tyc.Iterator[list[float]]:
     assert (width-1.25)%1.5 == 0, "proper flemish bond needs width to be 1.25 greater than a multiple of 1.5"
 
-    all_joints: list[list[float]] = []
-    for row in range(num_rows):
-        row_joints: list[float] = []
-        if row % 2 == 0:
-            i = 0.5
-            is_next_stretch = True
-        else:
-            i = 0.75
-            is_next_stretch = False
-        while i < width:
-            row_joints.append(i)
-            i += 1.0 if is_next_stretch else 0.5
-            is_next_stretch = not is_next_stretch
-        all_joints.append(row_joints)
-    return all_joints
+    def courses() -> tyc.Iterator[list[float]]:
+        for row in count():
+            row_joints: list[float] = []
+            if row % 2 == 0:
+                i = 0.5
+                is_next_stretch = True
+            else:
+                i = 0.75
+                is_next_stretch = False
+            while i < width:
+                row_joints.append(i)
+                i += 1.0 if is_next_stretch else 0.5
+                is_next_stretch = not is_next_stretch
+            yield row_joints
+    return courses()
+
+def flemish_bond(num_rows: int, width: float) -> list[list[float]]:
+    return list(islice(flemish_courses(width), num_rows))
 
 # once again, multiple ways to handle corners. I'll just do three-quarters bricks on the stretcher
 # rows.
-def cross_bond(num_rows: int, width: float) -> list[list[float]]:
+def cross_courses(width: float) -> tyc.Iterator[list[float]]:
     assert width >= 1.5 and (width-1.5)%1.0 == 0, "proper cross bond needs width to be 1.5 plus nonnegative integer"
 
-    all_joints: list[list[float]] = []
-    for row in range(num_rows):
-        row_joints: list[float] = []
-        if row % 2 == 0:
-            i = 0.5
-            increment = 0.5
+    def courses() -> tyc.Iterator[list[float]]:
+        for row in count():
+            row_joints: list[float] = []
+            if row % 2 == 0:
+                i = 0.5
+                increment = 0.5
+            else:
+                i = 0.75
+                increment = 1.0
+            while i < width:
+                row_joints.append(i)
+                i += increment
+            yield row_joints
+    return courses()
+
+def cross_bond(num_rows: int, width: float) -> list[list[float]]:
+    return list(islice(cross_courses(width), num_rows))
+
+def detect_period(courses: tyc.Iterable[list[float]], max_period: int = 4) -> int | None:
+    """
+    The smallest number of courses after which the bond repeats, judging by its first
+    `2 * max_period` courses, or None if it doesn't look periodic.
+    """
+    sample = list(islice(courses, 2 * max_period))
+    for period in range(1, max_period + 1):
+        if len(sample) >= 2 * period and all(sample[i] == sample[i + period] for i in range(len(sample) - period)):
+            return period
+    return None
+
+# The configs `wild_bond` races if asked for a portfolio, most promising first
+_WILD_PORTFOLIO: ty.Final = (
+    SolverConfig('cp'),
+    SolverConfig('chuffed', free_search=True),
+    SolverConfig('cp-sat', free_search=True),
+)
+
+def wild_bond(
+        num_rows: int,
+        width: float,
+        cache: SolverCache | None = None,
+        portfolio: bool = False,
+        processes: int | None = None,
+        time_limit: timedelta | None = None,
+) -> list[list[float]]:
+    """
+    With `portfolio`, the installed solvers in `_WILD_PORTFOLIO` race to find the bond, splitting
+    the `processes` between them (all the CPUs by default), and the first to find one wins. Raises
+    ValueError if no bond is found within the `time_limit`.
+    """
+    assert width % 0.25 == 0 and width >= 0.5, "proper wild bond width must be a multiple of 0.25 and at least 0.5"
+
+    configs = available_configs(_WILD_PORTFOLIO) if portfolio else [SolverConfig('cp')]
+    if len(configs) == 0:
+        raise ValueError("None of the portfolio's solvers are installed")
+    params = {
+        'n_courses': num_rows,
+        'width_in_quarters': int(width * 4),
+    }
+    cache_key = None
+    cached = None
+    if cache is not None:
+        cache_key = cache.key("wild.mzn", ",".join(config.name for config in configs), params, None)
+        cached = cache.get(cache_key)
+
+    if cached is not None:
+        print("Using cached wild bond")
+        head_joints = cached['head_joints']
+    else:
+        if processes is None:
+            processes = available_cpus()
+        run = minizinc_racer(lambda config: ("wild.mzn", params), 'head_joints')
+        print("Running wild bond solver...")
+        with tracing.span('wild_bond solver', courses=num_rows, width=width, processes=processes) as solver_span:
+            result = asyncio.run(race(configs, run, processes, time_limit=time_limit))
+            solver_span.args.update(status=result.status.name, winner=None if result.winner is None else result.winner.name)
+        winner = "" if len(configs) == 1 or result.winner is None else f", found by {result.winner.name}"
+        print(f"Wild bond solved in {solver_span.seconds:.2f} seconds with status {result.status}{winner}")
+        if result.solution is None:
+            raise ValueError("Wild bond solver failed to find a solution!")
+        head_joints = result.solution
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, {'head_joints': head_joints})
+
+    return [[quarters / 4.0 + 0.25 for quarters, has_joint in enumerate(course) if has_joint] for course in head_joints]
+
+# The wild bond can also be generated without a solver. Each course only interacts with the four
+# courses below it (through the vertical and diagonal anti-pattern rules), so we only need to keep a
+# sliding window of courses. The rules are the same as in wild.mzn, with head joint positions in
+# quarter bricks: position j is a joint at relative x j/4.
+#
+# Going course by course gets stuck on wide walls: a few courses can leave something behind that
+# only turns out to be impossible to build on several courses further up, and by then changing one
+# course at a time doesn't get us out of it. So instead we search for a whole strip of courses at
+# once, and only give out the bottom two thirds of it. The top of it is searched for again along with
+# the next strip, so it can still change to fit whatever goes on top of it.
+_WILD_WINDOW_COURSES: ty.Final = 4
+_WILD_STRIP_COURSES: ty.Final = 12
+_WILD_COMMIT_COURSES: ty.Final = 8
+# Now and then the search wanders into a corner that takes it ages to back out of, usually because
+# the courses under the strip have settled into something that's very hard to build on (eg nearly a
+# stretcher bond), so it gives up after this many steps per quarter brick of wall width. It then lays
+# the strip under it again, which is why the last few strips' courses are held back rather than
+# given out straight away. If there's nothing left to lay again it tries again, a bit longer every
+# time, so it still gets to the bottom of it if there really is no way to lay the strip.
+_WILD_RESTART_STEPS: ty.Final = 100
+_WILD_HELD_BACK_STRIPS: ty.Final = 2
+
+# The anti-patterns, as the (course, position) offsets of their five joints from the joint in the top
+# course, and the lowest position of that joint and its highest one counting back from the last.
+_WILD_ANTI_PATTERNS: ty.Final = (
+    # the vertical anti-patterns, with initial movement to the left and to the right
+    (((-4, 0), (-3, -1), (-2, 0), (-1, -1), (0, 0)), 3, 0),
+    (((-4, 0), (-3, 1), (-2, 0), (-1, 1), (0, 0)), 1, -1),
+    # the diagonal anti-patterns, to the left and to the right
+    (((-4, 4), (-3, 3), (-2, 2), (-1, 1), (0, 0)), 1, -4),
+    (((-4, -4), (-3, -3), (-2, -2), (-1, -1), (0, 0)), 5, 0),
+)
+
+def _wild_strip(
+    first_row: int,
+    num_courses: int,
+    lower_courses: list[set[int]],
+    last_index: int,
+    rng: random.Random,
+    max_steps: int,
+) -> list[list[int]] | None:
+    """
+    Randomized search for `num_courses` valid courses on top of `lower_courses` (up to four courses,
+    bottom first). Returns None if it takes more than `max_steps`, and raises ValueError if there's
+    no way to lay them at all.
+
+    The search goes left to right, deciding whether each course has a joint at a position before
+    moving on to the next position, so everything that a joint has to fit in with has been decided
+    just before it. When it gets stuck it jumps straight back to the latest joint (or gap) that's to
+    blame, rather than trying every combination of the ones in between.
+    """
+    num_lower = len(lower_courses)
+    # joints alternate between even and odd quarter positions from course to course
+    cells = [(course, position) for position in range(1, last_index + 1) for course in range(num_courses) if (first_row + course) % 2 == position % 2]
+    cell_index = {cell: index for index, cell in enumerate(cells)}
+    if len(cells) == 0:
+        return [[] for _ in range(num_courses)]
+
+    # Every rule of wild.mzn is about a handful of cells, and is checked when the last of them is
+    # decided, against the ones before it: the rules that rule out joints in all of them go in
+    # `all_joints`, and the ones that rule out gaps in all of them in `all_gaps`, under that last
+    # cell, as the other cells.
+    all_joints: list[list[tuple[int, ...]]] = [[] for _ in cells]
+    all_gaps: list[list[tuple[int, ...]]] = [[] for _ in cells]
+    for course in range(num_courses):
+        # every stretcher-length window j..j+4 has a joint, so no brick is longer than a stretcher.
+        # Narrow walls have no full windows, so anything goes.
+        for window_start in range(1, last_index - 3):
+            window = [cell_index[(course, position)] for position in range(window_start, window_start + 5) if (course, position) in cell_index]
+            all_gaps[window[-1]].append(tuple(window[:-1]))
+        # no two half bricks next to each other
+        for position in range(1, last_index - 3):
+            if (course, position) in cell_index:
+                all_joints[cell_index[(course, position + 4)]].append((cell_index[(course, position)], cell_index[(course, position + 2)]))
+    # the anti-patterns, by the course and position of their top joint, ignoring the ones whose joints
+    # in the courses below the strip aren't there
+    for course in range(num_courses):
+        for position in range(1, last_index + 1):
+            if (first_row + course) % 2 != position % 2:
+                continue
+            for anti_pattern, lowest, highest_from_last in _WILD_ANTI_PATTERNS:
+                if not lowest <= position <= last_index + highest_from_last:
+                    continue
+                strip_cells = []
+                for course_offset, position_offset in anti_pattern:
+                    other_course, other_position = num_lower + course + course_offset, position + position_offset
+                    if other_course < 0 or (other_course < num_lower and other_position not in lower_courses[other_course]):
+                        break
+                    if other_course >= num_lower:
+                        strip_cells.append(cell_index[(other_course - num_lower, other_position)])
+                else:
+                    strip_cells.sort()
+                    all_joints[strip_cells[-1]].append(tuple(strip_cells[:-1]))
+
+    has_joint = [False for _ in cells]
+    # the search spends most of its time here, hence the `map`s rather than generator expressions
+    decided = has_joint.__getitem__
+
+    def blame(index: int, joint: bool) -> tuple[int, ...] | None:
+        """
+        None if cell `index` can have (or not have) a joint given the cells before it, otherwise the
+        cells that rule it out
+        """
+        if joint:
+            for others in all_joints[index]:
+                if all(map(decided, others)):
+                    return others
         else:
-            i = 0.75
-            increment = 1.0
-        while i < width:
-            row_joints.append(i)
-            i += increment
-        all_joints.append(row_joints)
-    return all_joints
-
-def wild_bond(num_rows: int, width: float) -> list[list[float]]:
+            for others in all_gaps[index]:
+                if not any(map(decided, others)):
+                    return others
+        return None
+
+    untried: list[list[bool]] = [[] for _ in cells]
+    culprits: list[set[int]] = [set() for _ in cells]
+    index = 0
+    untried[0] = [False, True] if rng.getrandbits(1) else [True, False]
+    for _ in range(max_steps):
+        if len(untried[index]) == 0:
+            # nothing fits here, so go back to the latest cell to blame and take the rest of the
+            # blame with us
+            if len(culprits[index]) == 0:
+                raise ValueError("Couldn't generate a valid wild bond course")
+            back_to = max(culprits[index])
+            culprits[back_to] |= culprits[index] - {back_to}
+            # the cells after it are decided again before anything looks at them
+            index = back_to
+            continue
+        joint = untried[index].pop()
+        reasons = blame(index, joint)
+        if reasons is not None:
+            culprits[index].update(reasons)
+            continue
+        has_joint[index] = joint
+        index += 1
+        if index == len(cells):
+            courses: list[list[int]] = [[] for _ in range(num_courses)]
+            for (course, position), joint in zip(cells, has_joint):
+                if joint:
+                    courses[course].append(position)
+            return courses
+        untried[index] = [False, True] if rng.getrandbits(1) else [True, False]
+        culprits[index] = set()
+    return None
+
+def native_wild_courses(width: float, seed: int | None = None) -> tyc.Iterator[list[float]]:
+    """
+    Endless stream of wild bond courses, bottom first, generated in Python rather than by the
+    solver. The same `seed` always gives the same bond.
+    """
     assert width % 0.25 == 0 and width >= 0.5, "proper wild bond width must be a multiple of 0.25 and at least 0.5"
+    last_index = int(width * 4) - 2
+
+    def courses() -> tyc.Iterator[list[float]]:
+        rng = random.Random(seed)
+        # courses that have been given out, but that the next few courses are still checked against
+        given_out: deque[set[int]] = deque(maxlen=_WILD_WINDOW_COURSES)
+        # the bottom halves of the last few strips, which aren't given out yet so that they can still
+        # be laid again if nothing can be found to go on top of them
+        held_back: list[list[set[int]]] = []
+        first_row = 0
+        max_steps = _WILD_RESTART_STEPS * max(last_index, 1)
+        while True:
+            lower = [*given_out, *(course for block in held_back for course in block)][-_WILD_WINDOW_COURSES:]
+            try:
+                strip = _wild_strip(first_row, _WILD_STRIP_COURSES, lower, last_index, rng, max_steps)
+            except ValueError:
+                # there's no way to lay it on what's under it, which can only be fixed by laying
+                # that again
+                if len(held_back) == 0:
+                    raise
+                strip = None
+            if strip is None:
+                if len(held_back) > 0:
+                    held_back.pop()
+                    first_row -= _WILD_COMMIT_COURSES
+                else:
+                    max_steps += max_steps // 2
+                continue
+            held_back.append([set(course) for course in strip[:_WILD_COMMIT_COURSES]])
+            first_row += _WILD_COMMIT_COURSES
+            if len(held_back) > _WILD_HELD_BACK_STRIPS:
+                for course in held_back.pop(0):
+                    given_out.append(course)
+                    yield [joint / 4 for joint in sorted(course)]
+    return courses()
 
-    model = minizinc.Model("wild.mzn")
-    solver = minizinc.Solver.lookup("cp")
-    instance = minizinc.Instance(solver, model)
-    instance['n_courses'] = num_rows
-    instance['width_in_quarters'] = int(width * 4)
-
-    print("Running wild bond solver...")
-    start_time = time.time()
-    result = instance.solve()
-    end_time = time.time()
-    print(f"Wild bond solved in {end_time - start_time:.2f} seconds with status {result.status}")
-    if result.status != minizinc.result.Status.SATISFIED:
-        raise ValueError("Wild bond solver failed to find a solution!")
-
-    return [[quarters / 4.0 + 0.25 for quarters, has_joint in enumerate(course) if has_joint] for course in result['head_joints']]
+def native_wild_bond(num_rows: int, width: float, seed: int | None = None) -> list[list[float]]:
+    with tracing.span('native_wild_bond', courses=num_rows, width=width):
+        return list(islice(native_wild_courses(width, seed), num_rows))
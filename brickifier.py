@@ -1,4 +1,8 @@
+from __future__ import annotations
+
+from array import array
 from dataclasses import dataclass
+from math import floor
 import typing as ty
 
 from utils import assert_round
@@ -7,6 +11,7 @@ _STRETCHER_WIDTH: ty.Final = 210
 _HEAD_JOINT_WIDTH: ty.Final = 10
 _BRICK_HEIGHT: ty.Final = 50
 _BED_JOINT_HEIGHT: ty.Final = 12.5
+_QUARTERS_PER_STRETCHER: ty.Final = 4
 
 @dataclass(frozen=True)
 class Brick:
@@ -38,13 +43,79 @@ def relative_to_real_including_joint(relative: float) -> int:
 def relative_to_real_excluding_joint(relative: float) -> int:
     return relative_to_real_including_joint(relative) - _HEAD_JOINT_WIDTH
 
+def courses_within_height(height: float) -> int:
+    """
+    How many courses above a brick's own course are still within `height` mm of the bottom of that
+    brick, ie, how many extra courses a stride window of that height can reach.
+    """
+    return floor((height - _BRICK_HEIGHT) / (_BRICK_HEIGHT + _BED_JOINT_HEIGHT))
+
+def relative_to_quarters(relative: float) -> int:
+    return assert_round(relative * _QUARTERS_PER_STRETCHER)
+
+class BrickTable:
+    """
+    The same information as a `BrickList`, but stored as a struct of arrays indexed by integer brick
+    id rather than one `Brick` object per brick, for walls with tens of thousands of bricks. x
+    positions are stored as integer quarter-brick (relative) units, along with the precomputed real
+    extents so that nothing needs to go through `assert_round` again. Upholds the same bottom-up,
+    left-to-right ordering invariant as `BrickList`.
+    """
+    def __init__(self) -> None:
+        self.left_quarters = array('q')
+        self.right_quarters = array('q')
+        self.course_no = array('q')
+        self.real_left_x = array('q')
+        self.real_right_x = array('q')
+        self.real_bottom_y = array('d')
+        self.real_top_y = array('d')
+
+    def __len__(self) -> int:
+        return len(self.course_no)
+
+    def append(self, left_quarters: int, right_quarters: int, course_no: int) -> None:
+        self.left_quarters.append(left_quarters)
+        self.right_quarters.append(right_quarters)
+        self.course_no.append(course_no)
+        # a quarter brick including its trailing head joint is exactly 55mm, so this stays integral
+        self.real_left_x.append(left_quarters * (_STRETCHER_WIDTH + _HEAD_JOINT_WIDTH) // _QUARTERS_PER_STRETCHER)
+        self.real_right_x.append(right_quarters * (_STRETCHER_WIDTH + _HEAD_JOINT_WIDTH) // _QUARTERS_PER_STRETCHER - _HEAD_JOINT_WIDTH)
+        self.real_bottom_y.append(course_no * (_BRICK_HEIGHT + _BED_JOINT_HEIGHT))
+        self.real_top_y.append(course_no * (_BRICK_HEIGHT + _BED_JOINT_HEIGHT) + _BRICK_HEIGHT)
+
+    def brick(self, brick_id: int) -> Brick:
+        return Brick(
+            relative_left_x=self.left_quarters[brick_id] / _QUARTERS_PER_STRETCHER,
+            relative_right_x=self.right_quarters[brick_id] / _QUARTERS_PER_STRETCHER,
+            course_no=self.course_no[brick_id],
+        )
+
+    def bricks(self) -> BrickList:
+        return [self.brick(brick_id) for brick_id in range(len(self))]
+
+    @classmethod
+    def from_brick_list(cls, brick_list: BrickList) -> BrickTable:
+        table = cls()
+        for brick in brick_list:
+            table.append(relative_to_quarters(brick.relative_left_x), relative_to_quarters(brick.relative_right_x), brick.course_no)
+        return table
+
 # Takes relative head joint positions on each row, not including the first (0.0) or last (=width)
 # positions.
+def brickify_table(all_head_joints: list[list[float]], width: float) -> BrickTable:
+    table = BrickTable()
+    for head_joints_row in all_head_joints:
+        brickify_course(table, head_joints_row, width)
+    return table
+
+def brickify_course(table: BrickTable, head_joints_row: list[float], width: float) -> None:
+    """Add one more course on top of the `table`, for when the courses are read one at a time"""
+    course_no = table.course_no[-1] + 1 if len(table) > 0 else 0
+    last_head_joint_quarters = 0
+    for head_joint_quarters in [relative_to_quarters(head_joint) for head_joint in head_joints_row] + [relative_to_quarters(width)]:
+        table.append(last_head_joint_quarters, head_joint_quarters, course_no)
+        last_head_joint_quarters = head_joint_quarters
+
 def brickify(all_head_joints: list[list[float]], width: float) -> BrickList:
-    result: BrickList = []
-    for course_no, head_joints_row in enumerate(all_head_joints):
-        last_head_joint = 0.0
-        for head_joint in head_joints_row + [width]:
-            result.append(Brick(relative_left_x=last_head_joint, relative_right_x=head_joint, course_no=course_no))
-            last_head_joint = head_joint
-    return result
+    """Like `brickify_table`, but as `Brick` objects"""
+    return brickify_table(all_head_joints, width).bricks()
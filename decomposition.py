@@ -0,0 +1,275 @@
+# Splitting the stride problem into bands that are solved independently. Bricks more than a stride
+# height apart never share a stride, so cutting the wall into horizontal bands aligned to the stride
+# window loses little, and each band is a much smaller problem for the solver. The bands are solved
+# in worker processes, then their strides are concatenated bottom band first.
+#
+# Bands with exactly the same bricks (up to moving them vertically) are only solved once. For a
+# periodic bond, making the band height a multiple of the bond's period makes every full band the
+# same, so `periodic_placement_order` only ever builds and solves one representative tile plus the
+# partial band at the top, straight from the bond's course stream, and then repeats the tile's plan
+# up the wall. Its time doesn't depend on the height of the wall.
+
+import collections.abc as tyc
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+import typing as ty
+
+from brickifier import Brick, BrickList, brickify_table, courses_within_height
+from dependency_graph import PlaceableBrick, PlaceableBrickList, brick_list_to_placeable_brick_list
+from placer import (
+    PlacementOrder, PlacementPlan, available_cpus, greedy_placement_order, optimal_placement_order,
+    stride_count_lower_bound,
+)
+from solver_cache import SolverCache
+import tracing
+
+# (row, column) of a band. Bands are solved and placed in lexicographic order.
+BandKey: ty.TypeAlias = tuple[int, int]
+
+def _band_courses(band_height: float, period: int) -> int:
+    return max(period, (courses_within_height(band_height) + 1) // period * period)
+
+def assign_bands(placeable_brick_list: PlaceableBrickList, band_height: float, band_width: int | None, period: int = 1) -> dict[PlaceableBrick, BandKey]:
+    """
+    Assign each brick to a band, such that every brick's dependencies are in the same band or one
+    that comes earlier. The number of courses in a band is rounded down to a multiple of `period`
+    (but is at least `period`).
+    """
+    band_courses = _band_courses(band_height, period)
+    band_of: dict[PlaceableBrick, BandKey] = {}
+    # the dependencies are always in the course below, so going bottom-up means we've always
+    # assigned a brick's dependencies before the brick itself
+    for placeable_brick in sorted(placeable_brick_list, key=lambda placeable_brick: placeable_brick.brick.course_no):
+        row = placeable_brick.brick.course_no // band_courses
+        column = 0
+        if band_width is not None:
+            column = placeable_brick.real_extents()[0] // band_width
+            # A brick can rest on a brick whose left edge is in the next column over. Pushing the
+            # brick into that column too keeps the columns in a valid order, at the cost of the
+            # column boundaries drifting right as they go up a band.
+            for dep in placeable_brick.dependencies:
+                if dep in band_of and band_of[dep][0] == row:
+                    column = max(column, band_of[dep][1])
+        band_of[placeable_brick] = (row, column)
+    return band_of
+
+def _normalize_band(band: PlaceableBrickList) -> BrickList:
+    first_course_no = min(placeable_brick.brick.course_no for placeable_brick in band)
+    return [
+        Brick(placeable_brick.brick.relative_left_x, placeable_brick.brick.relative_right_x, placeable_brick.brick.course_no - first_course_no)
+        for placeable_brick in band
+    ]
+
+def _solve_band(
+        bricks: BrickList,
+        time_limit: timedelta,
+        model: str,
+        stride_height: float,
+        stride_width: int,
+        processes: int,
+        cache: SolverCache | None,
+) -> tuple[list[list[int]], int]:
+    """
+    Runs in a worker process. Takes plain `Brick`s rather than `PlaceableBrick`s, because the
+    latter reference their neighbours so pickling one would pickle the whole wall. Returns the
+    strides as indices into `bricks`, and the lower bound on the number of strides.
+    """
+    placeable_bricks = brick_list_to_placeable_brick_list(stride_height, stride_width, bricks)
+    warm_start = greedy_placement_order(placeable_bricks, stride_height, stride_width)
+    plan = optimal_placement_order(
+        placeable_bricks,
+        time_limit=time_limit,
+        warm_start=warm_start,
+        model=model,
+        stride_height=stride_height,
+        stride_width=stride_width,
+        processes=processes,
+        cache=cache,
+    )
+    index_of = {placeable_brick: i for i, placeable_brick in enumerate(placeable_bricks)}
+    return [[index_of[placeable_brick] for placeable_brick in stride] for stride in plan.placement_order], plan.lower_bound
+
+def _solve_bands(
+        placeable_brick_list: PlaceableBrickList,
+        time_limit: timedelta,
+        stride_height: float,
+        stride_width: int,
+        band_height: float,
+        band_width: int | None,
+        model: str,
+        max_workers: int | None,
+        cache: SolverCache | None,
+        period: int,
+) -> dict[BandKey, tuple[PlacementOrder, int]]:
+    """The placement order and lower bound of each band, solved in parallel"""
+    band_of = assign_bands(placeable_brick_list, band_height, band_width, period)
+    bands: dict[BandKey, PlaceableBrickList] = {}
+    for placeable_brick in placeable_brick_list:
+        bands.setdefault(band_of[placeable_brick], []).append(placeable_brick)
+    # the bricks of the band moved down to start at course 0, which identifies bands that are the
+    # same up to a vertical translation, and so can share a solution
+    band_bricks = {band_key: _normalize_band(band) for band_key, band in bands.items()}
+    unique_band_bricks = list({tuple(bricks): bricks for bricks in band_bricks.values()}.values())
+
+    num_cpus = available_cpus()
+    if max_workers is None:
+        max_workers = min(len(unique_band_bricks), num_cpus)
+    # split the CPUs between the workers rather than letting every solver use all of them
+    processes_per_worker = max(1, num_cpus // max_workers)
+
+    print(f"Solving {len(unique_band_bricks)} distinct bands out of {len(bands)} with {max_workers} workers...")
+    # the workers' own stages aren't traced, see tracing.py
+    with tracing.span('solve bands', bands=len(bands), distinct_bands=len(unique_band_bricks), workers=max_workers), ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _solve_band,
+                bricks,
+                time_limit,
+                model,
+                stride_height,
+                stride_width,
+                processes_per_worker,
+                cache,
+            )
+            for bricks in unique_band_bricks
+        ]
+        band_results = {tuple(bricks): future.result() for bricks, future in zip(unique_band_bricks, futures)}
+
+    results: dict[BandKey, tuple[PlacementOrder, int]] = {}
+    for band_key, band in bands.items():
+        # indices into the normalized bricks are also indices into the band's own bricks
+        strides, lower_bound = band_results[tuple(band_bricks[band_key])]
+        results[band_key] = ([[band[i] for i in stride] for stride in strides], lower_bound)
+    return results
+
+def decomposed_placement_order(
+        placeable_brick_list: PlaceableBrickList,
+        time_limit: timedelta,
+        stride_height: float,
+        stride_width: int,
+        band_height: float | None = None,
+        band_width: int | None = None,
+        model: str = 'matrix',
+        max_workers: int | None = None,
+        cache: SolverCache | None = None,
+        period: int = 1,
+) -> PlacementPlan:
+    """
+    Like `optimal_placement_order`, but solves each band of the wall separately in parallel. Bands
+    are `band_height` mm tall (the stride height by default) and, if `band_width` is given, roughly
+    that many mm wide. The `time_limit` applies to each band. If the bond repeats every `period`
+    courses, pass that so that the bands line up with the bond and only need solving once.
+    """
+    if band_height is None:
+        band_height = stride_height
+    band_results = _solve_bands(
+        placeable_brick_list, time_limit, stride_height, stride_width, band_height, band_width, model, max_workers, cache, period,
+    )
+
+    placement_order: PlacementOrder = []
+    band_lower_bound = 0
+    for band_key in sorted(band_results):
+        strides, lower_bound = band_results[band_key]
+        placement_order.extend(strides)
+        band_lower_bound = max(band_lower_bound, lower_bound)
+    # the bands' own bounds don't add up to a bound for the whole wall, since the wall could be
+    # split differently, but the biggest of them is still a bound
+    lower_bound = max(band_lower_bound, stride_count_lower_bound(placeable_brick_list, stride_height, stride_width))
+    plan = PlacementPlan(placement_order, lower_bound=lower_bound)
+    print(f"Number of strides: {plan.num_strides} (lower bound {plan.lower_bound}, optimality gap {plan.optimality_gap})")
+    return plan
+
+@dataclass
+class TiledPlan:
+    """
+    A plan for a whole periodic wall, as brick ids, ie indices into `brickify_table` of the whole
+    wall, so that making it never needs the whole wall's bricks.
+    """
+    strides: list[list[int]]
+    # no valid placement order has fewer strides than this
+    lower_bound: int
+
+    @property
+    def num_strides(self) -> int:
+        return len(self.strides)
+
+    def placement_order(self, placeable_brick_list: PlaceableBrickList) -> PlacementOrder:
+        """The plan in terms of the whole wall's bricks, which must be in `brickify_table` order"""
+        return [[placeable_brick_list[brick_id] for brick_id in stride] for stride in self.strides]
+
+def periodic_placement_order(
+        courses: tyc.Iterable[list[float]],
+        num_courses: int,
+        width: float,
+        period: int,
+        time_limit: timedelta,
+        stride_height: float,
+        stride_width: int,
+        band_height: float | None = None,
+        band_width: int | None = None,
+        model: str = 'matrix',
+        max_workers: int | None = None,
+        cache: SolverCache | None = None,
+) -> TiledPlan:
+    """
+    Like `decomposed_placement_order` for a bond that repeats every `period` courses, given as a
+    stream of `courses` (eg `stretcher_courses`). Only the first band and the partial band at the top
+    of the wall are built and solved, and the first band's plan is repeated for every other full
+    band.
+    """
+    if band_height is None:
+        band_height = stride_height
+    band_courses = _band_courses(band_height, period)
+    num_full_bands, top_courses = divmod(num_courses, band_courses)
+    # since the band height is a multiple of the period, every full band is the same as the first,
+    # and the top band is the same as the courses right above the first band
+    tile_courses = min(num_courses, band_courses + top_courses)
+    tile_bond = list(islice(courses, tile_courses))
+    tile_table = brickify_table(tile_bond, width)
+    tile_bricks = brick_list_to_placeable_brick_list(stride_height, stride_width, tile_table)
+    band_results = _solve_bands(
+        tile_bricks, time_limit, stride_height, stride_width, band_height, band_width, model, max_workers, cache, period,
+    )
+
+    # The id of a brick in the whole wall is the number of bricks in the courses below it plus its
+    # index within its course, and course c of the wall is course c % period of the tile.
+    bricks_per_course = [len(head_joints) + 1 for head_joints in tile_bond]
+    tile_course_first_ids = [0]
+    for count in bricks_per_course:
+        tile_course_first_ids.append(tile_course_first_ids[-1] + count)
+    wall_course_first_ids = [0]
+    for course_no in range(num_courses):
+        wall_course_first_ids.append(wall_course_first_ids[-1] + bricks_per_course[course_no % period])
+
+    def shifted(stride: list[PlaceableBrick], course_offset: int) -> list[int]:
+        return [
+            wall_course_first_ids[placeable_brick.brick.course_no + course_offset]
+            + placeable_brick.brick_id - tile_course_first_ids[placeable_brick.brick.course_no]
+            for placeable_brick in stride
+        ]
+
+    strides: list[list[int]] = []
+    band_lower_bound = 0
+    for (row, column) in sorted(band_results):
+        band_strides, lower_bound = band_results[(row, column)]
+        band_lower_bound = max(band_lower_bound, lower_bound)
+        # the first band stands in for every full band. Any other band is the top one.
+        if row == 0 and num_full_bands > 0:
+            continue
+        course_offset = (num_full_bands - 1) * band_courses if num_full_bands > 0 else 0
+        strides.extend(shifted(stride, course_offset) for stride in band_strides)
+    if num_full_bands > 0:
+        first_band_strides = [
+            stride for band_key in sorted(band_results) if band_key[0] == 0 for stride in band_results[band_key][0]
+        ]
+        repeated = [shifted(stride, band_no * band_courses) for band_no in range(num_full_bands) for stride in first_band_strides]
+        strides = repeated + strides
+
+    # the whole wall needs at least as many strides as any part of it, so the biggest of the bounds
+    # for its parts is a bound for the wall
+    lower_bound = max(band_lower_bound, stride_count_lower_bound(tile_bricks, stride_height, stride_width))
+    plan = TiledPlan(strides, lower_bound=lower_bound)
+    print(f"Number of strides: {plan.num_strides} (lower bound {plan.lower_bound}, optimality gap {plan.num_strides - plan.lower_bound})")
+    return plan
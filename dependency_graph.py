@@ -2,10 +2,18 @@ from __future__ import annotations
 
 import typing as ty
 
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from array import array
 from dataclasses import dataclass
-from brickifier import Brick, BrickList
+from brickifier import Brick, BrickList, BrickTable, relative_to_quarters
+import tracing
 
-@dataclass
+# eq=False so that bricks are compared and hashed by identity. Every `PlaceableBrick` in a wall is
+# a distinct brick, and comparing the neighbour sets field by field would be very slow. The generated
+# repr would go through the neighbour sets too, which takes exponential time since they point at each
+# other, so it's replaced with one that only shows the brick itself.
+@dataclass(eq=False, repr=False)
 class PlaceableBrick:
     brick: Brick
     dependencies: set[PlaceableBrick]
@@ -13,35 +21,168 @@ class PlaceableBrick:
     # if int, indicates which stride the brick was placed in. If None, the brick hasn't been placed
     # yet.
     placed_in_stride: int | None = None
+    # index of the brick in the `BrickTable` it was created from, and that table. The planners and
+    # the printer read the brick's precomputed extents from there rather than recomputing them from
+    # `brick` for every brick.
+    brick_id: int = -1
+    table: BrickTable | None = None
 
-    def __hash__(self) -> int:
-        return hash(self.brick)
+    def real_extents(self) -> tuple[int, int, float, float]:
+        """Real (left x, right x, bottom y, top y) of the brick"""
+        if self.table is None:
+            return (self.brick.real_left_x(), self.brick.real_right_x(), self.brick.real_bottom_y(), self.brick.real_top_y())
+        table, brick_id = self.table, self.brick_id
+        return (table.real_left_x[brick_id], table.real_right_x[brick_id], table.real_bottom_y[brick_id], table.real_top_y[brick_id])
+
+    def quarters(self) -> tuple[int, int]:
+        """Relative (left x, right x) of the brick in quarter bricks"""
+        if self.table is None:
+            return (relative_to_quarters(self.brick.relative_left_x), relative_to_quarters(self.brick.relative_right_x))
+        return (self.table.left_quarters[self.brick_id], self.table.right_quarters[self.brick_id])
+
+    def __repr__(self) -> str:
+        return f"PlaceableBrick(brick={self.brick!r}, brick_id={self.brick_id}, placed_in_stride={self.placed_in_stride})"
 
 PlaceableBrickList: ty.TypeAlias = list[PlaceableBrick]
 
-def brick_list_to_placeable_brick_list(stride_height: float, stride_width: int, brick_list: BrickList) -> PlaceableBrickList:
+class Adjacency:
+    """
+    Adjacency lists in compressed sparse row form: the neighbours of brick id i are
+    `indices[offsets[i]:offsets[i+1]]`.
+    """
+    def __init__(self, offsets: array[int], indices: array[int]):
+        self.offsets = offsets
+        self.indices = indices
+
+    @classmethod
+    def from_lists(cls, neighbour_lists: list[list[int]]) -> Adjacency:
+        offsets = array('q', [0])
+        indices = array('q')
+        for neighbours in neighbour_lists:
+            indices.extend(sorted(neighbours))
+            offsets.append(len(indices))
+        return cls(offsets, indices)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def neighbours(self, brick_id: int) -> array[int]:
+        return self.indices[self.offsets[brick_id]:self.offsets[brick_id + 1]]
+
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+class _CourseIndex:
+    """
+    The bricks of a single course, sorted by x. Since bricks in a course never overlap, sorting by
+    real left x also sorts by real right x, so we can bisect on either to find every brick
+    intersecting an x interval.
+    """
+    def __init__(self, table: BrickTable, brick_ids: list[int]):
+        self.brick_ids = sorted(brick_ids, key=lambda brick_id: table.real_left_x[brick_id])
+        self.left_xs = [table.real_left_x[brick_id] for brick_id in self.brick_ids]
+        self.right_xs = [table.real_right_x[brick_id] for brick_id in self.brick_ids]
+        self.max_width = max(right_x - left_x for left_x, right_x in zip(self.left_xs, self.right_xs))
+        self.bottom_y = table.real_bottom_y[self.brick_ids[0]]
+        self.top_y = table.real_top_y[self.brick_ids[0]]
+
+    def overlapping(self, left_x: int, right_x: int) -> list[int]:
+        """Bricks whose real x range intersects [left_x, right_x], same semantics as `do_bricks_overlap`"""
+        start = bisect_left(self.right_xs, left_x)
+        end = bisect_right(self.left_xs, right_x)
+        return self.brick_ids[start:end]
+
+    def contained(self, left_x: int, right_x: int) -> range:
+        """Indices (into this course) of the bricks whose real x range lies within [left_x, right_x]"""
+        return range(bisect_left(self.left_xs, left_x), bisect_right(self.right_xs, right_x))
+
+def brick_table_adjacency(stride_height: float, stride_width: int, table: BrickTable) -> tuple[Adjacency, Adjacency]:
+    """
+    Computes the dependencies of each brick, and which bricks can be in the same stride as each
+    brick, as (dependencies, within_same_stride).
+    """
+    # Rather than comparing every pair of bricks, we bucket the bricks by course and sort each course
+    # by x. A brick's dependencies can then only be in the course directly below it, and the bricks
+    # it can share a stride with are in the few courses within `stride_height` and inside an x
+    # window of `stride_width` around it, so each lookup is a couple of bisects. For k bricks per
+    # stride window this is O(n*k) rather than O(n^2).
+    bricks_by_course: defaultdict[int, list[int]] = defaultdict(list)
+    for brick_id, course_no in enumerate(table.course_no):
+        bricks_by_course[course_no].append(brick_id)
+    course_indices = {course_no: _CourseIndex(table, brick_ids) for course_no, brick_ids in bricks_by_course.items()}
+
+    dependencies: list[list[int]] = [[] for _ in range(len(table))]
+    within_same_stride: list[list[int]] = [[] for _ in range(len(table))]
+    sorted_course_nos = sorted(course_indices)
+    for i, course_no in enumerate(sorted_course_nos):
+        course_index = course_indices[course_no]
+        # the courses close enough vertically to share a stride with this one. Every brick in a
+        # course has the same y extents, so we only need to check this per course rather than per
+        # brick, and since y increases with course number we can stop scanning at the first course
+        # that's too far away in each direction.
+        nearby_course_indices: list[_CourseIndex] = []
+        for step in (-1, 1):
+            j = i if step == 1 else i - 1
+            while 0 <= j < len(sorted_course_nos):
+                other_course_index = course_indices[sorted_course_nos[j]]
+                if max(course_index.top_y, other_course_index.top_y) - min(course_index.bottom_y, other_course_index.bottom_y) > stride_height:
+                    break
+                nearby_course_indices.append(other_course_index)
+                j += step
+        below_course_index = course_indices.get(course_no - 1)
+
+        for brick_id, left_x, right_x in zip(course_index.brick_ids, course_index.left_xs, course_index.right_xs):
+            if below_course_index is not None:
+                dependencies[brick_id] = below_course_index.overlapping(left_x, right_x)
+            if right_x - left_x > stride_width:
+                # doesn't even fit in a stride on its own
+                continue
+            # any brick in the same stride must lie within the stride_width window ending at our
+            # left edge or starting at our right edge
+            for other_course_index in nearby_course_indices:
+                contained = other_course_index.contained(right_x - stride_width, left_x + stride_width)
+                if other_course_index.max_width <= stride_width:
+                    # if both bricks fit in a stride on their own, being in that window is exactly
+                    # the horizontal part of `are_bricks_in_same_stride`. The vertical part was
+                    # already checked for the whole course.
+                    within_same_stride[brick_id].extend(other_course_index.brick_ids[contained.start:contained.stop])
+                    continue
+                for j in contained:
+                    if max(right_x, other_course_index.right_xs[j]) - min(left_x, other_course_index.left_xs[j]) <= stride_width:
+                        within_same_stride[brick_id].append(other_course_index.brick_ids[j])
+
+    return Adjacency.from_lists(dependencies), Adjacency.from_lists(within_same_stride)
+
+def brick_list_to_placeable_brick_list(stride_height: float, stride_width: int, brick_list: BrickList | BrickTable) -> PlaceableBrickList:
     """
     Computes dependencies between bricks and suchlike. Returns bricks in same order as passed in.
     """
-    # for this interview take-home, performance frankly doesn't matter much so we'll do an awful
-    # brute-force O(n^2) both for determining dependencies between bricks and for computing which
-    # bricks can be within the same block
+    table = brick_list if isinstance(brick_list, BrickTable) else BrickTable.from_brick_list(brick_list)
+    with tracing.span('dependency_graph', bricks=len(table)) as current:
+        dependencies, within_same_stride = brick_table_adjacency(stride_height, stride_width, table)
 
-    # TODO explain how it can be made faster
+        placeable_brick_list = [PlaceableBrick(table.brick(brick_id), set(), set(), brick_id=brick_id, table=table) for brick_id in range(len(table))]
+        for brick_id, placeable_brick in enumerate(placeable_brick_list):
+            placeable_brick.dependencies.update(placeable_brick_list[dep_id] for dep_id in dependencies.neighbours(brick_id))
+            placeable_brick.within_same_stride.update(placeable_brick_list[other_id] for other_id in within_same_stride.neighbours(brick_id))
 
-    placeable_brick_list = [PlaceableBrick(brick, set(), set()) for brick in brick_list]
-    for placeable_brick in placeable_brick_list:
-        # find dependencies
-        brick = placeable_brick.brick
-        for other_placeable_brick in placeable_brick_list:
-            other_brick = other_placeable_brick.brick
-            if brick.course_no - 1 == other_brick.course_no and do_bricks_overlap(brick, other_brick):
-                placeable_brick.dependencies.add(other_placeable_brick)
-            if are_bricks_in_same_stride(stride_height, stride_width, brick, other_brick):
-                placeable_brick.within_same_stride.add(other_placeable_brick)
+        if tracing.is_tracing():
+            current.args['dependency_edges'] = len(dependencies.indices)
+            # every pair is in both bricks' lists, and a brick that fits in a stride is in its own
+            current.args['same_stride_pairs'] = sum(
+                1 for placeable_brick in placeable_brick_list for other in placeable_brick.within_same_stride if other.brick_id > placeable_brick.brick_id
+            )
 
     return placeable_brick_list
 
+def unlinked_placeable_brick_list(table: BrickTable, first_brick_id: int = 0) -> PlaceableBrickList:
+    """
+    `PlaceableBrick`s without any dependencies or stride neighbours, for when the bricks only need
+    placing and drawing according to a plan that was made some other way. Only the bricks from
+    `first_brick_id` on, eg the ones in courses just added to the table.
+    """
+    return [PlaceableBrick(table.brick(brick_id), set(), set(), brick_id=brick_id, table=table) for brick_id in range(first_brick_id, len(table))]
+
 def do_bricks_overlap(brick: Brick, other_brick: Brick) -> bool:
     """Return whether the real x ranges of the two bricks overlap at all"""
     # this max/min construction is the intersection range of the two bricks' real x ranges
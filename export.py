@@ -0,0 +1,131 @@
+# Exporting a placement plan for a robot controller, as a stream of placed bricks in placement
+# order with their real coordinates, so the controller doesn't need to know about `Brick`s or
+# relative units. There are two formats with the same fields:
+#
+# - JSON lines, one brick per line, for anything that wants to read it easily
+# - fixed-width little-endian binary records after a short header, which can be memory-mapped and
+#   indexed directly without parsing, for large plans
+#
+# Bricks are written as `apply_placement_order` places them, and each stride's records are written
+# and flushed together once the whole stride is placed, so a controller following the file as it
+# grows can start on the first strides before the rest of the plan is written, and never sees half
+# a stride.
+
+import collections.abc as tyc
+from dataclasses import asdict, astuple, dataclass
+import json
+import mmap
+import struct
+import typing as ty
+
+from placer import PlacementOrder, apply_placement_order
+
+_MAGIC: ty.Final = b'BPLN'
+_VERSION: ty.Final = 1
+# magic, version
+_HEADER: ty.Final = struct.Struct('<4sI')
+# stride, order within the stride, brick id, course, left x, right x (mm), bottom y, top y (mm)
+_RECORD: ty.Final = struct.Struct('<IIIIiidd')
+
+@dataclass(frozen=True)
+class PlacedBrick:
+    stride: int
+    # position of the brick within its stride
+    order: int
+    # index of the brick in `brickify_table`
+    brick_id: int
+    course: int
+    left_x: int
+    right_x: int
+    bottom_y: float
+    top_y: float
+
+class JsonlPlanWriter:
+    def __init__(self, file: ty.TextIO):
+        self.file = file
+
+    def write_stride(self, placed_bricks: list[PlacedBrick]) -> None:
+        self.file.write(''.join(json.dumps(asdict(placed_brick)) + '\n' for placed_brick in placed_bricks))
+        self.file.flush()
+
+class BinaryPlanWriter:
+    def __init__(self, file: ty.BinaryIO):
+        self.file = file
+        self.file.write(_HEADER.pack(_MAGIC, _VERSION))
+        self.file.flush()
+
+    def write_stride(self, placed_bricks: list[PlacedBrick]) -> None:
+        self.file.write(b''.join(_RECORD.pack(*astuple(placed_brick)) for placed_brick in placed_bricks))
+        self.file.flush()
+
+PlanWriter: ty.TypeAlias = JsonlPlanWriter | BinaryPlanWriter
+
+def export_placement_order(placement_order: PlacementOrder, writers: list[PlanWriter], first_stride: int = 0) -> None:
+    """
+    Place the bricks of the `placement_order` (see `apply_placement_order`, which this mutates the
+    bricks with), writing each stride to every writer as soon as it's placed. The strides are
+    numbered from `first_stride`, for exporting a plan a few strides at a time.
+    """
+    steps = apply_placement_order(placement_order, first_stride)
+    for stride_no, stride in enumerate(placement_order, start=first_stride):
+        placed_bricks: list[PlacedBrick] = []
+        for order, placeable_brick in enumerate(stride):
+            next(steps)
+            left_x, right_x, bottom_y, top_y = placeable_brick.real_extents()
+            placed_bricks.append(PlacedBrick(stride_no, order, placeable_brick.brick_id, placeable_brick.brick.course_no, left_x, right_x, bottom_y, top_y))
+        for writer in writers:
+            writer.write_stride(placed_bricks)
+
+def read_jsonl_plan(file: ty.TextIO) -> tyc.Iterator[PlacedBrick]:
+    for line in file:
+        if line.strip():
+            yield PlacedBrick(**json.loads(line))
+
+class BinaryPlanReader:
+    """
+    A binary plan, memory-mapped so that records are only decoded when they're looked at. Only the
+    records that were completely written when the file was opened are visible, so to follow a plan
+    that's still being written, open it again.
+    """
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            self._file.close()
+            raise ValueError(f"{path} is too short to be a plan")
+        magic, version = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION:
+            self._file.close()
+            raise ValueError(f"{path} isn't a version {_VERSION} plan")
+        self._file.seek(0, 2)
+        size = self._file.tell()
+        # a partly written record at the end is left out
+        self._len = (size - _HEADER.size) // _RECORD.size
+        # mmap can't map an empty range
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._len > 0 else None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index: int) -> PlacedBrick:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len or self._map is None:
+            raise IndexError("plan record index out of range")
+        return PlacedBrick(*_RECORD.unpack_from(self._map, _HEADER.size + index * _RECORD.size))
+
+    def __iter__(self) -> tyc.Iterator[PlacedBrick]:
+        for index in range(self._len):
+            yield self[index]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> ty.Self:
+        return self
+
+    def __exit__(self, *_: ty.Any) -> None:
+        self.close()
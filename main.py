@@ -1,13 +1,119 @@
 import argparse
+import asyncio
+import atexit
+import collections.abc as tyc
+import contextlib
+import time
 from datetime import timedelta
+from functools import partial
 
-from bonds import flemish_bond, stretcher_bond, cross_bond, wild_bond
-from brickifier import brickify
-from dependency_graph import brick_list_to_placeable_brick_list
-from placer import apply_placement_order, optimal_placement_order
-from printer import interactive_print_placed_bricks, print_bricks
+from bonds import cross_courses, detect_period, flemish_courses, flemish_bond, native_wild_bond, native_wild_courses, stretcher_bond, stretcher_courses, cross_bond, wild_bond
+from brickifier import BrickTable, brickify_course, brickify_table
+from decomposition import decomposed_placement_order, periodic_placement_order
+from dependency_graph import PlaceableBrickList, brick_list_to_placeable_brick_list, unlinked_placeable_brick_list
+from export import BinaryPlanWriter, JsonlPlanWriter, PlanWriter, export_placement_order
+from placer import MoveCost, PlacementOrder, PlanProgress, anytime_placement_order, apply_placement_order, greedy_placement_order, head_travel_distances, optimal_placement_order, platform_travel, portfolio_placement_order, settled_placement_order, stride_count_lower_bound, unstrided_placement_order
+from printer import incremental_print_placed_bricks, interactive_print_placed_bricks, print_bricks
+from rolling import rolling_placement_order
+from solver_cache import SolverCache
+import tracing
 
 
+def _plan_writers(args: argparse.Namespace, files: contextlib.ExitStack) -> list[PlanWriter]:
+    writers: list[PlanWriter] = []
+    if args.export_jsonl is not None:
+        writers.append(JsonlPlanWriter(files.enter_context(open(args.export_jsonl, 'w'))))
+    if args.export_binary is not None:
+        writers.append(BinaryPlanWriter(files.enter_context(open(args.export_binary, 'wb'))))
+    return writers
+
+def _report_travel(placement_order: PlacementOrder, move_cost: MoveCost) -> None:
+    distances = head_travel_distances(placement_order)
+    for i, distance in enumerate(distances):
+        print(f"Stride {i}: head travels {distance:.0f}mm")
+    print(f"Total head travel: {sum(distances):.0f}mm")
+    print(f"Platform travel between {len(placement_order)} strides: {platform_travel(placement_order, move_cost):.0f}")
+
+def _rolling_main(args: argparse.Namespace, courses: tyc.Iterator[list[float]], width: float, move_cost: MoveCost, cache: SolverCache) -> None:
+    """
+    Plan with the rolling planner, placing (and drawing or exporting) the strides of each step as
+    soon as they're committed, before the next step is planned. The courses are only brickified as
+    the planner reads them, so there's never more of the wall than the planner has seen.
+    """
+    table = BrickTable()
+    placeable_bricks: PlaceableBrickList = []
+
+    def read_courses() -> tyc.Iterator[list[float]]:
+        for course in courses:
+            first_brick_id = len(table)
+            brickify_course(table, course, width)
+            placeable_bricks.extend(unlinked_placeable_brick_list(table, first_brick_id))
+            yield course
+
+    start = time.perf_counter()
+    first_stride_seconds = None
+    slowest_step = 0.0
+    num_steps = 0
+    placement_order: PlacementOrder = []
+    with contextlib.ExitStack() as files:
+        writers = _plan_writers(args, files)
+        for step in rolling_placement_order(
+            read_courses(),
+            args.num_courses,
+            width,
+            stride_height=args.stride_height,
+            stride_width=args.stride_width,
+            horizon_height=args.horizon_height,
+            time_limit=timedelta(seconds=args.horizon_time_limit) if args.horizon_time_limit is not None else None,
+            model=args.stride_model,
+            cache=cache,
+        ):
+            if first_stride_seconds is None:
+                first_stride_seconds = time.perf_counter() - start
+            slowest_step = max(slowest_step, step.seconds)
+            num_steps += 1
+            # the step's bricks are all in courses the planner has read, so they're in the table
+            step_order = [[placeable_bricks[brick_id] for brick_id in stride] for stride in step.strides]
+            first_stride = len(placement_order)
+            placement_order.extend(step_order)
+            if len(writers) > 0:
+                with tracing.span('export', first_stride=first_stride):
+                    export_placement_order(step_order, writers, first_stride)
+            elif args.instant:
+                for _ in apply_placement_order(step_order, first_stride):
+                    pass
+            elif args.render == 'incremental' or args.autoplay is not None:
+                # the wall grows as the planner reads more courses, so it's drawn again for each step
+                incremental_print_placed_bricks(placeable_bricks, step_order, autoplay_rate=args.autoplay, first_stride=first_stride)
+            else:
+                interactive_print_placed_bricks(placeable_bricks, step_order, first_stride)
+    if len(writers) > 0 or args.instant:
+        with tracing.span('print_bricks'):
+            print_bricks(placeable_bricks)
+
+    lower_bound = stride_count_lower_bound(placeable_bricks, args.stride_height, args.stride_width)
+    print(f"Rolling planner found {len(placement_order)} strides in {num_steps} steps (lower bound for the whole wall {lower_bound})")
+    print(f"First strides committed after {first_stride_seconds or 0.0:.2f}s, slowest step {slowest_step:.2f}s")
+    if args.compare_global:
+        # by now the planner has read the whole wall
+        whole_wall = brick_list_to_placeable_brick_list(args.stride_height, args.stride_width, table)
+        greedy_order = greedy_placement_order(whole_wall, args.stride_height, args.stride_width)
+        global_plan = optimal_placement_order(
+            whole_wall,
+            time_limit=timedelta(seconds=args.time_limit),
+            warm_start=greedy_order,
+            model=args.stride_model,
+            stride_height=args.stride_height,
+            stride_width=args.stride_width,
+            cache=cache,
+        )
+        print(f"Planning the whole wall at once: greedy {len(greedy_order)} strides, optimal {global_plan.num_strides} strides")
+        print(f"The rolling horizon costs {len(placement_order) - global_plan.num_strides} strides more than the whole wall solve")
+
+    if args.report_travel:
+        _report_travel(placement_order, move_cost)
+    tracing.instant('plan', planner=args.planner, strides=len(placement_order))
+
 def main():
     parser = argparse.ArgumentParser(description="Brick placement simulator.")
     parser.add_argument(
@@ -23,17 +129,96 @@ def main():
         type=float,
         help='Width of the wall in stretchers (relative units). If not provided, a default will be used based on the bond type.'
     )
+    parser.add_argument(
+        '--wild-generator',
+        type=str,
+        default='solver',
+        choices=['solver', 'native'],
+        help='How to generate the wild bond. "native" searches for it a few courses at a time in Python without Minizinc, which is much faster for large walls.',
+    )
+    parser.add_argument('--seed', type=int, help='Random seed for the native wild bond generator, for reproducible walls.')
     parser.add_argument('--stride-height', type=float, default=1300.0, help='Stride height in mm')
     parser.add_argument('--stride-width', type=int, default=800, help='Stride width in mm')
     parser.add_argument('--time-limit', type=int, default=20, help='Time limit in seconds for optimal placement order computation.')
+    parser.add_argument(
+        '--planner',
+        type=str,
+        default='optimal',
+        choices=['optimal', 'decomposed', 'periodic', 'rolling', 'greedy', 'unstrided'],
+        help='How to split the bricks into strides. "optimal" runs the solver seeded with the "greedy" heuristic, which is fast but not optimal. "decomposed" runs the solver separately on bands of the wall in parallel. "periodic" is like "decomposed" but lines the bands up with the period of a regular bond, and only builds and solves the first band and the top one, repeating the first band\'s plan up the wall. "rolling" plans a few courses at a time from the bottom up, committing the lowest strides before moving on, so the first strides are ready after the same time however tall the wall is.',
+    )
+    parser.add_argument('--horizon-height', type=float, help='Height in mm of the courses the rolling planner plans at a time. Defaults to twice the stride height.')
+    parser.add_argument('--horizon-time-limit', type=float, help='Time limit in seconds for solving each horizon of the rolling planner. Each horizon is planned greedily if not provided.')
+    parser.add_argument('--compare-global', action='store_true', help='With the rolling planner, also plan the whole wall at once, greedily and with the solver, and print how many more strides the rolling planner needed.')
+    parser.add_argument('--band-height', type=float, help='Height in mm of the bands for the decomposed planner. Defaults to the stride height.')
+    parser.add_argument('--band-width', type=int, help='Width in mm of the bands for the decomposed planner. If not provided, bands span the whole wall.')
+    parser.add_argument('--portfolio', action='store_true', help='Race several installed solvers and models against each other within the time limit and use the best result, for the optimal planner and the wild bond solver.')
+    parser.add_argument('--anytime', action='store_true', help='Show each better plan as the optimal planner finds it, instead of waiting for the solver to finish.')
+    parser.add_argument('--commit-after', type=float, help='With --anytime, stop the solver and use the best plan so far once it has not improved for this many seconds.')
+    parser.add_argument(
+        '--stride-model',
+        type=str,
+        default='matrix',
+        choices=['matrix', 'positional'],
+        help='Minizinc model used by the optimal planner. "positional" scales better to large walls.',
+    )
+    parser.add_argument(
+        '--solver-cache',
+        type=str,
+        default='use',
+        choices=['use', 'refresh', 'bypass'],
+        help='Whether to reuse solver results from previous identical runs. "refresh" re-solves and overwrites them.',
+    )
+    parser.add_argument('--cache-dir', type=str, help='Directory for the solver cache. Defaults to ~/.cache/monumental-take-home-test')
+    parser.add_argument('--cache-max-mb', type=int, default=64, help='Size in MB above which the least recently used cache entries are evicted.')
+    parser.add_argument(
+        '--minimize-travel',
+        action='store_true',
+        help='With the optimal planner, then reorder the strides so the platform moves as little as possible between them, keeping the number of strides. Runs the solver a second time, with the same time limit.',
+    )
+    parser.add_argument(
+        '--move-cost',
+        type=int,
+        nargs=2,
+        default=[1, 1],
+        metavar=('HORIZONTAL', 'VERTICAL'),
+        help='Relative cost per mm of moving the platform along the wall and up or down, for --minimize-travel and --report-travel.',
+    )
+    parser.add_argument('--report-travel', action='store_true', help='Print how far the placement head moves within each stride, and the platform between strides.')
     parser.add_argument(
         '--instant',
         action='store_true',
         help='Print the final colors instead of placing bricks one-by-one with ENTER',
     )
+    parser.add_argument(
+        '--render',
+        type=str,
+        default='full',
+        choices=['full', 'incremental'],
+        help='When placing bricks one-by-one, whether to reprint the whole wall after each brick or only redraw the placed brick. "incremental" needs the wall to fit on the terminal.',
+    )
+    parser.add_argument('--autoplay', type=float, help='Place this many bricks per second instead of waiting for ENTER. Implies --render incremental.')
+
+    parser.add_argument('--export-jsonl', type=str, help='Write the plan to this file as JSON lines, one placed brick per line, then print the finished wall.')
+    parser.add_argument('--export-binary', type=str, help='Write the plan to this file as fixed-width binary records (see export.py), then print the finished wall.')
+    parser.add_argument(
+        '--trace',
+        type=str,
+        help='Write a trace of how long each stage took, with solver statistics, to this file. Chrome trace format (for chrome://tracing or ui.perfetto.dev) if it ends in .json, otherwise JSON lines.',
+    )
 
     args = parser.parse_args()
 
+    if args.autoplay is not None and args.autoplay <= 0:
+        parser.error("--autoplay must be a positive number of bricks per second")
+    if args.minimize_travel and (args.planner != 'optimal' or args.anytime or args.portfolio):
+        parser.error("--minimize-travel only works with the optimal planner, without --anytime or --portfolio")
+    move_cost = MoveCost(*args.move_cost)
+
+    if args.trace is not None:
+        # written on the way out, even if the interactive printer is interrupted
+        atexit.register(tracing.start_tracing().write, args.trace)
+
     width = args.width
     if width is None:
         if args.bond == 'stretcher':
@@ -45,23 +230,142 @@ def main():
         elif args.bond == 'wild':
             width = 5.0  # multiple of 0.25
 
+    courses_fn_map = {
+        'stretcher': stretcher_courses,
+        'flemish': flemish_courses,
+        'cross': cross_courses,
+    }
+    period = 1
+    if args.planner == 'periodic':
+        detected_period = detect_period(courses_fn_map[args.bond](width)) if args.bond in courses_fn_map else None
+        if detected_period is None:
+            parser.error(f"The {args.bond} bond isn't periodic, use --planner decomposed instead")
+        period = detected_period
+        print(f"Bond repeats every {period} courses")
+
+    cache = SolverCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024, mode=args.solver_cache)
+
     bond_fn_map = {
         'stretcher': stretcher_bond,
         'flemish': flemish_bond,
         'cross': cross_bond,
-        'wild': wild_bond,
+        'wild': partial(native_wild_bond, seed=args.seed) if args.wild_generator == 'native' else partial(wild_bond, cache=cache, portfolio=args.portfolio),
     }
     bond_fn = bond_fn_map[args.bond]
-    bond = bond_fn(args.num_courses, width)
+    if args.planner == 'rolling':
+        if args.bond in courses_fn_map:
+            courses = courses_fn_map[args.bond](width)
+        elif args.wild_generator == 'native':
+            courses = native_wild_courses(width, seed=args.seed)
+        else:
+            # the solver lays the whole wild bond at once, so there's no way around waiting for it
+            with tracing.span('bond', bond=args.bond, courses=args.num_courses, width=width):
+                courses = iter(bond_fn(args.num_courses, width))
+        _rolling_main(args, courses, width, move_cost, cache)
+        return
+
+    with tracing.span('bond', bond=args.bond, courses=args.num_courses, width=width):
+        bond = bond_fn(args.num_courses, width)
+
+    with tracing.span('brickify') as brickify_span:
+        bricks = brickify_table(bond, width)
+        brickify_span.args['bricks'] = len(bricks)
+    if args.planner == 'periodic':
+        # the periodic planner builds the bricks it needs itself, so the whole wall is only needed
+        # for drawing it and doesn't need a dependency graph
+        placeable_bricks = unlinked_placeable_brick_list(bricks)
+    else:
+        placeable_bricks = brick_list_to_placeable_brick_list(args.stride_height, args.stride_width, bricks)
+    if args.planner == 'unstrided':
+        placement_order = unstrided_placement_order(placeable_bricks)
+    elif args.planner == 'periodic':
+        placement_order = periodic_placement_order(
+            courses_fn_map[args.bond](width),
+            args.num_courses,
+            width,
+            period,
+            time_limit=timedelta(seconds=args.time_limit),
+            stride_height=args.stride_height,
+            stride_width=args.stride_width,
+            band_height=args.band_height,
+            band_width=args.band_width,
+            model=args.stride_model,
+            cache=cache,
+        ).placement_order(placeable_bricks)
+    elif args.planner == 'decomposed':
+        placement_order = decomposed_placement_order(
+            placeable_bricks,
+            time_limit=timedelta(seconds=args.time_limit),
+            stride_height=args.stride_height,
+            stride_width=args.stride_width,
+            band_height=args.band_height,
+            band_width=args.band_width,
+            model=args.stride_model,
+            cache=cache,
+        ).placement_order
+    else:
+        placement_order = greedy_placement_order(placeable_bricks, args.stride_height, args.stride_width)
+        print(f"Greedy planner found {len(placement_order)} strides")
+        if args.planner == 'optimal' and args.anytime:
+            def show_progress(progress: PlanProgress) -> None:
+                done = " (done)" if progress.final else ""
+                print(f"[{progress.elapsed:6.2f}s] {progress.plan.num_strides} strides, lower bound {progress.plan.lower_bound}{done}")
+
+            plan = asyncio.run(settled_placement_order(
+                anytime_placement_order(
+                    placeable_bricks,
+                    time_limit=timedelta(seconds=args.time_limit),
+                    warm_start=placement_order,
+                    model=args.stride_model,
+                    stride_height=args.stride_height,
+                    stride_width=args.stride_width,
+                    cache=cache,
+                ),
+                stable_for=timedelta(seconds=args.commit_after) if args.commit_after is not None else None,
+                on_progress=show_progress,
+            ))
+            placement_order = plan.placement_order
+        elif args.planner == 'optimal' and args.portfolio:
+            plan = portfolio_placement_order(
+                placeable_bricks,
+                time_limit=timedelta(seconds=args.time_limit),
+                warm_start=placement_order,
+                stride_height=args.stride_height,
+                stride_width=args.stride_width,
+                cache=cache,
+            )
+            placement_order = plan.placement_order
+        elif args.planner == 'optimal':
+            plan = optimal_placement_order(
+                placeable_bricks,
+                time_limit=timedelta(seconds=args.time_limit),
+                warm_start=placement_order,
+                model=args.stride_model,
+                stride_height=args.stride_height,
+                stride_width=args.stride_width,
+                cache=cache,
+                move_cost=move_cost if args.minimize_travel else None,
+            )
+            placement_order = plan.placement_order
 
-    bricks = brickify(bond, width)
-    placeable_bricks = brick_list_to_placeable_brick_list(args.stride_height, args.stride_width, bricks)
-    placement_order = optimal_placement_order(placeable_bricks, time_limit=timedelta(seconds=args.time_limit))
+    if args.report_travel:
+        _report_travel(placement_order, move_cost)
 
-    if args.instant:
+    tracing.instant('plan', planner=args.planner, strides=len(placement_order))
+    if args.export_jsonl is not None or args.export_binary is not None:
+        with contextlib.ExitStack() as files:
+            writers = _plan_writers(args, files)
+            with tracing.span('export'):
+                export_placement_order(placement_order, writers)
+        # exporting placed all the bricks
+        print_bricks(placeable_bricks)
+    elif args.instant:
         for _ in apply_placement_order(placement_order):
             pass
-        print_bricks(placeable_bricks)
+        with tracing.span('print_bricks'):
+            print_bricks(placeable_bricks)
+    elif args.render == 'incremental' or args.autoplay is not None:
+        incremental_print_placed_bricks(placeable_bricks, placement_order, autoplay_rate=args.autoplay)
     else:
         interactive_print_placed_bricks(placeable_bricks, placement_order)
 
@@ -1,14 +1,24 @@
+from __future__ import annotations
+
 from datetime import timedelta
-import minizinc
-import os
 
+import asyncio
 from collections import defaultdict
 import collections.abc as tyc
-from math import ceil
+from dataclasses import dataclass
+from bisect import bisect_left, insort
+from math import ceil, hypot
 import time
 import typing as ty
 
+from brickifier import courses_within_height
 from dependency_graph import PlaceableBrick, PlaceableBrickList
+from portfolio import SolverConfig, available_configs, available_cpus, lookup_solver, minizinc_racer, race
+from solver_cache import SolverCache
+import tracing
+
+if ty.TYPE_CHECKING:
+    import minizinc
 
 _STRIDE_HEIGHT: ty.Final = 1300.0
 _STRIDE_WIDTH: ty.Final = 800
@@ -17,59 +27,360 @@ _STRIDE_WIDTH: ty.Final = 800
 # placed within that stride.
 PlacementOrder: ty.TypeAlias = list[list[PlaceableBrick]]
 
+# (x, y) in real units
+_Point: ty.TypeAlias = tuple[float, float]
+
+def _midpoint(placeable_brick: PlaceableBrick) -> _Point:
+    left_x, right_x, bottom_y, top_y = placeable_brick.real_extents()
+    return ((left_x + right_x) / 2, (top_y + bottom_y) / 2)
+
+class _ReadyBricks:
+    """
+    The bricks that are ready to place, indexed so we can quickly find the one closest to a point.
+    Bricks are bucketed by course (every brick in a course has the same y) and kept sorted by x
+    within each course, so the closest brick in a course is one of the two either side of a bisect.
+    There are only as many courses as fit in a stride, so a query is a handful of bisects.
+    """
+    def __init__(self) -> None:
+        # course_no -> sorted list of (mid_x, tie breaker, brick)
+        self._courses: dict[int, list[tuple[float, int, PlaceableBrick]]] = {}
+        self._mid_ys: dict[int, float] = {}
+        self._counter = 0
+
+    def add(self, placeable_brick: PlaceableBrick, midpoint: _Point) -> None:
+        course_no = placeable_brick.brick.course_no
+        # the counter makes ties deterministic and keeps bricks themselves from being compared
+        insort(self._courses.setdefault(course_no, []), (midpoint[0], self._counter, placeable_brick))
+        self._mid_ys[course_no] = midpoint[1]
+        self._counter += 1
+
+    def pop_closest(self, point: _Point) -> PlaceableBrick | None:
+        best: tuple[float, int, int] | None = None  # (sq distance, course_no, index)
+        # visiting the courses by vertical distance lets us stop once the courses are further away
+        # vertically than the best brick is in total
+        for course_no in sorted(self._courses, key=lambda course_no: abs(self._mid_ys[course_no] - point[1])):
+            sq_dy = (self._mid_ys[course_no] - point[1]) ** 2
+            if best is not None and sq_dy >= best[0]:
+                break
+            course = self._courses[course_no]
+            i = bisect_left(course, (point[0],))
+            for j in (i - 1, i):
+                if 0 <= j < len(course):
+                    sq_distance = (course[j][0] - point[0]) ** 2 + sq_dy
+                    if best is None or sq_distance < best[0]:
+                        best = (sq_distance, course_no, j)
+        if best is None:
+            return None
+
+        _, course_no, j = best
+        course = self._courses[course_no]
+        _, _, placeable_brick = course.pop(j)
+        if len(course) == 0:
+            del self._courses[course_no]
+        return placeable_brick
+
 # not how we don't use PlaceableBrickList here because the return val is probably not in the usual
 # order
-def _topo_sort(placeable_bricks: set[PlaceableBrick]) -> list[PlaceableBrick]:
-    deps_hash = {
-        placeable_brick: {dep for dep in placeable_brick.dependencies if dep in placeable_bricks}
+def _topo_sort(placeable_bricks: set[PlaceableBrick], head: _Point = (0.0, 0.0)) -> list[PlaceableBrick]:
+    """
+    Topo sort the bricks, starting with the placement head at `head`. The head moves to each brick
+    as it's placed.
+    """
+    num_deps = {
+        placeable_brick: sum(1 for dep in placeable_brick.dependencies if dep in placeable_bricks)
         for placeable_brick in placeable_bricks
     }
     rev_deps_hash: defaultdict[PlaceableBrick, list[PlaceableBrick]] = defaultdict(list)
-    for placeable_brick, deps in deps_hash.items():
-        for dep in deps:
-            rev_deps_hash[dep].append(placeable_brick)
+    for placeable_brick in placeable_bricks:
+        for dep in placeable_brick.dependencies:
+            if dep in placeable_bricks:
+                rev_deps_hash[dep].append(placeable_brick)
+    midpoints = {placeable_brick: _midpoint(placeable_brick) for placeable_brick in placeable_bricks}
 
     # to make the order maybe a little more realistic for a robot, prefer the brick closest to the
     # placement head rather than an arbitrary topo order.
-    head_x = 0
-    head_y = 0
-
-    def sq_distance(placeable_brick: PlaceableBrick) -> float:
-        brick = placeable_brick.brick
-        mid_x = (brick.real_left_x() + brick.real_right_x()) / 2
-        mid_y = (brick.real_top_y() + brick.real_bottom_y()) / 2
-        return (mid_x - head_x) ** 2 + (mid_y - head_y) ** 2
+    ready = _ReadyBricks()
+    for placeable_brick, count in num_deps.items():
+        if count == 0:
+            ready.add(placeable_brick, midpoints[placeable_brick])
 
     result: list[PlaceableBrick] = []
 
-    # this is a run-of-the-mill topo sort with the tie breaking described above
-    while len(deps_hash) > 0:
-        immediately_placeable_bricks = (placeable_brick for placeable_brick, deps in deps_hash.items() if len(deps) == 0)
-        closest_immediately_placeable_brick: PlaceableBrick | None = None
-        for immediately_placeable_brick in immediately_placeable_bricks:
-            if closest_immediately_placeable_brick is None or sq_distance(immediately_placeable_brick) < sq_distance(closest_immediately_placeable_brick):
-                closest_immediately_placeable_brick = immediately_placeable_brick
-
+    # this is a run-of-the-mill topo sort (Kahn's algorithm) with the tie breaking described above
+    while len(result) < len(placeable_bricks):
+        closest_immediately_placeable_brick = ready.pop_closest(head)
         if closest_immediately_placeable_brick is None:
             raise ValueError("Tried to topo sort a cyclic graph")
-        del deps_hash[closest_immediately_placeable_brick]
         for rev_dep in rev_deps_hash[closest_immediately_placeable_brick]:
-            if rev_dep in deps_hash:
-                deps_hash[rev_dep].remove(closest_immediately_placeable_brick)
+            num_deps[rev_dep] -= 1
+            if num_deps[rev_dep] == 0:
+                ready.add(rev_dep, midpoints[rev_dep])
 
         result.append(closest_immediately_placeable_brick)
+        head = midpoints[closest_immediately_placeable_brick]
 
     return result
 
+def _order_strides(strides: tyc.Iterable[set[PlaceableBrick]]) -> PlacementOrder:
+    """
+    Topo sort each stride, carrying the placement head over from the last brick of the previous
+    stride.
+    """
+    placement_order: PlacementOrder = []
+    head: _Point = (0.0, 0.0)
+    for stride in strides:
+        placement_order.append(_topo_sort(stride, head))
+        if len(placement_order[-1]) > 0:
+            head = _midpoint(placement_order[-1][-1])
+    return placement_order
+
+def head_travel_distances(placement_order: PlacementOrder) -> list[float]:
+    """
+    How far the placement head moves within each stride, in mm, going straight from brick to brick.
+    Each stride starts from the last brick of the previous one, like `_order_strides` assumes.
+    """
+    distances: list[float] = []
+    head: _Point = (0.0, 0.0)
+    for stride in placement_order:
+        distance = 0.0
+        for placeable_brick in stride:
+            midpoint = _midpoint(placeable_brick)
+            distance += hypot(midpoint[0] - head[0], midpoint[1] - head[1])
+            head = midpoint
+        distances.append(distance)
+    return distances
+
+@dataclass(frozen=True)
+class MoveCost:
+    """
+    What moving the platform between strides costs per mm horizontally and vertically, eg if
+    raising the platform is slower than driving it along the wall. Only the ratio matters.
+    """
+    horizontal: int = 1
+    vertical: int = 1
+
+def _stride_centre(stride: list[PlaceableBrick]) -> _Point:
+    """The centre of the bounding box of the stride's bricks, which is where the platform goes"""
+    extents = [placeable_brick.real_extents() for placeable_brick in stride]
+    return (
+        (min(left_x for left_x, _, _, _ in extents) + max(right_x for _, right_x, _, _ in extents)) / 2,
+        (min(bottom_y for _, _, bottom_y, _ in extents) + max(top_y for _, _, _, top_y in extents)) / 2,
+    )
+
+def platform_travel(placement_order: PlacementOrder, move_cost: MoveCost = MoveCost()) -> float:
+    """
+    The cost of moving the platform from each stride to the next, going along the wall and up or
+    down separately. With the default `move_cost` it's the distance in mm.
+    """
+    centres = [_stride_centre(stride) for stride in placement_order if len(stride) > 0]
+    return sum(
+        move_cost.horizontal * abs(x - previous_x) + move_cost.vertical * abs(y - previous_y)
+        for (previous_x, previous_y), (x, y) in zip(centres, centres[1:])
+    )
+
 def unstrided_placement_order(placeable_brick_list: PlaceableBrickList) -> PlacementOrder:
     """Place all the bricks in a single stride"""
     return [_topo_sort(set(placeable_brick_list))]
 
-def optimal_placement_order(placeable_brick_list: PlaceableBrickList, time_limit: timedelta) -> PlacementOrder:
+# real (left x, right x, bottom y, top y) of a brick, looked up once up front for the heuristics below
+_Extents: ty.TypeAlias = tuple[int, int, float, float]
+
+def _real_extents(placeable_brick_list: PlaceableBrickList) -> dict[PlaceableBrick, _Extents]:
+    return {placeable_brick: placeable_brick.real_extents() for placeable_brick in placeable_brick_list}
+
+def _greedy_strides(placeable_brick_list: PlaceableBrickList, extents: dict[PlaceableBrick, _Extents], stride_height: float, stride_width: int) -> list[set[PlaceableBrick]]:
     """
-    Compute the optimal, multi-stride brick placement order using a discrete optimizer (effectively
-    a SAT solver)
+    Sweep a stride window over the wall bottom-up, left-to-right. Each stride is anchored at the
+    lowest, leftmost unplaced brick, and of all the window positions containing that brick, we pick
+    the one that can place the most bricks given the dependencies.
+    """
+    # dependencies on bricks outside of the list are considered satisfied, so that we can plan part
+    # of a wall
+    members = set(placeable_brick_list)
+    # bottom-up, left-to-right
+    sort_key = lambda placeable_brick: (placeable_brick.brick.course_no, extents[placeable_brick][0])
+    pending = sorted(placeable_brick_list, key=sort_key)
+    placed: set[PlaceableBrick] = set()
+    strides: list[set[PlaceableBrick]] = []
+    # otherwise there's no window to put such a brick's stride in, however the rest are placed
+    for placeable_brick in pending:
+        left_x, right_x, bottom_y, top_y = extents[placeable_brick]
+        if right_x - left_x > stride_width or top_y - bottom_y > stride_height:
+            raise ValueError(f"{placeable_brick.brick} is {right_x - left_x}x{top_y - bottom_y:g}mm, which doesn't fit in a {stride_width}x{stride_height:g}mm stride")
+
+    next_pending_i = 0
+    while next_pending_i < len(pending):
+        anchor = pending[next_pending_i]
+        # every brick below the anchor, or left of it in the same course, is already placed, so
+        # the anchor is ready and it's never worse to put the window's bottom edge on the anchor
+        anchor_left_x, anchor_right_x, window_bottom_y, _ = extents[anchor]
+        window_top_y = window_bottom_y + stride_height
+        candidates = sorted(
+            (other for other in anchor.within_same_stride if other in members and other not in placed),
+            key=sort_key,
+        )
+        # sliding a window right until its left edge hits a brick never loses any bricks, so we only
+        # need to try windows whose left edge is some brick's left edge.
+        window_left_xs = sorted({
+            extents[other][0] for other in candidates
+            if anchor_right_x - stride_width <= extents[other][0] <= anchor_left_x
+        })
+
+        best_stride: set[PlaceableBrick] = set()
+        for window_left_x in window_left_xs:
+            stride: set[PlaceableBrick] = set()
+            # dependencies are always in the course below, so a single bottom-up pass is enough to
+            # also pick up bricks that depend on other bricks in this same stride.
+            for candidate in candidates:
+                left_x, right_x, bottom_y, top_y = extents[candidate]
+                if (left_x >= window_left_x and right_x <= window_left_x + stride_width
+                        and bottom_y >= window_bottom_y and top_y <= window_top_y
+                        and all(dep in placed or dep in stride or dep not in members for dep in candidate.dependencies)):
+                    stride.add(candidate)
+            # strict comparison means ties go to the leftmost window, which keeps the sweep tidy
+            if len(stride) > len(best_stride):
+                best_stride = stride
+
+        assert anchor in best_stride, "the anchor is always placeable in a window containing it"
+        strides.append(best_stride)
+        placed |= best_stride
+        while next_pending_i < len(pending) and pending[next_pending_i] in placed:
+            next_pending_i += 1
+
+    return strides
+
+def _eliminate_strides(strides: list[set[PlaceableBrick]], extents: dict[PlaceableBrick, _Extents], stride_height: float, stride_width: int) -> list[set[PlaceableBrick]]:
+    """
+    Local search over a valid stride assignment: try to empty each stride, smallest first, by moving
+    each of its bricks into some other stride where it still fits in the window and respects the
+    dependency order. Returns the strides that remain, still in a valid order.
+    """
+    stride_of: dict[PlaceableBrick, int] = {
+        placeable_brick: stride_no for stride_no, stride in enumerate(strides) for placeable_brick in stride
+    }
+    dependents: defaultdict[PlaceableBrick, list[PlaceableBrick]] = defaultdict(list)
+    for placeable_brick in stride_of:
+        for dep in placeable_brick.dependencies:
+            if dep in stride_of:
+                dependents[dep].append(placeable_brick)
+    strides = [set(stride) for stride in strides]
+
+    def fits(placeable_brick: PlaceableBrick, stride_no: int) -> bool:
+        bricks_extents = [extents[other] for other in strides[stride_no]] + [extents[placeable_brick]]
+        return (max(right_x for _, right_x, _, _ in bricks_extents) - min(left_x for left_x, _, _, _ in bricks_extents) <= stride_width
+                and max(top_y for _, _, _, top_y in bricks_extents) - min(bottom_y for _, _, bottom_y, _ in bricks_extents) <= stride_height)
+
+    for stride_no in sorted(range(len(strides)), key=lambda stride_no: len(strides[stride_no])):
+        moves: list[tuple[PlaceableBrick, int]] = []
+        # moving bricks out one at a time in topo order keeps the dependency bounds of the later
+        # bricks up to date with the earlier moves
+        for placeable_brick in sorted(strides[stride_no], key=lambda placeable_brick: (placeable_brick.brick.course_no, extents[placeable_brick][0])):
+            earliest = max((stride_of[dep] for dep in placeable_brick.dependencies if dep in stride_of), default=0)
+            latest = min((stride_of[dependent] for dependent in dependents[placeable_brick]), default=len(strides) - 1)
+            target = next(
+                (other_no for other_no in range(earliest, latest + 1)
+                 if other_no != stride_no and len(strides[other_no]) > 0 and fits(placeable_brick, other_no)),
+                None,
+            )
+            if target is None:
+                break
+            strides[stride_no].remove(placeable_brick)
+            strides[target].add(placeable_brick)
+            stride_of[placeable_brick] = target
+            moves.append((placeable_brick, target))
+        else:
+            continue
+        # couldn't empty the stride, so undo the moves we made
+        for placeable_brick, target in moves:
+            strides[target].remove(placeable_brick)
+            strides[stride_no].add(placeable_brick)
+            stride_of[placeable_brick] = stride_no
+
+    return [stride for stride in strides if len(stride) > 0]
+
+def greedy_placement_order(
+        placeable_brick_list: PlaceableBrickList,
+        stride_height: float = _STRIDE_HEIGHT,
+        stride_width: int = _STRIDE_WIDTH,
+) -> PlacementOrder:
     """
+    Compute a multi-stride placement order with a fast heuristic instead of a solver. Not optimal,
+    but valid, and a good upper bound to seed `optimal_placement_order` with.
+    """
+    with tracing.span('greedy_placement_order', bricks=len(placeable_brick_list)) as current:
+        extents = _real_extents(placeable_brick_list)
+        strides = _greedy_strides(placeable_brick_list, extents, stride_height, stride_width)
+        current.args['greedy_strides'] = len(strides)
+        strides = _eliminate_strides(strides, extents, stride_height, stride_width)
+        current.args['strides'] = len(strides)
+        return _order_strides(strides)
+
+def stride_count_lower_bound(
+        placeable_brick_list: PlaceableBrickList,
+        stride_height: float = _STRIDE_HEIGHT,
+        stride_width: int = _STRIDE_WIDTH,
+) -> int:
+    """
+    A cheap lower bound on the number of strides any valid placement order needs, from a greedy
+    clique of bricks that pairwise can't share a stride.
+    """
+    # Bricks in courses more than `stride_courses` apart can never share a stride, and within a
+    # course, scanning left-to-right and taking each brick that's too far right to share a stride
+    # with the last one taken gives a maximum set of bricks that pairwise can't share a stride
+    # (it's the same greedy as for covering intervals). Combining courses spaced far enough apart
+    # gives a clique, and we try each starting course to find the biggest one.
+    stride_courses = courses_within_height(stride_height)
+    xs_by_course: defaultdict[int, list[tuple[int, int]]] = defaultdict(list)
+    for placeable_brick in placeable_brick_list:
+        left_x, right_x, _, _ = placeable_brick.real_extents()
+        xs_by_course[placeable_brick.brick.course_no].append((left_x, right_x))
+
+    course_clique_sizes: dict[int, int] = {}
+    for course_no, xs in xs_by_course.items():
+        clique_size = 0
+        last_left_x: int | None = None
+        for left_x, right_x in sorted(xs):
+            if last_left_x is None or right_x - last_left_x > stride_width:
+                clique_size += 1
+                last_left_x = left_x
+        course_clique_sizes[course_no] = clique_size
+
+    if len(course_clique_sizes) == 0:
+        return 0
+    min_course_no = min(course_clique_sizes)
+    max_course_no = max(course_clique_sizes)
+    return max(
+        sum(course_clique_sizes.get(course_no, 0) for course_no in range(first_course_no, max_course_no + 1, stride_courses + 1))
+        for first_course_no in range(min_course_no, min(min_course_no + stride_courses, max_course_no) + 1)
+    )
+
+@dataclass
+class PlacementPlan:
+    """A placement order along with what the planner could prove about it"""
+    placement_order: PlacementOrder
+    # no valid placement order has fewer strides than this
+    lower_bound: int
+    # the solver configuration that found the plan, when it came out of a portfolio race
+    solver: str | None = None
+    # how the solver finished (the name of its minizinc status), or None if it didn't run
+    status: str | None = None
+
+    @property
+    def num_strides(self) -> int:
+        return len(self.placement_order)
+
+    @property
+    def optimality_gap(self) -> int:
+        """How many strides we might be wasting compared to the optimal placement order"""
+        return self.num_strides - self.lower_bound
+
+_STRIDE_MODELS: ty.Final = {
+    'matrix': 'strides.mzn',
+    'positional': 'strides_positional.mzn',
+}
+
+def _matrix_model_data(placeable_brick_list: PlaceableBrickList) -> dict[str, ty.Any]:
+    """Instance data for strides.mzn, which takes dense n*n matrices"""
     # Adjacency matrix of dependencies. Set [i][j] if brick i depends on brick j
     dependency_matrix: list[list[bool]] = [
         [
@@ -85,27 +396,67 @@ def optimal_placement_order(placeable_brick_list: PlaceableBrickList, time_limit
         ]
         for i_placeable_brick in placeable_brick_list
     ]
-    model = minizinc.Model("strides.mzn")
-    solver = minizinc.Solver.lookup("gecode")
-    instance = minizinc.Instance(solver, model)
-    instance['n_bricks'] = len(placeable_brick_list)
-    instance['dependency'] = dependency_matrix
-    instance['within_stride'] = same_stride_matrix
-
-    print("Running solver...")
-    start_time = time.time()
-    # https://stackoverflow.com/a/55423170/1233320
-    num_cpus = len(os.sched_getaffinity(0))
-    result = instance.solve(processes=num_cpus, time_limit=time_limit)
-    end_time = time.time()
-    print(f"Solver finished in {end_time - start_time:.2f} seconds with status {result.status}")
-
-    if result.status == minizinc.result.Status.SATISFIED:
-        print("WARNING: Solver did not find an optimal solution in time, using best found solution")
-    if result.status != minizinc.result.Status.SATISFIED and result.status != minizinc.result.Status.OPTIMAL_SOLUTION:
-        raise ValueError("Solver failed to find a solution, increase the --time-limit!")
+    return {
+        'dependency': dependency_matrix,
+        'within_stride': same_stride_matrix,
+    }
+
+def _positional_model_data(placeable_brick_list: PlaceableBrickList, stride_height: float, stride_width: int) -> dict[str, ty.Any]:
+    """Instance data for strides_positional.mzn, which takes brick extents and a sparse edge list"""
+    # minizinc is 1-indexed
+    index_of = {placeable_brick: i + 1 for i, placeable_brick in enumerate(placeable_brick_list)}
+    dependency_edges = [
+        (index_of[dep], index_of[placeable_brick])
+        for placeable_brick in placeable_brick_list
+        for dep in placeable_brick.dependencies
+        if dep in index_of
+    ]
+    extents = [placeable_brick.real_extents() for placeable_brick in placeable_brick_list]
+    return {
+        'left_x': [left_x for left_x, _, _, _ in extents],
+        'right_x': [right_x for _, right_x, _, _ in extents],
+        'course': [placeable_brick.brick.course_no for placeable_brick in placeable_brick_list],
+        'stride_width': stride_width,
+        'stride_courses': courses_within_height(stride_height),
+        'n_dependencies': len(dependency_edges),
+        'dependency_before': [before for before, _ in dependency_edges],
+        'dependency_after': [after for _, after in dependency_edges],
+    }
+
+def _stride_model_data(
+        placeable_brick_list: PlaceableBrickList,
+        warm_start: PlacementOrder | None,
+        lower_bound: int,
+        model: str,
+        stride_height: float,
+        stride_width: int,
+        move_cost: MoveCost | None = None,
+) -> dict[str, ty.Any]:
+    if model == 'matrix':
+        data = _matrix_model_data(placeable_brick_list)
+    elif model == 'positional':
+        data = _positional_model_data(placeable_brick_list, stride_height, stride_width)
+    else:
+        raise ValueError(f"Unknown stride model {model}")
+
+    data['n_bricks'] = len(placeable_brick_list)
+    # with a warm start, we only care about solutions that strictly beat it
+    data['max_strides'] = len(placeable_brick_list) if warm_start is None else len(warm_start) - 1
+    data['min_strides'] = lower_bound
 
-    stride = result['stride']
+    # the extents for the travel between strides (see the models), in half mm so they're integers
+    extents = [placeable_brick.real_extents() for placeable_brick in placeable_brick_list]
+    data['minimize_travel'] = move_cost is not None
+    data['move_cost_x'] = 0 if move_cost is None else move_cost.horizontal
+    data['move_cost_y'] = 0 if move_cost is None else move_cost.vertical
+    data['travel_left_x'] = [round(left_x * 2) for left_x, _, _, _ in extents]
+    data['travel_right_x'] = [round(right_x * 2) for _, right_x, _, _ in extents]
+    data['travel_bottom_y'] = [round(bottom_y * 2) for _, _, bottom_y, _ in extents]
+    data['travel_top_y'] = [round(top_y * 2) for _, _, _, top_y in extents]
+    data['max_travel'] = 0
+    return data
+
+def _stride_array_to_placement_order(placeable_brick_list: PlaceableBrickList, stride: list[int]) -> PlacementOrder:
     # the stride array is an array of which stride number each brick is in. We want to invert this to a list of lists
     placement_order: PlacementOrder = [[] for _ in range(max(stride) + 1)]
     for i, stride_no in enumerate(stride):
@@ -113,17 +464,381 @@ def optimal_placement_order(placeable_brick_list: PlaceableBrickList, time_limit
     assert placement_order[0] == [], "minizinc is 1-indexed so first placement order should be empty"
     placement_order = placement_order[1:]
     # within each stride, we still need to do a topo sort to get a valid ordering
-    for i in range(len(placement_order)):
-        placement_order[i] = _topo_sort(set(placement_order[i]))
-    print(f"Number of strides: {len(placement_order)}")
-    return placement_order
+    return _order_strides(set(stride) for stride in placement_order)
+
+def _solver_plan(
+        placeable_brick_list: PlaceableBrickList,
+        status: minizinc.result.Status,
+        stride: list[int] | None,
+        warm_start: PlacementOrder | None,
+        lower_bound: int,
+        solver: str | None = None,
+) -> PlacementPlan:
+    """Turn how the solver finished into a plan, falling back on the warm start"""
+    import minizinc
+
+    if status == minizinc.result.Status.SATISFIED:
+        print("WARNING: Solver did not find an optimal solution in time, using best found solution")
+    if warm_start is not None and status == minizinc.result.Status.UNSATISFIABLE:
+        print(f"Solver proved the warm start is optimal, using it. Number of strides: {len(warm_start)}")
+        return PlacementPlan(warm_start, lower_bound=len(warm_start), solver=solver, status=status.name)
+    if warm_start is not None and status == minizinc.result.Status.UNKNOWN:
+        print(f"WARNING: Solver did not find a solution in time, using the warm start. Number of strides: {len(warm_start)}")
+        return PlacementPlan(warm_start, lower_bound=lower_bound, solver=solver, status=status.name)
+    if status != minizinc.result.Status.SATISFIED and status != minizinc.result.Status.OPTIMAL_SOLUTION:
+        raise ValueError("Solver failed to find a solution, increase the --time-limit!")
+
+    assert stride is not None
+    placement_order = _stride_array_to_placement_order(placeable_brick_list, stride)
+    if status == minizinc.result.Status.OPTIMAL_SOLUTION:
+        lower_bound = len(placement_order)
+    plan = PlacementPlan(placement_order, lower_bound=lower_bound, solver=solver, status=status.name)
+    print(f"Number of strides: {plan.num_strides} (lower bound {plan.lower_bound}, optimality gap {plan.optimality_gap})")
+    return plan
+
+def optimal_placement_order(
+        placeable_brick_list: PlaceableBrickList,
+        time_limit: timedelta,
+        warm_start: PlacementOrder | None = None,
+        model: str = 'matrix',
+        stride_height: float = _STRIDE_HEIGHT,
+        stride_width: int = _STRIDE_WIDTH,
+        processes: int | None = None,
+        cache: SolverCache | None = None,
+        move_cost: MoveCost | None = None,
+) -> PlacementPlan:
+    """
+    Compute the optimal, multi-stride brick placement order using a discrete optimizer (effectively
+    a SAT solver). If a `warm_start` placement order is given (eg, from `greedy_placement_order`),
+    its stride count is used as an upper bound for the solver, and it's returned as-is if the solver
+    can't beat it in time.
+
+    The solver's stride count is also bounded below by `stride_count_lower_bound`, so it stops as
+    soon as it finds a solution meeting that bound, and the bound is reported in the result.
+
+    `model` selects the minizinc model, see `_STRIDE_MODELS`. The "positional" model scales to much
+    larger walls, but needs the stride dimensions, whereas the "matrix" model only uses the
+    `within_same_stride` sets.
+
+    `processes` is how many threads the solver may use, all the CPUs we're allowed on by default.
+
+    If a `cache` is given, an identical previous solve is reused instead of running the solver.
+
+    With a `move_cost`, the solver then runs again (with the same time limit) to order the strides
+    so that the platform travels as little as possible between them, keeping the number of strides,
+    see `platform_travel`.
+    """
+    import minizinc
+
+    if move_cost is not None:
+        plan = optimal_placement_order(placeable_brick_list, time_limit, warm_start, model, stride_height, stride_width, processes, cache)
+        return _least_travel_plan(placeable_brick_list, plan, move_cost, time_limit, model, stride_height, stride_width, processes, cache)
+
+    lower_bound = stride_count_lower_bound(placeable_brick_list, stride_height, stride_width)
+    if warm_start is not None and len(warm_start) <= lower_bound:
+        print(f"Warm start meets the lower bound, skipping solver. Number of strides: {len(warm_start)}")
+        return PlacementPlan(warm_start, lower_bound=len(warm_start))
+
+    data = _stride_model_data(placeable_brick_list, warm_start, lower_bound, model, stride_height, stride_width)
+
+    cache_key = None
+    cached = None
+    if cache is not None:
+        cache_key = cache.key(_STRIDE_MODELS[model], "gecode", data, time_limit)
+        cached = cache.get(cache_key)
+    if cached is not None:
+        print("Using cached solver result")
+        status = minizinc.result.Status[cached['status']]
+        stride = cached['stride']
+    else:
+        solver = lookup_solver("gecode")
+        instance = minizinc.Instance(solver, minizinc.Model(_STRIDE_MODELS[model]))
+        for name, value in data.items():
+            instance[name] = value
+
+        print("Running solver...")
+        if processes is None:
+            processes = available_cpus()
+        with tracing.span('optimal_placement_order solver', model=model, bricks=len(placeable_brick_list), processes=processes) as solver_span:
+            result = tracing.solve(instance, 'strides', processes=processes, time_limit=time_limit)
+            solver_span.args['status'] = result.status.name
+        print(f"Solver finished in {solver_span.seconds:.2f} seconds with status {result.status}")
+        status = result.status
+        stride = result['stride'] if status.has_solution() else None
+        # running out of time without a solution isn't worth remembering
+        if cache is not None and cache_key is not None and (status.has_solution() or status == minizinc.result.Status.UNSATISFIABLE):
+            cache.put(cache_key, {'status': status.name, 'stride': stride})
 
-def apply_placement_order(placement_order: PlacementOrder) -> tyc.Iterator[None]:
+    return _solver_plan(placeable_brick_list, status, stride, warm_start, lower_bound)
+
+def _least_travel_plan(
+        placeable_brick_list: PlaceableBrickList,
+        plan: PlacementPlan,
+        move_cost: MoveCost,
+        time_limit: timedelta,
+        model: str,
+        stride_height: float,
+        stride_width: int,
+        processes: int | None,
+        cache: SolverCache | None,
+) -> PlacementPlan:
+    """Reorder (and rearrange) the strides of the `plan` to cut the platform travel, keeping their number"""
+    import minizinc
+
+    travel = platform_travel(plan.placement_order, move_cost)
+    if travel == 0:
+        return plan
+    data = _stride_model_data(placeable_brick_list, None, plan.num_strides, model, stride_height, stride_width, move_cost)
+    data['max_strides'] = plan.num_strides
+    # the model's travel is in quarter mm, and the centres are all on the quarter mm. We're only
+    # interested in plans that beat this one.
+    data['max_travel'] = round(travel * 4) - 1
+
+    cache_key = None
+    cached = None
+    if cache is not None:
+        cache_key = cache.key(_STRIDE_MODELS[model], "gecode", data, time_limit)
+        cached = cache.get(cache_key)
+    if cached is not None:
+        print("Using cached travel solver result")
+        status = minizinc.result.Status[cached['status']]
+        stride = cached['stride']
+    else:
+        instance = minizinc.Instance(lookup_solver("gecode"), minizinc.Model(_STRIDE_MODELS[model]))
+        for name, value in data.items():
+            instance[name] = value
+        print("Running travel solver...")
+        if processes is None:
+            processes = available_cpus()
+        with tracing.span('optimal_placement_order travel solver', model=model, strides=plan.num_strides, processes=processes) as solver_span:
+            result = tracing.solve(instance, 'travel', processes=processes, time_limit=time_limit)
+            solver_span.args['status'] = result.status.name
+        print(f"Travel solver finished in {solver_span.seconds:.2f} seconds with status {result.status}")
+        status = result.status
+        stride = result['stride'] if status.has_solution() else None
+        if cache is not None and cache_key is not None and (status.has_solution() or status == minizinc.result.Status.UNSATISFIABLE):
+            cache.put(cache_key, {'status': status.name, 'stride': stride})
+
+    if stride is None:
+        if status == minizinc.result.Status.UNSATISFIABLE:
+            print(f"Solver proved the strides are already in the order with the least travel: {travel:.0f}")
+        else:
+            print(f"WARNING: Travel solver did not find a better order in time, keeping the platform travel at {travel:.0f}")
+        return plan
+    placement_order = _stride_array_to_placement_order(placeable_brick_list, stride)
+    optimal = "" if status == minizinc.result.Status.OPTIMAL_SOLUTION else " (not proven optimal)"
+    print(f"Number of strides: {len(placement_order)}, platform travel: {platform_travel(placement_order, move_cost):.0f}{optimal}, was {travel:.0f}")
+    return PlacementPlan(placement_order, plan.lower_bound, plan.solver, plan.status)
+
+# The configs `portfolio_placement_order` races by default, most promising first: the first ones
+# get any spare CPUs, and with only a few CPUs they're the only ones that run. The first is what
+# `optimal_placement_order` runs.
+_STRIDE_PORTFOLIO: ty.Final = (
+    SolverConfig('gecode', model='matrix'),
+    SolverConfig('chuffed', free_search=True, model='positional'),
+    SolverConfig('gecode', model='positional'),
+    SolverConfig('cp-sat', free_search=True, model='positional'),
+    SolverConfig('chuffed', model='matrix'),
+)
+
+def portfolio_placement_order(
+        placeable_brick_list: PlaceableBrickList,
+        time_limit: timedelta,
+        warm_start: PlacementOrder | None = None,
+        stride_height: float = _STRIDE_HEIGHT,
+        stride_width: int = _STRIDE_WIDTH,
+        configs: tyc.Sequence[SolverConfig] | None = None,
+        processes: int | None = None,
+        cache: SolverCache | None = None,
+) -> PlacementPlan:
+    """
+    Like `optimal_placement_order`, but races several solvers, searches and stride models against
+    each other within the same time limit (see portfolio.py). `configs` defaults to whichever of
+    `_STRIDE_PORTFOLIO` are installed, and the `processes` are split between them. The plan's
+    `solver` says which config found it.
+    """
+    import minizinc
+
+    lower_bound = stride_count_lower_bound(placeable_brick_list, stride_height, stride_width)
+    if warm_start is not None and len(warm_start) <= lower_bound:
+        print(f"Warm start meets the lower bound, skipping solver. Number of strides: {len(warm_start)}")
+        return PlacementPlan(warm_start, lower_bound=len(warm_start))
+
+    if configs is None:
+        configs = available_configs(_STRIDE_PORTFOLIO)
+    if len(configs) == 0:
+        raise ValueError("None of the portfolio's solvers are installed")
+    if processes is None:
+        processes = available_cpus()
+    models = sorted({config.model or 'matrix' for config in configs})
+    data = {
+        model: _stride_model_data(placeable_brick_list, warm_start, lower_bound, model, stride_height, stride_width)
+        for model in models
+    }
+
+    cache_key = None
+    cached = None
+    if cache is not None:
+        portfolio_name = "portfolio " + ",".join(config.name for config in configs)
+        cache_key = cache.key([_STRIDE_MODELS[model] for model in models], portfolio_name, data, time_limit)
+        cached = cache.get(cache_key)
+    if cached is not None:
+        print("Using cached solver result")
+        status = minizinc.result.Status[cached['status']]
+        stride = cached['stride']
+        winner = cached['winner']
+    else:
+        run = minizinc_racer(
+            lambda config: (_STRIDE_MODELS[config.model or 'matrix'], data[config.model or 'matrix']),
+            'stride',
+            bound_parameter='max_strides',
+        )
+        print(f"Racing solvers {', '.join(config.name for config in configs[:processes])}...")
+        with tracing.span('portfolio_placement_order solvers', bricks=len(placeable_brick_list), processes=processes) as solver_span:
+            result = asyncio.run(race(configs, run, processes, time_limit, lower_bound=lower_bound))
+            winner = None if result.winner is None else result.winner.name
+            solver_span.args.update(status=result.status.name, winner=winner)
+        print(f"Solvers finished in {solver_span.seconds:.2f} seconds with status {result.status}, won by {winner}")
+        status = result.status
+        stride = result.solution
+        if cache is not None and cache_key is not None and (stride is not None or status == minizinc.result.Status.UNSATISFIABLE):
+            cache.put(cache_key, {'status': status.name, 'stride': stride, 'winner': winner})
+
+    return _solver_plan(placeable_brick_list, status, stride, warm_start, lower_bound, solver=winner)
+
+@dataclass
+class PlanProgress:
+    """An improved plan found while the solver is still running"""
+    plan: PlacementPlan
+    # seconds since the solver was started
+    elapsed: float
+    # whether the solver is done, ie this is the last plan it will find (and optimal, if its stride
+    # count is the lower bound)
+    final: bool
+
+async def anytime_placement_order(
+        placeable_brick_list: PlaceableBrickList,
+        time_limit: timedelta,
+        warm_start: PlacementOrder | None = None,
+        model: str = 'matrix',
+        stride_height: float = _STRIDE_HEIGHT,
+        stride_width: int = _STRIDE_WIDTH,
+        processes: int | None = None,
+        cache: SolverCache | None = None,
+) -> tyc.AsyncIterator[PlanProgress]:
+    """
+    Like `optimal_placement_order`, but yields every improving plan as soon as the solver finds it
+    rather than waiting out the whole time limit. The warm start, if any, is yielded first. The
+    caller can stop iterating at any point (eg once the plan has been stable for a while) and the
+    solver is killed.
+
+    The `cache` is shared with `optimal_placement_order`: a cached result is yielded straight away
+    as the final plan, and a run that's followed to the end is cached for next time. Runs that are
+    stopped early aren't, since their result depends on when they were stopped.
+    """
+    import minizinc
+
+    start_time = time.monotonic()
+    lower_bound = stride_count_lower_bound(placeable_brick_list, stride_height, stride_width)
+    if warm_start is not None:
+        done = len(warm_start) <= lower_bound
+        yield PlanProgress(PlacementPlan(warm_start, lower_bound=len(warm_start) if done else lower_bound), elapsed=0.0, final=done)
+        if done:
+            return
+
+    data = _stride_model_data(placeable_brick_list, warm_start, lower_bound, model, stride_height, stride_width)
+    best: PlacementOrder | None = warm_start
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(_STRIDE_MODELS[model], "gecode", data, time_limit)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            status = minizinc.result.Status[cached['status']]
+            if cached['stride'] is not None:
+                best = _stride_array_to_placement_order(placeable_brick_list, cached['stride'])
+            if best is None:
+                raise ValueError("Solver failed to find a solution, increase the --time-limit!")
+            if status == minizinc.result.Status.OPTIMAL_SOLUTION or status == minizinc.result.Status.UNSATISFIABLE:
+                lower_bound = len(best)
+            yield PlanProgress(PlacementPlan(best, lower_bound=lower_bound), elapsed=time.monotonic() - start_time, final=True)
+            return
+
+    solver = lookup_solver("gecode")
+    instance = minizinc.Instance(solver, minizinc.Model(_STRIDE_MODELS[model]))
+    for name, value in data.items():
+        instance[name] = value
+
+    if processes is None:
+        processes = available_cpus()
+    stride: list[int] | None = None
+    statistics: dict[str, ty.Any] = {}
+    async for result in instance.solutions(processes=processes, time_limit=time_limit, intermediate_solutions=True):
+        statistics.update(result.statistics)
+        if result.solution is not None:
+            stride = result['stride']
+            best = _stride_array_to_placement_order(placeable_brick_list, stride)
+            tracing.counter('anytime strides', objective=len(best))
+            # the solver only ever finds strictly better solutions, since it's minimizing
+            yield PlanProgress(PlacementPlan(best, lower_bound=lower_bound), elapsed=time.monotonic() - start_time, final=False)
+        else:
+            # the last result is just the final status. It's stored in the same form as
+            # `optimal_placement_order` stores it, so either can reuse the other's runs.
+            status = result.status
+            tracing.solver_statistics('anytime statistics', statistics)
+            if cache is not None and cache_key is not None and (stride is not None or status == minizinc.result.Status.UNSATISFIABLE):
+                cache.put(cache_key, {'status': status.name, 'stride': stride})
+            if best is not None:
+                # If the solver proved optimality (or that the warm start can't be beaten), the best
+                # plan so far meets the bound.
+                if status == minizinc.result.Status.OPTIMAL_SOLUTION or status == minizinc.result.Status.UNSATISFIABLE:
+                    lower_bound = len(best)
+                yield PlanProgress(PlacementPlan(best, lower_bound=lower_bound), elapsed=time.monotonic() - start_time, final=True)
+    if best is None:
+        raise ValueError("Solver failed to find a solution, increase the --time-limit!")
+
+async def settled_placement_order(
+        progress: tyc.AsyncIterator[PlanProgress],
+        stable_for: timedelta | None = None,
+        on_progress: tyc.Callable[[PlanProgress], None] | None = None,
+) -> PlacementPlan:
+    """
+    Follows the plans coming out of `anytime_placement_order` and returns the best one, either when
+    the solver is done or, if `stable_for` is given, once no better plan has turned up for that long,
+    in which case the solver is stopped early.
+    """
+    best: PlacementPlan | None = None
+    iterator = aiter(progress)
+    try:
+        while True:
+            timeout = None if stable_for is None or best is None else stable_for.total_seconds()
+            try:
+                update = await asyncio.wait_for(anext(iterator), timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                break
+            best = update.plan
+            if on_progress is not None:
+                on_progress(update)
+            if update.final:
+                break
+    finally:
+        aclose = getattr(iterator, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+    if best is None:
+        raise ValueError("No placement order was found")
+    return best
+
+def apply_placement_order(placement_order: PlacementOrder, first_stride: int = 0) -> tyc.Iterator[None]:
     """
     A generator that doesn't actually return anything but instead places one brick every time it's
     called. Will mutate the `PlaceableBrick`s referenced in the `placement_order`
+
+    The strides are numbered from `first_stride`, so that the rest of a partly built wall (see
+    replanning.py) can carry on from the strides already placed.
     """
-    for i, stride in enumerate(placement_order):
+    for i, stride in enumerate(placement_order, start=first_stride):
         for placeable_brick in stride:
             if placeable_brick.placed_in_stride is not None:
                 raise ValueError("A PlaceableBrick referenced by this PlacementOrder was already placed")
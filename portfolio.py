@@ -0,0 +1,248 @@
+# Racing several solver configurations on the same problem. Which minizinc backend (and which model
+# and search) does best varies a lot from wall to wall, so rather than betting everything on one of
+# them we run a few at once, each with a share of the CPUs, and take whichever answer is best when
+# the first one proves optimality or the time runs out.
+#
+# The racers share the best bound: as soon as one of them finds a better solution, the others are
+# restarted with the tighter upper bound, since any solution they find above it is wasted effort.
+# Minizinc can't tighten the bound of a running solver, so a restart is the only way to share it,
+# and it also means a racer that proves there's nothing below the bound proves the best solution so
+# far is optimal.
+#
+# minizinc is only imported once something actually runs a solver, since importing it (which runs
+# the minizinc executable to find its version) is most of the start up time of the greedy planner.
+
+from __future__ import annotations
+
+import asyncio
+import collections.abc as tyc
+from dataclasses import dataclass
+from datetime import timedelta
+import functools
+import os
+import typing as ty
+
+import tracing
+
+if ty.TYPE_CHECKING:
+    import minizinc
+
+def available_cpus() -> int:
+    # https://stackoverflow.com/a/55423170/1233320
+    return len(os.sched_getaffinity(0))
+
+@functools.cache
+def lookup_solver(solver: str) -> minizinc.Solver:
+    """
+    `minizinc.Solver.lookup`, but only once per process, which matters for long running processes
+    like the planning service that solve many instances.
+    """
+    import minizinc
+    return minizinc.Solver.lookup(solver)
+
+@dataclass(frozen=True)
+class SolverConfig:
+    """One way of running a model"""
+    # minizinc solver id or tag, eg "gecode", "chuffed" or "cp-sat"
+    solver: str
+    # let the solver ignore the model's search annotations and use its own search
+    free_search: bool = False
+    # which model variant to run, if the problem has several (eg a key of placer._STRIDE_MODELS)
+    model: str | None = None
+
+    @property
+    def name(self) -> str:
+        parts = [self.solver]
+        if self.model is not None:
+            parts.append(self.model)
+        if self.free_search:
+            parts.append("free")
+        return "/".join(parts)
+
+def available_configs(configs: tyc.Iterable[SolverConfig], installed: tyc.Container[str] | None = None) -> list[SolverConfig]:
+    """
+    The configs whose solvers are installed. `installed` is the solver ids and tags to allow,
+    everything minizinc knows about by default.
+    """
+    if installed is None:
+        import minizinc
+        installed = set() if minizinc.default_driver is None else minizinc.default_driver.available_solvers()
+    return [config for config in configs if config.solver in installed]
+
+def split_processes(num_configs: int, processes: int) -> list[int]:
+    """
+    How many threads each of the first few configs gets. Every racer needs at least one CPU, so
+    with fewer CPUs than configs only the first configs race, and any leftover CPUs go to the
+    earliest ones, which should be the most promising.
+    """
+    num_racers = max(1, min(num_configs, processes))
+    share, extra = divmod(max(processes, 1), num_racers)
+    return [share + (1 if i < extra else 0) for i in range(num_racers)]
+
+@dataclass
+class RacerReport:
+    """
+    Something a racer found out: a solution (with its objective value, None for satisfaction
+    problems), or, at the very end, only the status it finished with.
+    """
+    status: minizinc.result.Status
+    solution: ty.Any = None
+    objective: int | None = None
+
+# Runs one config with the given number of threads, upper bound on the objective (None to leave it
+# to the model) and time limit, and streams what it finds. Closing the iterator must stop the solver.
+Racer: ty.TypeAlias = tyc.Callable[[SolverConfig, int, int | None, timedelta | None], tyc.AsyncIterator[RacerReport]]
+
+@dataclass
+class PortfolioResult:
+    # OPTIMAL_SOLUTION if the solution was proved optimal (or, for satisfaction problems,
+    # SATISFIED), SATISFIED if the time ran out first, UNSATISFIABLE if it was proved there's no
+    # solution under the upper bound, and UNKNOWN if nobody found anything in time.
+    status: minizinc.result.Status
+    solution: ty.Any
+    objective: int | None
+    # the config that found the solution, or that proved there isn't one
+    winner: SolverConfig | None
+
+def minizinc_racer(
+        instance_for: tyc.Callable[[SolverConfig], tuple[str, dict[str, ty.Any]]],
+        output: str,
+        bound_parameter: str | None = None,
+) -> Racer:
+    """
+    A racer that runs a minizinc model. `instance_for` gives the model file and instance data for a
+    config, `output` is the variable that makes up the solution, and the upper bound (if any) is
+    passed in as the `bound_parameter`, overriding whatever the data says.
+    """
+    async def run(config: SolverConfig, processes: int, upper_bound: int | None, time_limit: timedelta | None) -> tyc.AsyncIterator[RacerReport]:
+        model_path, data = instance_for(config)
+        if bound_parameter is not None and upper_bound is not None:
+            data = {**data, bound_parameter: upper_bound}
+        import minizinc
+        instance = minizinc.Instance(lookup_solver(config.solver), minizinc.Model(model_path))
+        for name, value in data.items():
+            instance[name] = value
+        statistics: dict[str, ty.Any] = {}
+        try:
+            async for result in instance.solutions(
+                    processes=processes,
+                    time_limit=time_limit,
+                    intermediate_solutions=bound_parameter is not None,
+                    free_search=config.free_search,
+            ):
+                statistics.update(result.statistics)
+                if result.solution is not None:
+                    if result.objective is not None:
+                        tracing.counter('portfolio objective', **{config.name: result.objective})
+                    yield RacerReport(result.status, result[output], result.objective)
+                else:
+                    yield RacerReport(result.status)
+        finally:
+            # racers that get restarted or lose the race are stopped part way, so record what they
+            # got through either way
+            tracing.solver_statistics(f"{config.name} statistics", {'upper_bound': upper_bound, **statistics})
+    return run
+
+async def race(
+        configs: tyc.Sequence[SolverConfig],
+        run: Racer,
+        processes: int,
+        time_limit: timedelta | None = None,
+        upper_bound: int | None = None,
+        lower_bound: int | None = None,
+) -> PortfolioResult:
+    """
+    Race the `configs`, splitting the `processes` between them, until one of them proves
+    optimality, a solution meets the `lower_bound`, or the `time_limit` runs out. Solutions are
+    minimized by their objective; for satisfaction problems the first solution wins. A racer that
+    crashes (eg because its solver doesn't support the model) is left out with a warning.
+    """
+    import minizinc
+
+    if len(configs) == 0:
+        raise ValueError("No solver configurations to race")
+    loop = asyncio.get_running_loop()
+    deadline = None if time_limit is None else loop.time() + time_limit.total_seconds()
+    threads = dict(zip(configs, split_processes(len(configs), processes)))
+
+    best: RacerReport | None = None
+    winner: SolverConfig | None = None
+    proved = False
+    finished = asyncio.Event()
+    tasks: dict[SolverConfig, asyncio.Task[None]] = {}
+
+    def current_bound() -> int | None:
+        if best is not None and best.objective is not None:
+            return best.objective - 1
+        return upper_bound
+
+    async def run_racer(config: SolverConfig, racer_bound: int | None) -> None:
+        nonlocal best, winner, proved
+        remaining = None
+        if deadline is not None:
+            remaining = timedelta(seconds=deadline - loop.time())
+            if remaining <= timedelta(0):
+                return
+        iterator = aiter(run(config, threads[config], racer_bound, remaining))
+        try:
+            async for report in iterator:
+                if report.solution is not None:
+                    if best is not None and (report.objective is None or best.objective is None or report.objective >= best.objective):
+                        continue
+                    best, winner = report, config
+                    if report.objective is None or (lower_bound is not None and report.objective <= lower_bound):
+                        proved = True
+                        finished.set()
+                        return
+                    # everyone else is now looking for solutions we no longer need
+                    for other, task in list(tasks.items()):
+                        if other != config and not task.done():
+                            restart(other)
+                elif report.status == minizinc.result.Status.OPTIMAL_SOLUTION or report.status == minizinc.result.Status.UNSATISFIABLE:
+                    # Either this racer's last solution is optimal, and so the best one, or there's
+                    # nothing below its bound, which is never looser than the best solution so far.
+                    proved = True
+                    if best is None:
+                        winner = config
+                    finished.set()
+                    return
+        finally:
+            aclose = getattr(iterator, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+    def restart(config: SolverConfig) -> None:
+        if config in tasks:
+            tasks[config].cancel()
+            tracing.instant('portfolio restart', solver=config.name, upper_bound=current_bound())
+        tasks[config] = asyncio.create_task(run_racer(config, current_bound()))
+
+    for config in threads:
+        restart(config)
+    finished_waiter = asyncio.create_task(finished.wait())
+    try:
+        while not finished.is_set():
+            running = [task for task in tasks.values() if not task.done()]
+            if len(running) == 0:
+                break
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            await asyncio.wait([*running, finished_waiter], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if deadline is not None and loop.time() >= deadline:
+                break
+    finally:
+        finished_waiter.cancel()
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(finished_waiter, *tasks.values(), return_exceptions=True)
+    for config, task in tasks.items():
+        if not task.cancelled() and task.exception() is not None:
+            print(f"WARNING: solver {config.name} failed: {task.exception()}")
+
+    if best is None:
+        status = minizinc.result.Status.UNSATISFIABLE if proved else minizinc.result.Status.UNKNOWN
+        return PortfolioResult(status, None, None, winner)
+    if proved and best.objective is not None:
+        status = minizinc.result.Status.OPTIMAL_SOLUTION
+    else:
+        status = minizinc.result.Status.SATISFIED
+    return PortfolioResult(status, best.solution, best.objective, winner)
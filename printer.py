@@ -1,14 +1,16 @@
+import sys
+import time
 import typing as ty
 
-from dependency_graph import PlaceableBrickList
+from dependency_graph import PlaceableBrick, PlaceableBrickList
 from placer import PlacementOrder, apply_placement_order
-from utils import assert_round
 
 _PLACED_CHAR: ty.Final = '█'
 _UNPLACED_CHAR: ty.Final = '▒'
 _HEAD_JOINT_CHAR: ty.Final = ' '
 _STRETCHER_PLUS_TRAILING_HEAD_JOINT_LENGTH_CHARS: ty.Final = 8
 _HEAD_JOINT_LENGTH_CHARS: ty.Final = 1
+_QUARTERS_PER_STRETCHER: ty.Final = 4
 
 def colorize(text: str, color_id: int) -> str:
     # chatgpt generated this color list, idk if these labels are actually right
@@ -30,47 +32,98 @@ def colorize(text: str, color_id: int) -> str:
     end = "\x1b[0m"
     return f"{start}{text}{end}"
 
-def print_bricks(placeable_bricks: PlaceableBrickList) -> None:
-    rows: list[str] = []
-    row = ''
+# where a brick is drawn: (course number, first column, length in chars)
+_BrickCells: ty.TypeAlias = tuple[int, int, int]
+
+def _layout_bricks(placeable_bricks: PlaceableBrickList) -> list[_BrickCells]:
+    """Compute where each brick is drawn, checking the `BrickList` invariants along the way"""
+    cells: list[_BrickCells] = []
+    column = 0
     last_y = 0
-    last_relative_right_x = 0
+    last_right_quarters = 0
     for placeable_brick in placeable_bricks:
-        brick = placeable_brick.brick
-        if brick.course_no < last_y:
-            raise ValueError(f"BrickList invariant violated: decreasing course number (y) from {last_y} to {brick.course_no}")
+        course_no = placeable_brick.brick.course_no
+        # integer quarter bricks, so the invariant check and the lengths are exact
+        left_quarters, right_quarters = placeable_brick.quarters()
+        if course_no < last_y:
+            raise ValueError(f"BrickList invariant violated: decreasing course number (y) from {last_y} to {course_no}")
 
-        if brick.course_no > last_y:
-            rows.append(row)
-            row = ''
+        if course_no > last_y:
+            column = 0
 
-        if brick.course_no == last_y and brick.relative_left_x != last_relative_right_x:
-            raise ValueError(f"BrickList invariant violated: relative left_x {brick.relative_left_x} was not equal to previous right_x {last_relative_right_x} on course {brick.course_no}")
+        if course_no == last_y and left_quarters != last_right_quarters:
+            raise ValueError(f"BrickList invariant violated: relative left_x {left_quarters / _QUARTERS_PER_STRETCHER} was not equal to previous right_x {last_right_quarters / _QUARTERS_PER_STRETCHER} on course {course_no}")
 
-        last_y = brick.course_no
-        last_relative_right_x = brick.relative_right_x
+        last_y = course_no
+        last_right_quarters = right_quarters
 
         # sorry for the name
-        brick_plus_trailing_head_joint_length_chars = assert_round((brick.relative_right_x - brick.relative_left_x) * _STRETCHER_PLUS_TRAILING_HEAD_JOINT_LENGTH_CHARS)
+        brick_plus_trailing_head_joint_length_chars = (right_quarters - left_quarters) * _STRETCHER_PLUS_TRAILING_HEAD_JOINT_LENGTH_CHARS // _QUARTERS_PER_STRETCHER
         brick_length_chars = brick_plus_trailing_head_joint_length_chars - _HEAD_JOINT_LENGTH_CHARS
-        if placeable_brick.placed_in_stride is not None:
-            row += colorize(_PLACED_CHAR * brick_length_chars, placeable_brick.placed_in_stride)
-        else:
-            row += _UNPLACED_CHAR * brick_length_chars
-        row += _HEAD_JOINT_CHAR * _HEAD_JOINT_LENGTH_CHARS
+        cells.append((course_no, column, brick_length_chars))
+        column += brick_plus_trailing_head_joint_length_chars
+    return cells
 
-    rows.append(row)
-    for rev_row in reversed(rows):
-        print(rev_row)
-        print()
+def _brick_text(placeable_brick: PlaceableBrick, brick_length_chars: int) -> str:
+    if placeable_brick.placed_in_stride is not None:
+        return colorize(_PLACED_CHAR * brick_length_chars, placeable_brick.placed_in_stride)
+    return _UNPLACED_CHAR * brick_length_chars
 
-def interactive_print_placed_bricks(placeable_bricks: PlaceableBrickList, placement_order: PlacementOrder) -> None:
+def print_bricks(placeable_bricks: PlaceableBrickList) -> None:
+    rows: list[list[str]] = []
+    for placeable_brick, (course_no, _, brick_length_chars) in zip(placeable_bricks, _layout_bricks(placeable_bricks)):
+        while len(rows) <= course_no:
+            rows.append([])
+        rows[course_no].append(_brick_text(placeable_brick, brick_length_chars))
+        rows[course_no].append(_HEAD_JOINT_CHAR * _HEAD_JOINT_LENGTH_CHARS)
+
+    print(''.join(f"{''.join(row)}\n\n" for row in reversed(rows)), end='')
+
+def interactive_print_placed_bricks(placeable_bricks: PlaceableBrickList, placement_order: PlacementOrder, first_stride: int = 0) -> None:
     """
     Print the brick list, and then every time the user presses enter, place one more brick according
     to the placement order and print again. Terminates once the placement order is exhausted.
+    The strides are numbered (and colored) from `first_stride`, see `apply_placement_order`.
     Mutates `placeable_bricks`.
     """
     print_bricks(placeable_bricks)
-    for _ in apply_placement_order(placement_order):
+    for _ in apply_placement_order(placement_order, first_stride):
         _ = input("Press enter to place the next brick")
         print_bricks(placeable_bricks)
+
+def incremental_print_placed_bricks(
+        placeable_bricks: PlaceableBrickList,
+        placement_order: PlacementOrder,
+        autoplay_rate: float | None = None,
+        first_stride: int = 0,
+) -> None:
+    """
+    Like `interactive_print_placed_bricks`, but only prints the wall once, and then redraws just the
+    newly placed brick in place using ANSI cursor movement. If `autoplay_rate` is given, places that
+    many bricks per second instead of waiting for enter. The whole wall must fit on the terminal,
+    since we can't move the cursor into the scrollback. The strides are numbered (and colored) from
+    `first_stride`, see `apply_placement_order`.
+    Mutates `placeable_bricks`.
+    """
+    cells = {placeable_brick: brick_cells for placeable_brick, brick_cells in zip(placeable_bricks, _layout_bricks(placeable_bricks))}
+    print_bricks(placeable_bricks)
+
+    # The cursor always returns to the start of the line below the wall. Each course takes up two
+    # lines (the bricks and a blank line for the bed joint), printed top course first.
+    steps = apply_placement_order(placement_order, first_stride)
+    for placeable_brick in (placeable_brick for stride in placement_order for placeable_brick in stride):
+        if autoplay_rate is None:
+            _ = input("Press enter to place the next brick")
+            # go back up over the prompt line that the user's enter left behind, and clear it
+            prefix = "\x1b[1A\r\x1b[2K"
+        else:
+            time.sleep(1 / autoplay_rate)
+            prefix = ""
+        # places `placeable_brick`
+        next(steps)
+
+        course_no, column, brick_length_chars = cells[placeable_brick]
+        lines_up = 2 * (course_no + 1)
+        # one write per step, so the terminal never shows a half-drawn update
+        sys.stdout.write(f"{prefix}\x1b[{lines_up}A\x1b[{column + 1}G{_brick_text(placeable_brick, brick_length_chars)}\x1b[{lines_up}B\r")
+        sys.stdout.flush()
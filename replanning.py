@@ -0,0 +1,122 @@
+# Planning the rest of a partly built wall, eg after a brick was damaged and has to be laid again,
+# courses were added to the top, or the stride size changed. The bricks that are already placed (the
+# ones with `placed_in_stride` set) are done: they satisfy the dependencies of the bricks on top of
+# them and aren't planned again. The rest of the previous plan is kept for as long as it's still
+# valid for the wall as it is now, and only the bricks after that (along with any that weren't in it
+# at all) go back to the planners, so a correction part way through the build only re-solves the
+# part of the wall it affects.
+#
+# Bricks are matched up with the previous plan by position (`Brick`s compare by value), so the
+# previous plan can be for `PlaceableBrick`s from before the wall was rebuilt with more courses or a
+# different stride size, see `copy_placed`.
+
+import collections.abc as tyc
+from datetime import timedelta
+
+from dependency_graph import PlaceableBrick, PlaceableBrickList
+from placer import PlacementOrder, PlacementPlan, _order_strides, greedy_placement_order, optimal_placement_order, stride_count_lower_bound
+from solver_cache import SolverCache
+import tracing
+
+def copy_placed(previous: PlaceableBrickList, current: PlaceableBrickList) -> None:
+    """
+    Mark the bricks of the `current` wall as placed in the same strides as the same bricks of the
+    `previous` one, eg after rebuilding the wall with more courses or a different stride size.
+    """
+    placed_in_stride = {
+        placeable_brick.brick: placeable_brick.placed_in_stride
+        for placeable_brick in previous
+        if placeable_brick.placed_in_stride is not None
+    }
+    for placeable_brick in current:
+        if placeable_brick.brick in placed_in_stride:
+            placeable_brick.placed_in_stride = placed_in_stride[placeable_brick.brick]
+
+def next_stride(placeable_brick_list: PlaceableBrickList) -> int:
+    """The number of the next stride to place, for `apply_placement_order`'s `first_stride`"""
+    return max((placeable_brick.placed_in_stride for placeable_brick in placeable_brick_list if placeable_brick.placed_in_stride is not None), default=-1) + 1
+
+def _valid_strides(strides: tyc.Iterable[list[PlaceableBrick]], unplaced: set[PlaceableBrick], done: set[PlaceableBrick]) -> list[set[PlaceableBrick]]:
+    """
+    The strides up to the first one that isn't valid any more: whose bricks don't all fit in a
+    stride together, or that depend on a brick that isn't placed yet and doesn't come before them.
+    `done` is the unplaced bricks that come before the `strides`.
+    """
+    done = set(done)
+    valid: list[set[PlaceableBrick]] = []
+    for stride in strides:
+        members = set(stride)
+        if not all(
+            members <= placeable_brick.within_same_stride
+            and all(dep not in unplaced or dep in done or dep in members for dep in placeable_brick.dependencies)
+            for placeable_brick in members
+        ):
+            break
+        valid.append(members)
+        done |= members
+    return valid
+
+def replan_placement_order(
+        placeable_brick_list: PlaceableBrickList,
+        previous: PlacementOrder | None,
+        stride_height: float,
+        stride_width: int,
+        time_limit: timedelta | None = None,
+        model: str = 'matrix',
+        processes: int | None = None,
+        cache: SolverCache | None = None,
+) -> PlacementPlan:
+    """
+    Plan the bricks that aren't placed yet, keeping the `previous` plan up to its first stride that
+    isn't valid any more. The bricks after that are planned again, greedily, or with
+    `optimal_placement_order` if there's a `time_limit`, warm started with whichever is better of
+    the greedy plan and what's left of the previous one.
+
+    The plan only has the strides still to place, so number them from `next_stride` when placing
+    them, and its lower bound is for those strides.
+    """
+    unplaced = [placeable_brick for placeable_brick in placeable_brick_list if placeable_brick.placed_in_stride is None]
+    unplaced_set = set(unplaced)
+    with tracing.span('replan_placement_order', bricks=len(placeable_brick_list), unplaced=len(unplaced)) as current:
+        unplaced_of = {placeable_brick.brick: placeable_brick for placeable_brick in unplaced}
+        remaining = [
+            [unplaced_of[placeable_brick.brick] for placeable_brick in stride if placeable_brick.brick in unplaced_of]
+            for stride in previous or []
+        ]
+        remaining = [stride for stride in remaining if len(stride) > 0]
+        kept = _valid_strides(remaining, unplaced_set, set())
+        kept_bricks: set[PlaceableBrick] = set().union(*kept)
+        affected = [placeable_brick for placeable_brick in unplaced if placeable_brick not in kept_bricks]
+        current.args.update(kept_strides=len(kept), replanned_bricks=len(affected))
+        print(f"Keeping {len(kept)} strides of the previous plan, replanning {len(affected)} bricks")
+
+        affected_order: PlacementOrder = []
+        if len(affected) > 0:
+            affected_set = set(affected)
+            warm_start = greedy_placement_order(affected, stride_height, stride_width)
+            # the previous plan for the affected bricks can still be valid, eg if only bricks were
+            # added, in which case it might be the better start
+            previous_rest = [[placeable_brick for placeable_brick in stride if placeable_brick in affected_set] for stride in remaining]
+            previous_rest = [stride for stride in previous_rest if len(stride) > 0]
+            if (sum(len(stride) for stride in previous_rest) == len(affected)
+                    and len(previous_rest) < len(warm_start)
+                    and len(_valid_strides(previous_rest, unplaced_set, kept_bricks)) == len(previous_rest)):
+                warm_start = _order_strides(set(stride) for stride in previous_rest)
+            affected_order = warm_start
+            if time_limit is not None:
+                affected_order = optimal_placement_order(
+                    affected,
+                    time_limit,
+                    warm_start=warm_start,
+                    model=model,
+                    stride_height=stride_height,
+                    stride_width=stride_width,
+                    processes=processes,
+                    cache=cache,
+                ).placement_order
+
+        placement_order = _order_strides([*kept, *(set(stride) for stride in affected_order)])
+        plan = PlacementPlan(placement_order, lower_bound=stride_count_lower_bound(unplaced, stride_height, stride_width))
+        current.args['strides'] = plan.num_strides
+    print(f"Number of strides still to place: {plan.num_strides} (lower bound {plan.lower_bound})")
+    return plan
@@ -0,0 +1,129 @@
+# Rolling horizon planning: rather than planning the whole wall before the first brick can be
+# placed, plan only the next few courses (the horizon), commit the strides at the bottom of it, and
+# move the horizon up past them. The bricks that weren't committed are planned again along with the
+# next courses, so the strides at the top of a horizon, which couldn't see the courses above them,
+# get another go once they can.
+#
+# Every step plans about the same number of bricks however tall the wall is, and the bond's courses
+# are only read as the horizon gets to them, so the time to the first stride and the time between
+# steps don't grow with the wall. The price is some strides compared to planning the whole wall at
+# once, since no stride is ever planned with the courses more than a horizon above it in view.
+
+import collections.abc as tyc
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+
+from brickifier import brickify_table, courses_within_height
+from dependency_graph import PlaceableBrick, brick_list_to_placeable_brick_list
+from placer import greedy_placement_order, optimal_placement_order
+from solver_cache import SolverCache
+import tracing
+
+@dataclass
+class RollingStep:
+    """The strides committed by one step of the rolling horizon"""
+    # brick ids, ie indices into `brickify_table` of the whole wall
+    strides: list[list[int]]
+    # the courses first_course <= course_no < end_course were in the horizon
+    first_course: int
+    end_course: int
+    # how many bricks were planned, including the ones left for the next step
+    num_bricks: int
+    seconds: float
+
+def rolling_placement_order(
+        courses: tyc.Iterable[list[float]],
+        num_courses: int,
+        width: float,
+        stride_height: float,
+        stride_width: int,
+        horizon_height: float | None = None,
+        time_limit: timedelta | None = None,
+        model: str = 'matrix',
+        processes: int | None = None,
+        cache: SolverCache | None = None,
+) -> tyc.Iterator[RollingStep]:
+    """
+    Plan the first `num_courses` of the bond's `courses` (eg `stretcher_courses`, or `iter` of a
+    whole bond), `horizon_height` mm at a time (two stride heights by default), yielding the strides
+    as they're committed. Each horizon is planned greedily, or with `optimal_placement_order` if
+    there's a `time_limit`, which is per horizon.
+
+    The strides that are committed are the ones that lie entirely below the top stride height of
+    the horizon, in plan order, as long as every brick they rest on is already committed. At least
+    one stride is committed every step, and at the top of the wall everything is.
+    """
+    if horizon_height is None:
+        horizon_height = 2 * stride_height
+    # how many courses fit in the horizon, and in a stride at the top of it
+    horizon_courses = courses_within_height(horizon_height) + 1
+    stride_courses = courses_within_height(stride_height) + 1
+    course_iter = iter(courses)
+
+    # the courses from `first_course` up that have been read so far, and the id in the whole wall of
+    # the first brick of every course read so far
+    window: deque[list[float]] = deque()
+    course_first_ids = [0]
+    first_course = 0
+    # ids of the bricks in the window that are already committed
+    committed: set[int] = set()
+
+    while first_course < num_courses:
+        with tracing.span('rolling horizon step', first_course=first_course) as step_span:
+            end_course = min(num_courses, first_course + max(horizon_courses, 1))
+            while first_course + len(window) < end_course:
+                course = next(course_iter)
+                window.append(course)
+                # a course with n head joints has n + 1 bricks
+                course_first_ids.append(course_first_ids[-1] + len(course) + 1)
+            horizon = list(window)[:end_course - first_course]
+
+            # the horizon's courses on their own, starting from course 0. The planners only look at
+            # where the bricks are relative to each other, so that doesn't change the plan.
+            table = brickify_table(horizon, width)
+            wall_id_of: dict[PlaceableBrick, int] = {}
+            pending: list[PlaceableBrick] = []
+            offset = course_first_ids[first_course]
+            for placeable_brick in brick_list_to_placeable_brick_list(stride_height, stride_width, table):
+                wall_id = offset + placeable_brick.brick_id
+                if wall_id not in committed:
+                    wall_id_of[placeable_brick] = wall_id
+                    pending.append(placeable_brick)
+            step_span.args.update(end_course=end_course, bricks=len(pending))
+
+            placement_order = greedy_placement_order(pending, stride_height, stride_width)
+            if time_limit is not None:
+                placement_order = optimal_placement_order(
+                    pending,
+                    time_limit,
+                    warm_start=placement_order,
+                    model=model,
+                    stride_height=stride_height,
+                    stride_width=stride_width,
+                    processes=processes,
+                    cache=cache,
+                ).placement_order
+
+            # strides reaching into the top stride height of the horizon might have been planned
+            # differently with the courses above in view, so they wait for the next step
+            commit_below = end_course - first_course if end_course == num_courses else max(1, len(horizon) - stride_courses)
+            strides: list[list[int]] = []
+            for stride in placement_order:
+                ready = all(
+                    placeable_brick.brick.course_no < commit_below
+                    and all(dep not in wall_id_of or wall_id_of[dep] in committed or dep in stride for dep in placeable_brick.dependencies)
+                    for placeable_brick in stride
+                )
+                if ready or len(strides) == 0:
+                    strides.append([wall_id_of[placeable_brick] for placeable_brick in stride])
+                    committed.update(strides[-1])
+            step_span.args['strides'] = len(strides)
+
+            # move the horizon up to the lowest course with anything left in it
+            while first_course < end_course and all(
+                    wall_id in committed for wall_id in range(course_first_ids[first_course], course_first_ids[first_course + 1])):
+                committed.difference_update(range(course_first_ids[first_course], course_first_ids[first_course + 1]))
+                window.popleft()
+                first_course += 1
+        yield RollingStep(strides, step_span.args['first_course'], end_course, len(pending), step_span.seconds)
@@ -0,0 +1,177 @@
+# A planning service that stays running and plans walls on request, so that each plan doesn't pay
+# for starting Python, importing minizinc (which runs the minizinc executable) and looking up the
+# solvers all over again. Requests come in over a Unix socket, or stdin for a controller that runs
+# the service as a child process:
+#
+#   python service.py --socket /tmp/planner.sock
+#   python service.py --stdio
+#
+# Both ways it's one JSON object per line in each direction. A request is the fields of a
+# `batch.WallSpec` (the name is optional), plus optionally the "planner" and "time_limit" (seconds)
+# to use instead of the service's defaults:
+#
+#   {"bond": "flemish", "width": 5.75, "num_courses": 20, "planner": "portfolio", "time_limit": 30}
+#
+# and the response is the plan as batch.py writes it, with "reused" set if an identical request was
+# already planned, or {"error": "..."} if the request couldn't be planned. Requests are planned one
+# at a time, since the solvers already use all the CPUs, but repeated requests are answered straight
+# away from memory even while another wall is being planned.
+#
+# Minizinc flattens each model again for every wall, since the flattened model depends on the wall's
+# data, so the solver cache (--solver-cache) is what saves the solving itself for repeated walls.
+
+import argparse
+from contextlib import redirect_stdout
+from dataclasses import asdict
+from datetime import timedelta
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import typing as ty
+
+from batch import _PLANNERS, WallPlan, WallSpec, plan_wall
+from bonds import _WILD_PORTFOLIO
+from placer import _STRIDE_PORTFOLIO
+from portfolio import available_configs, available_cpus, lookup_solver
+from solver_cache import SolverCache
+
+class PlanningService:
+    def __init__(
+            self,
+            planner: str = 'optimal',
+            time_limit: timedelta = timedelta(seconds=20),
+            processes: int | None = None,
+            cache: SolverCache | None = None,
+    ):
+        if planner not in _PLANNERS:
+            raise ValueError(f"Unknown planner {planner}")
+        self.planner = planner
+        self.time_limit = time_limit
+        self.processes = available_cpus() if processes is None else processes
+        self.cache = cache
+        # (wall's plan key, planner, time limit) -> plan
+        self._plans: dict[tuple[ty.Any, ...], WallPlan] = {}
+        self._planning = threading.Lock()
+
+    def warm_up(self) -> None:
+        """Import minizinc and look up all the solvers the planners might use now, rather than in the first request"""
+        import minizinc
+        if minizinc.default_driver is None:
+            print("WARNING: minizinc isn't installed, only the greedy planner will work")
+            return
+        for solver in {'gecode', 'cp', *(config.solver for config in available_configs([*_STRIDE_PORTFOLIO, *_WILD_PORTFOLIO]))}:
+            lookup_solver(solver)
+
+    def plan(self, wall: WallSpec, planner: str | None = None, time_limit: timedelta | None = None) -> tuple[WallPlan, bool]:
+        """The plan for the `wall`, and whether it was reused from an identical earlier request"""
+        planner = self.planner if planner is None else planner
+        if planner not in _PLANNERS:
+            raise ValueError(f"Unknown planner {planner}")
+        time_limit = self.time_limit if time_limit is None else time_limit
+        key = (wall.plan_key(), planner, time_limit)
+        # only plans that are already there are looked up outside the lock, so a repeated request
+        # doesn't have to wait for some other wall to be planned
+        plan = self._plans.get(key)
+        if plan is None:
+            with self._planning:
+                plan = self._plans.get(key)
+                if plan is None:
+                    self._plans[key] = plan_wall(wall, planner, time_limit, self.processes, self.cache)
+                    return self._plans[key], False
+        # the same wall could have been asked for under a different name
+        return WallPlan(wall, plan.strides, plan.lower_bound, plan.seconds), True
+
+    def handle(self, request: dict[str, ty.Any]) -> dict[str, ty.Any]:
+        fields = dict(request)
+        planner = fields.pop('planner', None)
+        time_limit = fields.pop('time_limit', None)
+        wall = WallSpec(**{'name': 'wall', **fields})
+        plan, reused = self.plan(wall, planner, None if time_limit is None else timedelta(seconds=time_limit))
+        return {**asdict(plan), 'num_strides': plan.num_strides, 'reused': reused}
+
+    def handle_line(self, line: str) -> str:
+        """One response line for one request line"""
+        try:
+            response = self.handle(json.loads(line))
+        # a bad request (or a wall the solver fails on) shouldn't take the whole service down
+        except Exception as e:
+            response = {'error': f"{type(e).__name__}: {e}"}
+        return json.dumps(response) + '\n'
+
+    def serve_stdio(self, requests: ty.TextIO, responses: ty.TextIO) -> None:
+        """Answer each line of `requests` until it ends. The planners' progress messages go to stderr."""
+        with redirect_stdout(sys.stderr):
+            for line in requests:
+                if line.strip():
+                    responses.write(self.handle_line(line))
+                    responses.flush()
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: '_PlanningServer'
+
+    def handle(self) -> None:
+        # a client can send any number of requests on one connection
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(self.server.service.handle_line(line.decode()).encode())
+                self.wfile.flush()
+
+class _PlanningServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: PlanningService):
+        self.service = service
+        super().__init__(path, _RequestHandler)
+
+def serve_socket(service: PlanningService, path: str) -> _PlanningServer:
+    """
+    Start listening on a Unix socket at `path`, replacing a stale socket left behind there. Call
+    `serve_forever()` on the result to answer requests, and `server_close()` when done.
+    """
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+    return _PlanningServer(path, service)
+
+def request_plan(path: str, request: dict[str, ty.Any]) -> dict[str, ty.Any]:
+    """Ask the service listening at `path` for a plan"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall((json.dumps(request) + '\n').encode())
+        with client.makefile('r') as responses:
+            return json.loads(responses.readline())
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plan walls on request, see the top of service.py for the protocol.")
+    listen = parser.add_mutually_exclusive_group(required=True)
+    listen.add_argument('--socket', type=str, help='Listen for requests on a Unix socket at this path.')
+    listen.add_argument('--stdio', action='store_true', help='Read requests from stdin and write the plans to stdout.')
+    parser.add_argument('--planner', type=str, default='optimal', choices=_PLANNERS, help='How to split the bricks into strides, unless the request says otherwise, like in batch.py.')
+    parser.add_argument('--time-limit', type=int, default=20, help='Time limit in seconds for the solvers, unless the request says otherwise.')
+    parser.add_argument('--processes', type=int, help='Number of threads for the solvers. Defaults to the number of CPUs.')
+    parser.add_argument('--solver-cache', type=str, default='use', choices=['use', 'refresh', 'bypass'], help='Whether to reuse solver results from previous identical runs.')
+    parser.add_argument('--cache-dir', type=str, help='Directory for the solver cache. Defaults to ~/.cache/monumental-take-home-test')
+    args = parser.parse_args()
+
+    service = PlanningService(args.planner, timedelta(seconds=args.time_limit), args.processes, SolverCache(args.cache_dir, mode=args.solver_cache))
+    if args.stdio:
+        with redirect_stdout(sys.stderr):
+            service.warm_up()
+        service.serve_stdio(sys.stdin, sys.stdout)
+        return
+    service.warm_up()
+    with serve_socket(service, args.socket) as server:
+        print(f"Planning service listening on {args.socket}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# On-disk cache of solver results, so that planning the same wall twice doesn't run the solver
+# twice. Entries are content-addressed: the key is a hash of the model file, the solver, every
+# instance parameter and the time limit, so changing any of them (or editing the model) is a miss.
+
+from datetime import timedelta
+import hashlib
+import json
+import os
+import typing as ty
+
+_DEFAULT_MAX_BYTES: ty.Final = 64 * 1024 * 1024
+
+def default_cache_dir() -> str:
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(xdg_cache_home, 'monumental-take-home-test')
+
+class SolverCache:
+    """
+    `mode` is one of:
+    - "use": read and write the cache
+    - "refresh": ignore existing entries but write new ones, eg to redo a run with a longer time limit
+    - "bypass": don't touch the cache at all
+    Once the cache is bigger than `max_bytes`, the least recently used entries are evicted.
+    """
+    def __init__(self, directory: str | None = None, max_bytes: int = _DEFAULT_MAX_BYTES, mode: str = 'use'):
+        if mode not in ('use', 'refresh', 'bypass'):
+            raise ValueError(f"Unknown solver cache mode {mode}")
+        self.directory = default_cache_dir() if directory is None else directory
+        self.max_bytes = max_bytes
+        self.mode = mode
+
+    def key(self, model_path: str | list[str], solver: str, params: dict[str, ty.Any], time_limit: timedelta | None) -> str:
+        """`model_path` can also be a list of models, when several were run on the same problem"""
+        hasher = hashlib.sha256()
+        for path in [model_path] if isinstance(model_path, str) else model_path:
+            with open(path, 'rb') as model_file:
+                hasher.update(model_file.read())
+        hasher.update(json.dumps({
+            'solver': solver,
+            'params': params,
+            'time_limit': None if time_limit is None else time_limit.total_seconds(),
+        }, sort_keys=True).encode())
+        return hasher.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> dict[str, ty.Any] | None:
+        if self.mode != 'use':
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as entry_file:
+                entry = json.load(entry_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # bump the mtime, which is what eviction goes by
+        os.utime(path)
+        return entry
+
+    def put(self, key: str, entry: dict[str, ty.Any]) -> None:
+        if self.mode == 'bypass':
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # write then rename, so that concurrent runs (eg decomposition workers) never see a partial
+        # entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries: list[tuple[float, int, str]] = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # another process evicted it first
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
@@ -0,0 +1,68 @@
+from datetime import timedelta
+import json
+
+import pytest
+
+from batch import WallFailure, WallPlan, WallSpec, read_job_file, run_batch, solver_time_limit
+
+def test_solver_time_limit() -> None:
+    # 8 runs on 4 workers take two rounds
+    assert solver_time_limit(100.0, 8, 4) == timedelta(seconds=50)
+    assert solver_time_limit(100.0, 3, 4) == timedelta(seconds=100)
+    # out of time, but the solver still needs a moment to return the warm start
+    assert solver_time_limit(-5.0, 2, 1) == timedelta(seconds=1)
+
+def test_read_job_file(tmp_path) -> None:
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps({'walls': [
+        {'name': 'north', 'bond': 'stretcher', 'width': 10.5, 'num_courses': 32},
+        {'name': 'gable', 'bond': 'flemish', 'width': 5.75, 'num_courses': 20, 'stride_height': 700, 'stride_width': 430},
+    ]}))
+    assert read_job_file(str(path)) == [
+        WallSpec('north', 'stretcher', 10.5, 32),
+        WallSpec('gable', 'flemish', 5.75, 20, stride_height=700, stride_width=430),
+    ]
+
+def test_run_batch(tmp_path) -> None:
+    walls = [
+        WallSpec('north', 'stretcher', 5.0, 10),
+        WallSpec('south', 'stretcher', 5.0, 10),
+        WallSpec('garden', 'wild', 5.0, 10, wild_generator='native', seed=1),
+    ]
+    plans = run_batch(walls, str(tmp_path), planner='greedy', max_workers=2)
+    assert set(plans) == {'north', 'south', 'garden'}
+    # the same wall under two names is only planned once
+    assert plans['north'].strides == plans['south'].strides
+    for wall in walls:
+        with open(tmp_path / f"{wall.name}.json") as plan_file:
+            written = json.load(plan_file)
+        assert written['wall']['name'] == wall.name
+        assert written['strides'] == plans[wall.name].strides
+        assert written['num_strides'] == len(written['strides'])
+    # every brick is placed exactly once
+    assert sorted(brick_id for stride in plans['north'].strides for brick_id in stride) == list(range(55))
+
+def test_read_job_file_checks_walls(tmp_path) -> None:
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps({'walls': [
+        {'name': 'north', 'bond': 'herringbone', 'width': 10.5, 'num_courses': 32},
+        {'name': 'garden', 'bond': 'wild', 'width': 5.0, 'num_courses': 20, 'wild_generator': 'random'},
+    ]}))
+    with pytest.raises(ValueError, match="herringbone.*random"):
+        read_job_file(str(path))
+    with pytest.raises(ValueError, match="planner"):
+        run_batch([WallSpec('north', 'stretcher', 5.0, 10)], str(tmp_path), planner='fastest')
+
+def test_run_batch_keeps_going_after_failure(tmp_path) -> None:
+    walls = [
+        # a flemish bond can't be 5 stretchers wide
+        WallSpec('bad', 'flemish', 5.0, 10),
+        WallSpec('good', 'stretcher', 5.0, 10),
+    ]
+    results = run_batch(walls, str(tmp_path), planner='greedy', max_workers=2)
+    assert isinstance(results['bad'], WallFailure)
+    assert isinstance(results['good'], WallPlan)
+    with open(tmp_path / 'bad.json') as plan_file:
+        assert 'flemish' in json.load(plan_file)['error']
+    with open(tmp_path / 'good.json') as plan_file:
+        assert json.load(plan_file)['num_strides'] == results['good'].num_strides
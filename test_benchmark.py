@@ -0,0 +1,55 @@
+from benchmark import BenchmarkCase, CaseResult, StageResult, compare, default_cases, run_case
+
+def test_run_case() -> None:
+    result = run_case(BenchmarkCase('stretcher', 5.0, 10, 1300.0, 800))
+    assert result.name == 'stretcher 5x10 stride 1300x800'
+    assert result.num_bricks == 55
+    assert 0 < result.lower_bound <= result.num_strides
+    assert list(result.stages) == ['bond', 'brickify', 'dependency_graph', 'greedy', 'topo_sort', 'print']
+    assert all(stage.seconds >= 0 and stage.peak_bytes >= 0 for stage in result.stages.values())
+    # the memory pass is separate from the timed ones, but still measures every stage
+    assert result.stages['dependency_graph'].peak_bytes > 0
+    assert result.solver is None and result.status is None
+
+def test_default_cases() -> None:
+    assert len(default_cases()) == 4 * 2 * 3 * 2
+    assert len(default_cases(quick=True)) == 4
+
+def test_compare() -> None:
+    baseline = {'planner': 'greedy', 'cases': [{
+        'name': 'wall',
+        'num_strides': 5,
+        'stages': {
+            'greedy': {'seconds': 1.0, 'peak_bytes': 10_000_000},
+            'print': {'seconds': 0.001, 'peak_bytes': 1000},
+        },
+    }]}
+
+    def result(num_strides: int, greedy_seconds: float, greedy_bytes: int, print_seconds: float) -> CaseResult:
+        return CaseResult('wall', num_strides=num_strides, stages={
+            'greedy': StageResult(greedy_seconds, greedy_bytes),
+            'print': StageResult(print_seconds, 1000),
+        })
+
+    assert compare([result(5, 1.2, 11_000_000, 0.003)], baseline) == []
+    # three times slower, but only by a couple of milliseconds, which is noise
+    assert compare([result(5, 1.0, 10_000_000, 0.003)], baseline) == []
+    assert len(compare([result(6, 1.0, 10_000_000, 0.001)], baseline)) == 1
+    assert len(compare([result(5, 2.0, 20_000_000, 0.001)], baseline)) == 2
+    # cases that aren't in the baseline don't count
+    assert compare([CaseResult('other wall', num_strides=100)], baseline) == []
+
+def test_compare_solver_status() -> None:
+    baseline = {'planner': 'optimal', 'cases': [
+        {'name': 'optimal wall', 'num_strides': 5, 'proven_optimal': True, 'status': 'OPTIMAL_SOLUTION', 'stages': {}},
+        {'name': 'solved wall', 'num_strides': 5, 'proven_optimal': False, 'status': 'SATISFIED', 'stages': {}},
+    ]}
+    assert compare([
+        CaseResult('optimal wall', num_strides=5, proven_optimal=True, status='UNSATISFIABLE'),
+        CaseResult('solved wall', num_strides=5, status='SATISFIED'),
+    ], baseline) == []
+    # same number of strides, but no longer proven optimal, or only the warm start
+    assert len(compare([CaseResult('optimal wall', num_strides=5, status='SATISFIED')], baseline)) == 1
+    assert len(compare([CaseResult('solved wall', num_strides=5, status='UNKNOWN')], baseline)) == 1
+    # a plan the solver gave up on but that meets the lower bound anyway is still fine
+    assert compare([CaseResult('solved wall', num_strides=5, proven_optimal=True, status='UNKNOWN')], baseline) == []
@@ -1,4 +1,6 @@
-from bonds import stretcher_bond, flemish_bond, cross_bond
+from itertools import islice
+
+from bonds import cross_courses, detect_period, flemish_courses, native_wild_bond, native_wild_courses, stretcher_bond, stretcher_courses, flemish_bond, cross_bond
 
 def test_stretcher_bond() -> None:
     bond = stretcher_bond(3, 4.5)
@@ -33,3 +35,49 @@ def test_cross_bond() -> None:
         second_course,
         first_course,
     ]
+
+def test_courses_streams() -> None:
+    assert list(islice(stretcher_courses(4.5), 3)) == stretcher_bond(3, 4.5)
+    assert list(islice(flemish_courses(5.75), 3)) == flemish_bond(3, 5.75)
+    assert list(islice(cross_courses(4.5), 3)) == cross_bond(3, 4.5)
+
+def test_detect_period() -> None:
+    assert detect_period(stretcher_courses(4.5)) == 2
+    assert detect_period(flemish_courses(5.75)) == 2
+    assert detect_period(cross_courses(4.5)) == 2
+    assert detect_period([[0.5], [0.5], [0.5]]) == 1
+    assert detect_period([[0.5], [1.0], [0.25], [0.5], [1.0], [0.75]]) is None
+
+def _assert_valid_wild_bond(bond: list[list[float]], width: float) -> None:
+    # straight from the constraints in wild.mzn, as head joint positions in quarter bricks
+    last_index = int(width * 4) - 2
+    courses = [{int(joint * 4) for joint in course} for course in bond]
+    for row, course in enumerate(courses):
+        assert all(1 <= joint <= last_index and joint % 2 == row % 2 for joint in course)
+        for j in range(1, last_index - 3):
+            assert any(j + k in course for k in range(5))
+            assert not {j, j + 2, j + 4} <= course
+    for row in range(len(courses) - 4):
+        for j in range(1, last_index + 1):
+            assert not all(j - (k % 2) in courses[row + k] for k in range(5)) or j < 3
+            assert not all(j + (k % 2) in courses[row + k] for k in range(5)) or j > last_index - 1
+            assert not all(j - k in courses[row + k] for k in range(5))
+            assert not all(j + k in courses[row + k] for k in range(5))
+
+def test_native_wild_bond() -> None:
+    # 1.75 and 2.0 are the narrowest walls with a full stretcher-length window, which is at their edges
+    for width in [0.5, 1.25, 1.75, 2.0, 3.0, 5.0, 10.25]:
+        for seed in range(3):
+            bond = native_wild_bond(40, width, seed=seed)
+            assert len(bond) == 40
+            _assert_valid_wild_bond(bond, width)
+    # wide walls, which are much more likely to get the search stuck
+    for width, seed in [(25.0, 0), (25.0, 1), (30.0, 1), (40.0, 0), (40.0, 1), (40.0, 2)]:
+        bond = native_wild_bond(40, width, seed=seed)
+        assert len(bond) == 40
+        _assert_valid_wild_bond(bond, width)
+
+    assert native_wild_bond(20, 5.0, seed=1) ==native_wild_bond(20, 5.0, seed=1)
+    assert native_wild_bond(20, 5.0, seed=1) != native_wild_bond(20, 5.0, seed=2)
+    # the stream is the same however much of it is taken
+    assert list(islice(native_wild_courses(5.0, seed=3), 10)) == native_wild_bond(20, 5.0, seed=3)[:10]
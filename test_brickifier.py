@@ -1,4 +1,4 @@
-from brickifier import brickify, Brick
+from brickifier import BrickTable, brickify, brickify_table, courses_within_height, Brick
 
 def test_brickify():
     width = 4.5
@@ -46,3 +46,29 @@ def test_brick_real_x():
     stretcher_2 = Brick(0.0, 1.0, 0)
     assert stretcher_2.real_left_x() == 0
     assert stretcher_2.real_right_x() == 210
+
+def test_courses_within_height():
+    # 21 courses of 50mm bricks with 12.5mm bed joints between them is exactly 1300mm
+    assert courses_within_height(1300.0) == 20
+    assert courses_within_height(1299.0) == 19
+    # just one brick
+    assert courses_within_height(50.0) == 0
+    assert Brick(0.0, 1.0, 20).real_top_y() - Brick(0.0, 1.0, 0).real_bottom_y() == 1300.0
+
+def test_brick_table():
+    bond = [
+        [0.5, 1.5, 2.5, 3.5],
+        [1.0, 2.0, 3.0, 4.0],
+    ]
+    table = brickify_table(bond, 4.5)
+    assert len(table) == 10
+    assert table.bricks() == brickify(bond, 4.5)
+    assert BrickTable.from_brick_list(brickify(bond, 4.5)).bricks() == table.bricks()
+
+    assert list(table.left_quarters[:3]) == [0, 2, 6]
+    assert list(table.right_quarters[:3]) == [2, 6, 10]
+    for brick_id, brick in enumerate(table.bricks()):
+        assert table.real_left_x[brick_id] == brick.real_left_x()
+        assert table.real_right_x[brick_id] == brick.real_right_x()
+        assert table.real_bottom_y[brick_id] == brick.real_bottom_y()
+        assert table.real_top_y[brick_id] == brick.real_top_y()
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from bonds import flemish_courses, stretcher_bond, flemish_bond, stretcher_courses
+from brickifier import brickify, brickify_table
+from decomposition import _normalize_band, assign_bands, decomposed_placement_order, periodic_placement_order
+from dependency_graph import brick_list_to_placeable_brick_list, unlinked_placeable_brick_list
+
+def test_assign_bands_rows() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(45, 4.0), 4.0))
+    band_of = assign_bands(placeable_bricks, 1300.0, None)
+    # 21 courses fit in a 1300mm stride
+    for placeable_brick in placeable_bricks:
+        assert band_of[placeable_brick] == (placeable_brick.brick.course_no // 21, 0)
+
+def test_assign_bands_dependency_order() -> None:
+    for bond, width in [(stretcher_bond(30, 10.5), 10.5), (flemish_bond(30, 11.75), 11.75)]:
+        placeable_bricks = brick_list_to_placeable_brick_list(700.0, 500, brickify(bond, width))
+        band_of = assign_bands(placeable_bricks, 700.0, 500)
+        assert len({column for _, column in band_of.values()}) > 1
+        for placeable_brick in placeable_bricks:
+            for dep in placeable_brick.dependencies:
+                assert band_of[dep] <= band_of[placeable_brick]
+
+def test_assign_bands_period() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(45, 4.0), 4.0))
+    # 21 courses fit in a stride, rounded down to 20 to line up with the two course period
+    band_of = assign_bands(placeable_bricks, 1300.0, None, period=2)
+    for placeable_brick in placeable_bricks:
+        assert band_of[placeable_brick] == (placeable_brick.brick.course_no // 20, 0)
+    # but bands are never shorter than the period
+    band_of = assign_bands(placeable_bricks, 50.0, None, period=2)
+    for placeable_brick in placeable_bricks:
+        assert band_of[placeable_brick] == (placeable_brick.brick.course_no // 2, 0)
+
+def test_normalize_band() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(8, 4.0), 4.0))
+    band_of = assign_bands(placeable_bricks, 200.0, None, period=2)
+    bands: dict = {}
+    for placeable_brick in placeable_bricks:
+        bands.setdefault(band_of[placeable_brick], []).append(placeable_brick)
+    # every band of a stretcher bond looks the same once moved down to course 0
+    assert len(bands) == 4
+    assert len({tuple(_normalize_band(band)) for band in bands.values()}) == 1
+    assert _normalize_band(bands[(0, 0)]) == [placeable_brick.brick for placeable_brick in bands[(0, 0)]]
+
+def test_periodic_placement_order_matches_decomposed() -> None:
+    # A stride wide enough for the whole wall means the greedy warm start of every band is a single
+    # stride and meets the lower bound, so this doesn't need the solver.
+    for courses_fn, bond_fn, width, num_courses in [(stretcher_courses, stretcher_bond, 4.0, 11), (flemish_courses, flemish_bond, 5.75, 8), (stretcher_courses, stretcher_bond, 4.0, 3)]:
+        table = brickify_table(bond_fn(num_courses, width), width)
+        placeable_bricks = brick_list_to_placeable_brick_list(250.0, 10000, table)
+        decomposed = decomposed_placement_order(placeable_bricks, timedelta(seconds=1), 250.0, 10000, period=2, max_workers=1)
+        tiled = periodic_placement_order(courses_fn(width), num_courses, width, 2, timedelta(seconds=1), 250.0, 10000, max_workers=1)
+        assert tiled.num_strides == decomposed.num_strides
+        assert tiled.lower_bound <= tiled.num_strides
+        assert tiled.placement_order(placeable_bricks) == decomposed.placement_order
+        # and it works on bricks without a dependency graph too
+        unlinked = unlinked_placeable_brick_list(table)
+        assert [[placeable_brick.brick_id for placeable_brick in stride] for stride in tiled.placement_order(unlinked)] == tiled.strides
@@ -0,0 +1,67 @@
+from bonds import stretcher_bond, flemish_bond, cross_bond
+from brickifier import brickify, brickify_table
+from dependency_graph import PlaceableBrick, brick_list_to_placeable_brick_list, brick_table_adjacency, do_bricks_overlap, are_bricks_in_same_stride
+
+def _assert_matches_brute_force(bond: list[list[float]], width: float, stride_height: float, stride_width: int) -> None:
+    bricks = brickify(bond, width)
+    placeable_bricks = brick_list_to_placeable_brick_list(stride_height, stride_width, bricks)
+    assert [placeable_brick.brick for placeable_brick in placeable_bricks] == bricks
+
+    for placeable_brick in placeable_bricks:
+        brick = placeable_brick.brick
+        expected_dependencies = {
+            other.brick for other in placeable_bricks
+            if brick.course_no - 1 == other.brick.course_no and do_bricks_overlap(brick, other.brick)
+        }
+        expected_within_same_stride = {
+            other.brick for other in placeable_bricks
+            if are_bricks_in_same_stride(stride_height, stride_width, brick, other.brick)
+        }
+        assert {dep.brick for dep in placeable_brick.dependencies} == expected_dependencies
+        assert {other.brick for other in placeable_brick.within_same_stride} == expected_within_same_stride
+
+def test_dependencies_stretcher_bond() -> None:
+    bricks = brickify(stretcher_bond(2, 2.0), 2.0)
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, bricks)
+    # second course is [0.0, 1.0], [1.0, 2.0] on top of [0.0, 0.5], [0.5, 1.5], [1.5, 2.0]
+    assert {dep.brick for dep in placeable_bricks[3].dependencies} == {bricks[0], bricks[1]}
+    assert {dep.brick for dep in placeable_bricks[4].dependencies} == {bricks[1], bricks[2]}
+    for placeable_brick in placeable_bricks[:3]:
+        assert placeable_brick.dependencies == set()
+
+def test_matches_brute_force() -> None:
+    _assert_matches_brute_force(stretcher_bond(32, 10.5), 10.5, 1300.0, 800)
+    _assert_matches_brute_force(flemish_bond(12, 5.75), 5.75, 300.0, 500)
+    _assert_matches_brute_force(cross_bond(12, 5.5), 5.5, 200.0, 430)
+    # narrower than a stretcher, so only headers and quarters fit in a stride
+    _assert_matches_brute_force(flemish_bond(6, 5.75), 5.75, 300.0, 150)
+
+def test_brick_table_adjacency() -> None:
+    table = brickify_table(stretcher_bond(2, 2.0), 2.0)
+    dependencies, within_same_stride = brick_table_adjacency(1300.0, 800, table)
+    assert len(dependencies) == 5
+    assert [list(dependencies.neighbours(brick_id)) for brick_id in range(5)] == [[], [], [], [0, 1], [1, 2]]
+    assert dependencies.num_edges() == 4
+    # the whole wall fits in one stride
+    for brick_id in range(5):
+        assert list(within_same_stride.neighbours(brick_id)) == [0, 1, 2, 3, 4]
+
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, table)
+    assert [placeable_brick.brick_id for placeable_brick in placeable_bricks] == [0, 1, 2, 3, 4]
+
+def test_placeable_brick_extents_from_table() -> None:
+    bricks = brickify(flemish_bond(4, 5.75), 5.75)
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify_table(flemish_bond(4, 5.75), 5.75))
+    for brick, placeable_brick in zip(bricks, placeable_bricks):
+        assert placeable_brick.table is not None
+        # read from the table, and the same as going through `Brick`
+        standalone = PlaceableBrick(brick, set(), set())
+        assert placeable_brick.real_extents() == standalone.real_extents() == (brick.real_left_x(), brick.real_right_x(), brick.real_bottom_y(), brick.real_top_y())
+        assert placeable_brick.quarters() == standalone.quarters()
+
+def test_placeable_brick_repr() -> None:
+    # the neighbour sets point at each other, so a repr that followed them would never finish on a
+    # wall this size
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify_table(stretcher_bond(30, 10.0), 10.0))
+    assert repr(placeable_bricks[12]) == f"PlaceableBrick(brick={placeable_bricks[12].brick!r}, brick_id=12, placed_in_stride=None)"
+    assert len(repr(placeable_bricks)) < 200 * len(placeable_bricks)
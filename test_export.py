@@ -0,0 +1,52 @@
+import io
+
+import pytest
+
+from bonds import stretcher_bond
+from brickifier import brickify_table
+from dependency_graph import brick_list_to_placeable_brick_list
+from export import BinaryPlanReader, BinaryPlanWriter, JsonlPlanWriter, PlacedBrick, export_placement_order, read_jsonl_plan
+from placer import greedy_placement_order
+
+def test_export_round_trip(tmp_path) -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(700.0, 430, brickify_table(stretcher_bond(6, 3.0), 3.0))
+    placement_order = greedy_placement_order(placeable_bricks, 700.0, 430)
+    jsonl = io.StringIO()
+    with open(tmp_path / 'plan.bin', 'wb') as binary_file:
+        export_placement_order(placement_order, [JsonlPlanWriter(jsonl), BinaryPlanWriter(binary_file)])
+    assert all(placeable_brick.placed_in_stride is not None for placeable_brick in placeable_bricks)
+
+    jsonl.seek(0)
+    from_jsonl = list(read_jsonl_plan(jsonl))
+    with BinaryPlanReader(str(tmp_path / 'plan.bin')) as reader:
+        assert len(reader) == len(placeable_bricks)
+        from_binary = list(reader)
+        assert reader[-1] == from_binary[-1]
+    assert from_jsonl == from_binary
+
+    assert [(placed_brick.stride, placed_brick.order) for placed_brick in from_binary] == [
+        (stride_no, order) for stride_no, stride in enumerate(placement_order) for order in range(len(stride))
+    ]
+    # the second brick of the first course is [110, 320] in x
+    [second] = [placed_brick for placed_brick in from_binary if placed_brick.brick_id == 1]
+    assert (second.course, second.left_x, second.right_x, second.bottom_y) == (0, 110, 320, 0.0)
+
+def test_binary_reader_partial_file(tmp_path) -> None:
+    path = tmp_path / 'plan.bin'
+    placed_brick = PlacedBrick(0, 0, 3, 1, 0, 210, 62.5, 112.5)
+    with open(path, 'wb') as binary_file:
+        writer = BinaryPlanWriter(binary_file)
+        with BinaryPlanReader(str(path)) as reader:
+            assert len(reader) == 0
+            assert list(reader) == []
+        writer.write_stride([placed_brick])
+        # half of the next record, as if the writer was still going
+        binary_file.write(b'\0' * 10)
+    with BinaryPlanReader(str(path)) as reader:
+        assert list(reader) == [placed_brick]
+        with pytest.raises(IndexError):
+            reader[1]
+
+    path.write_bytes(b'not a plan at all')
+    with pytest.raises(ValueError):
+        BinaryPlanReader(str(path))
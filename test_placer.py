@@ -0,0 +1,186 @@
+import asyncio
+import collections.abc as tyc
+from datetime import timedelta
+
+import pytest
+
+from bonds import stretcher_bond, flemish_bond, cross_bond
+from brickifier import brickify
+from dependency_graph import PlaceableBrickList, brick_list_to_placeable_brick_list
+from placer import (
+    MoveCost, PlacementOrder, PlacementPlan, PlanProgress, _positional_model_data, _stride_array_to_placement_order,
+    _stride_model_data, _topo_sort, anytime_placement_order, greedy_placement_order, head_travel_distances,
+    platform_travel, settled_placement_order, stride_count_lower_bound, unstrided_placement_order,
+)
+
+def _assert_valid_placement_order(placeable_bricks: PlaceableBrickList, placement_order: PlacementOrder) -> None:
+    placed = [placeable_brick for stride in placement_order for placeable_brick in stride]
+    assert len(placed) == len(placeable_bricks)
+    assert set(placed) == set(placeable_bricks)
+
+    seen = set()
+    for stride in placement_order:
+        assert len(stride) > 0
+        for placeable_brick in stride:
+            assert placeable_brick.dependencies <= seen
+            assert set(stride) <= placeable_brick.within_same_stride
+            seen.add(placeable_brick)
+
+def test_unstrided_placement_order() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(3, 2.0), 2.0))
+    placement_order = unstrided_placement_order(placeable_bricks)
+    assert len(placement_order) == 1
+    placed = set()
+    for placeable_brick in placement_order[0]:
+        assert placeable_brick.dependencies <= placed
+        placed.add(placeable_brick)
+    assert placed == set(placeable_bricks)
+
+def test_greedy_placement_order() -> None:
+    for bond, width, stride_height, stride_width in [
+        (stretcher_bond(32, 10.5), 10.5, 1300.0, 800),
+        (flemish_bond(20, 5.75), 5.75, 300.0, 500),
+        (cross_bond(20, 5.5), 5.5, 700.0, 430),
+    ]:
+        placeable_bricks = brick_list_to_placeable_brick_list(stride_height, stride_width, brickify(bond, width))
+        _assert_valid_placement_order(placeable_bricks, greedy_placement_order(placeable_bricks, stride_height, stride_width))
+
+def test_greedy_placement_order_single_stride() -> None:
+    # the whole wall fits in one stride window
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(4, 3.5), 3.5))
+    assert len(greedy_placement_order(placeable_bricks, 1300.0, 800)) == 1
+
+def test_greedy_placement_order_brick_too_big() -> None:
+    # the 210mm stretchers are wider than the stride
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 200, brickify(stretcher_bond(3, 3.0), 3.0))
+    with pytest.raises(ValueError, match=r"relative_left_x=0.5, relative_right_x=1.5, course_no=0\) is 210x50mm, which doesn't fit in a 200x1300mm stride"):
+        greedy_placement_order(placeable_bricks, 1300.0, 200)
+
+def test_positional_model_data() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(2, 2.0), 2.0))
+    data = _positional_model_data(placeable_bricks, 1300.0, 800)
+    assert data['left_x'] == [0, 110, 330, 0, 220]
+    assert data['right_x'] == [100, 320, 430, 210, 430]
+    assert data['course'] == [0, 0, 0, 1, 1]
+    assert data['stride_courses'] == 20
+    # each brick of the second course sits on two bricks of the first
+    assert data['n_dependencies'] == 4
+    assert sorted(zip(data['dependency_before'], data['dependency_after'])) == [(1, 4), (2, 4), (2, 5), (3, 5)]
+
+def test_stride_count_lower_bound() -> None:
+    # a single course 2300mm wide needs at least four 800mm windows, since bricks can't be split
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(1, 10.5), 10.5))
+    assert stride_count_lower_bound(placeable_bricks, 1300.0, 800) == 4
+    # and courses more than a stride height apart can't share any strides
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(32, 10.5), 10.5))
+    assert stride_count_lower_bound(placeable_bricks, 1300.0, 800) == 8
+
+    for bond, width, stride_height, stride_width in [
+        (stretcher_bond(32, 10.5), 10.5, 1300.0, 800),
+        (flemish_bond(20, 5.75), 5.75, 300.0, 500),
+        (cross_bond(20, 5.5), 5.5, 700.0, 430),
+    ]:
+        placeable_bricks = brick_list_to_placeable_brick_list(stride_height, stride_width, brickify(bond, width))
+        lower_bound = stride_count_lower_bound(placeable_bricks, stride_height, stride_width)
+        assert 0 < lower_bound <= len(greedy_placement_order(placeable_bricks, stride_height, stride_width))
+
+def test_topo_sort_follows_head() -> None:
+    # one course: [0, 100], [110, 320], [330, 540], [550, 760]
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(1, 3.5), 3.5))
+    assert _topo_sort(set(placeable_bricks)) == placeable_bricks
+    assert _topo_sort(set(placeable_bricks), head=(1000.0, 0.0)) == list(reversed(placeable_bricks))
+    # starting in the middle, the head goes to the closest brick and then follows its nearest
+    # neighbour from wherever it last placed a brick
+    assert _topo_sort(set(placeable_bricks), head=(300.0, 0.0)) == [placeable_bricks[i] for i in (1, 0, 2, 3)]
+
+def test_topo_sort_respects_dependencies() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(flemish_bond(10, 5.75), 5.75))
+    for head in [(0.0, 0.0), (2000.0, 1000.0), (600.0, 300.0)]:
+        placed = set()
+        for placeable_brick in _topo_sort(set(placeable_bricks), head):
+            assert placeable_brick.dependencies <= placed
+            placed.add(placeable_brick)
+        assert placed == set(placeable_bricks)
+
+def test_head_travel_distances() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(1, 3.5), 3.5))
+    # midpoints are at x = 50, 215, 435, 655 and y = 25
+    distances = head_travel_distances([placeable_bricks[:2], placeable_bricks[2:]])
+    assert len(distances) == 2
+    assert abs(distances[0] - ((50 ** 2 + 25 ** 2) ** 0.5 + 165)) < 1e-6
+    assert abs(distances[1] - 440) < 1e-6
+
+def test_platform_travel() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(1, 3.5), 3.5))
+    # the strides span x = 0..320 and 330..760
+    placement_order = [placeable_bricks[:2], placeable_bricks[2:]]
+    assert platform_travel(placement_order) == 385
+    assert platform_travel(placement_order, MoveCost(horizontal=2, vertical=5)) == 770
+    assert platform_travel(placement_order[:1]) == 0
+
+    # two courses, so the platform moves up too
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(2, 3.0), 3.0))
+    placement_order = _stride_array_to_placement_order(placeable_bricks, [1, 1, 2, 1, 1, 2, 2])
+    move_cost = MoveCost(horizontal=1, vertical=3)
+    travel = platform_travel(placement_order, move_cost)
+    assert travel > 0
+
+    # the models' travel, in quarter mm, agrees exactly, so it can be bounded by a plan's travel
+    for model in ['matrix', 'positional']:
+        data = _stride_model_data(placeable_bricks, None, 2, model, 1300.0, 800, move_cost)
+        assert data['minimize_travel']
+        centres = []
+        for stride in [[0, 1, 3, 4], [2, 5, 6]]:
+            centres.append((
+                min(data['travel_left_x'][i] for i in stride) + max(data['travel_right_x'][i] for i in stride),
+                min(data['travel_bottom_y'][i] for i in stride) + max(data['travel_top_y'][i] for i in stride),
+            ))
+        (x1, y1), (x2, y2) = centres
+        assert move_cost.horizontal * abs(x2 - x1) + move_cost.vertical * abs(y2 - y1) == travel * 4
+    assert not _stride_model_data(placeable_bricks, None, 2, 'matrix', 1300.0, 800)['minimize_travel']
+
+def test_stride_array_to_placement_order() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(2, 3.0), 3.0))
+    # one course of 3 bricks then one of 2 half bricks and 2 stretchers
+    stride = [1, 1, 2, 1, 1, 2, 2]
+    placement_order = _stride_array_to_placement_order(placeable_bricks, stride)
+    assert [set(stride) for stride in placement_order] == [
+        {placeable_bricks[i] for i in [0, 1, 3, 4]},
+        {placeable_bricks[i] for i in [2, 5, 6]},
+    ]
+
+def test_anytime_placement_order_warm_start_meets_bound() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(4, 3.0), 3.0))
+    warm_start = [list(placeable_bricks)]
+
+    async def collect() -> list[PlanProgress]:
+        return [progress async for progress in anytime_placement_order(placeable_bricks, timedelta(seconds=1), warm_start=warm_start, stride_width=10000)]
+
+    # a single stride can't be beaten, so the solver never runs
+    progress = asyncio.run(collect())
+    assert len(progress) == 1
+    assert progress[0].final
+    assert progress[0].plan.num_strides == 1
+    assert progress[0].plan.optimality_gap == 0
+
+def _fake_progress(num_strides: list[int], delays: list[float], final: bool) -> tyc.AsyncIterator[PlanProgress]:
+    async def progress() -> tyc.AsyncIterator[PlanProgress]:
+        for i, (count, delay) in enumerate(zip(num_strides, delays)):
+            await asyncio.sleep(delay)
+            placement_order: PlacementOrder = [[] for _ in range(count)]
+            yield PlanProgress(PlacementPlan(placement_order, lower_bound=1), elapsed=0.0, final=final and i == len(num_strides) - 1)
+    return progress()
+
+def test_settled_placement_order() -> None:
+    seen: list[int] = []
+    plan = asyncio.run(settled_placement_order(_fake_progress([5, 4, 3], [0, 0, 0], final=True), on_progress=lambda progress: seen.append(progress.plan.num_strides)))
+    assert plan.num_strides == 3
+    assert seen == [5, 4, 3]
+
+    # the solver running out of time without proving anything still gives the best plan
+    plan = asyncio.run(settled_placement_order(_fake_progress([5, 4], [0, 0], final=False)))
+    assert plan.num_strides == 4
+
+    # the last plan takes too long to turn up, so we commit to the one before it
+    plan = asyncio.run(settled_placement_order(_fake_progress([5, 4, 3], [0, 0, 10.0], final=True), stable_for=timedelta(seconds=0.05)))
+    assert plan.num_strides == 4
@@ -0,0 +1,90 @@
+import asyncio
+import collections.abc as tyc
+from datetime import timedelta
+import typing as ty
+
+import minizinc
+
+from portfolio import RacerReport, SolverConfig, available_configs, race, split_processes
+
+def test_split_processes() -> None:
+    assert split_processes(3, 8) == [3, 3, 2]
+    assert split_processes(2, 2) == [1, 1]
+    # not enough CPUs for everyone, so only the first configs race
+    assert split_processes(4, 2) == [1, 1]
+    assert split_processes(4, 1) == [1]
+
+def test_available_configs() -> None:
+    configs = [SolverConfig('gecode'), SolverConfig('chuffed', free_search=True), SolverConfig('cp-sat', model='positional')]
+    assert available_configs(configs, installed={'gecode', 'cp-sat'}) == [configs[0], configs[2]]
+    assert [config.name for config in configs] == ['gecode', 'chuffed/free', 'cp-sat/positional']
+
+# Each fake solver finds solutions with these objectives, one every `delay` seconds, but only those
+# under the bound it was started with, then finishes with the given status.
+_Script: ty.TypeAlias = tuple[list[int], float, minizinc.result.Status]
+
+def _fake_racer(scripts: dict[str, _Script], starts: list[tuple[str, int | None]]):
+    async def run(config: SolverConfig, processes: int, upper_bound: int | None, time_limit: timedelta | None) -> tyc.AsyncIterator[RacerReport]:
+        starts.append((config.name, upper_bound))
+        objectives, delay, status = scripts[config.name]
+        if status == minizinc.result.Status.ERROR:
+            raise RuntimeError("solver crashed")
+        for objective in objectives:
+            if upper_bound is None or objective <= upper_bound:
+                await asyncio.sleep(delay)
+                yield RacerReport(minizinc.result.Status.SATISFIED, f"{config.name} {objective}", objective)
+        await asyncio.sleep(delay)
+        yield RacerReport(status)
+    return run
+
+def _race(scripts: dict[str, _Script], time_limit: float = 10.0, lower_bound: int | None = None):
+    starts: list[tuple[str, int | None]] = []
+    configs = [SolverConfig(name) for name in scripts]
+    result = asyncio.run(race(configs, _fake_racer(scripts, starts), len(configs), timedelta(seconds=time_limit), upper_bound=9, lower_bound=lower_bound))
+    return result, starts
+
+def test_race_first_proof_wins() -> None:
+    result, starts = _race({
+        'slow': ([8, 7, 6, 5], 0.2, minizinc.result.Status.OPTIMAL_SOLUTION),
+        'fast': ([8, 6], 0.01, minizinc.result.Status.OPTIMAL_SOLUTION),
+    })
+    assert result.status == minizinc.result.Status.OPTIMAL_SOLUTION
+    assert result.objective == 6
+    assert result.solution == 'fast 6'
+    assert result.winner == SolverConfig('fast')
+    # the slow solver was restarted with the bound from each of the fast one's solutions
+    assert ('slow', 9) in starts and ('slow', 7) in starts and ('slow', 5) in starts
+
+def test_race_shares_bound() -> None:
+    # the slow solver would take a long time to get to 5 by itself, but with the bound of 6 from the
+    # other one it goes straight there and proves it
+    result, starts = _race({
+        'steady': ([8, 7, 6, 5], 0.05, minizinc.result.Status.OPTIMAL_SOLUTION),
+        'stuck': ([6], 0.01, minizinc.result.Status.SATISFIED),
+    })
+    assert result.objective == 5
+    assert result.winner == SolverConfig('steady')
+    assert ('steady', 5) in starts
+
+def test_race_lower_bound_and_unsat() -> None:
+    # meeting the lower bound ends the race without waiting for a proof
+    result, _ = _race({'a': ([8, 4], 0.01, minizinc.result.Status.SATISFIED), 'b': ([], 5.0, minizinc.result.Status.SATISFIED)}, lower_bound=4)
+    assert result.status == minizinc.result.Status.OPTIMAL_SOLUTION
+    assert result.objective == 4
+
+    # nothing under the upper bound
+    result, _ = _race({'a': ([], 0.01, minizinc.result.Status.UNSATISFIABLE), 'b': ([], 5.0, minizinc.result.Status.UNKNOWN)})
+    assert result.status == minizinc.result.Status.UNSATISFIABLE
+    assert result.solution is None
+    assert result.winner == SolverConfig('a')
+
+def test_race_deadline_and_crash() -> None:
+    result, _ = _race({
+        'crashes': ([], 0.0, minizinc.result.Status.ERROR),
+        'slow': ([8, 7], 0.05, minizinc.result.Status.SATISFIED),
+        'slower': ([8, 7, 6], 10.0, minizinc.result.Status.OPTIMAL_SOLUTION),
+    }, time_limit=0.5)
+    # the time runs out before anyone proves anything, so the best so far wins unproven
+    assert result.status == minizinc.result.Status.SATISFIED
+    assert result.objective == 7
+    assert result.winner == SolverConfig('slow')
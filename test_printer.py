@@ -0,0 +1,31 @@
+from bonds import stretcher_bond
+from brickifier import brickify
+from dependency_graph import brick_list_to_placeable_brick_list
+from printer import colorize, incremental_print_placed_bricks, print_bricks
+
+def test_print_bricks(capsys) -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(2, 1.5), 1.5))
+    placeable_bricks[0].placed_in_stride = 0
+    print_bricks(placeable_bricks)
+    # top course first, each followed by a blank line for the bed joint
+    assert capsys.readouterr().out == (
+        '▒▒▒▒▒▒▒ ▒▒▒ \n\n'
+        + colorize('███', 0) + ' ▒▒▒▒▒▒▒ \n\n'
+    )
+
+def test_incremental_print_placed_bricks(capsys) -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(2, 1.5), 1.5))
+    placement_order = [[placeable_bricks[1], placeable_bricks[0]], [placeable_bricks[3], placeable_bricks[2]]]
+    incremental_print_placed_bricks(placeable_bricks, placement_order, autoplay_rate=1e6)
+
+    out = capsys.readouterr().out
+    wall, updates = out[:out.index('\x1b[')], out[out.index('\x1b['):]
+    assert wall == '▒▒▒▒▒▒▒ ▒▒▒ \n\n▒▒▒ ▒▒▒▒▒▒▒ \n\n'
+    # each update moves up to the brick's line and column, draws it, and comes back down
+    assert updates == (
+        '\x1b[2A\x1b[5G' + colorize('███████', 0) + '\x1b[2B\r'
+        + '\x1b[2A\x1b[1G' + colorize('███', 0) + '\x1b[2B\r'
+        + '\x1b[4A\x1b[9G' + colorize('███', 1) + '\x1b[4B\r'
+        + '\x1b[4A\x1b[1G' + colorize('███████', 1) + '\x1b[4B\r'
+    )
+    assert [placeable_brick.placed_in_stride for placeable_brick in placeable_bricks] == [0, 0, 1, 1]
@@ -0,0 +1,86 @@
+import pytest
+
+from bonds import flemish_bond, stretcher_bond
+from brickifier import brickify_table
+from dependency_graph import PlaceableBrickList, brick_list_to_placeable_brick_list
+from placer import PlacementOrder, apply_placement_order, greedy_placement_order
+from replanning import copy_placed, next_stride, replan_placement_order
+
+def _wall(num_courses: int, stride_height: float = 1300.0, stride_width: int = 800) -> PlaceableBrickList:
+    return brick_list_to_placeable_brick_list(stride_height, stride_width, brickify_table(flemish_bond(num_courses, 5.75), 5.75))
+
+def _place(placement_order: PlacementOrder, first_stride: int = 0) -> None:
+    for _ in apply_placement_order(placement_order, first_stride):
+        pass
+
+def _assert_finishes_wall(placeable_bricks: PlaceableBrickList, placement_order: PlacementOrder) -> None:
+    placed = {placeable_brick for placeable_brick in placeable_bricks if placeable_brick.placed_in_stride is not None}
+    remaining = [placeable_brick for stride in placement_order for placeable_brick in stride]
+    assert len(remaining) == len(set(remaining))
+    assert placed.isdisjoint(remaining)
+    assert placed | set(remaining) == set(placeable_bricks)
+    for stride in placement_order:
+        for placeable_brick in stride:
+            assert placeable_brick.dependencies <= placed
+            assert set(stride) <= placeable_brick.within_same_stride
+            placed.add(placeable_brick)
+
+def test_apply_placement_order_first_stride() -> None:
+    placeable_bricks = brick_list_to_placeable_brick_list(1300.0, 800, brickify_table(stretcher_bond(2, 2.0), 2.0))
+    _place([placeable_bricks[:2], placeable_bricks[2:]], first_stride=3)
+    assert [placeable_brick.placed_in_stride for placeable_brick in placeable_bricks] == [3, 3, 4, 4, 4]
+    assert next_stride(placeable_bricks) == 5
+    with pytest.raises(ValueError):
+        _place([placeable_bricks[:1]])
+
+def test_replan_unchanged_keeps_plan() -> None:
+    placeable_bricks = _wall(12)
+    placement_order = greedy_placement_order(placeable_bricks)
+    _place(placement_order[:2])
+    plan = replan_placement_order(placeable_bricks, placement_order, 1300.0, 800)
+    assert [set(stride) for stride in plan.placement_order] == [set(stride) for stride in placement_order[2:]]
+    _assert_finishes_wall(placeable_bricks, plan.placement_order)
+    assert next_stride(placeable_bricks) == 2
+    _place(plan.placement_order, next_stride(placeable_bricks))
+    assert all(placeable_brick.placed_in_stride is not None for placeable_brick in placeable_bricks)
+
+def test_replan_relays_damaged_brick() -> None:
+    placeable_bricks = _wall(12)
+    placement_order = greedy_placement_order(placeable_bricks)
+    _place(placement_order[:3])
+    # a brick in the top course placed so far has to be laid again
+    damaged = max(placement_order[2], key=lambda placeable_brick: placeable_brick.brick.course_no)
+    damaged.placed_in_stride = None
+    plan = replan_placement_order(placeable_bricks, placement_order, 1300.0, 800)
+    assert plan.placement_order[0] == [damaged]
+    _assert_finishes_wall(placeable_bricks, plan.placement_order)
+
+def test_replan_extra_courses() -> None:
+    placeable_bricks = _wall(12)
+    placement_order = greedy_placement_order(placeable_bricks)
+    _place(placement_order[:2])
+    taller = _wall(20)
+    copy_placed(placeable_bricks, taller)
+    assert next_stride(taller) == 2
+    plan = replan_placement_order(taller, placement_order, 1300.0, 800)
+    _assert_finishes_wall(taller, plan.placement_order)
+    # the rest of the old plan is still valid, so only the new courses were planned again
+    kept = [{placeable_brick.brick for placeable_brick in stride} for stride in plan.placement_order[:len(placement_order) - 2]]
+    assert kept == [{placeable_brick.brick for placeable_brick in stride} for stride in placement_order[2:]]
+
+def test_replan_smaller_strides() -> None:
+    placeable_bricks = _wall(12)
+    placement_order = greedy_placement_order(placeable_bricks)
+    _place(placement_order[:2])
+    # the old strides don't fit in the smaller window, so everything still to place is replanned
+    smaller = _wall(12, stride_height=700.0, stride_width=430)
+    copy_placed(placeable_bricks, smaller)
+    plan = replan_placement_order(smaller, placement_order, 700.0, 430)
+    _assert_finishes_wall(smaller, plan.placement_order)
+    assert plan.num_strides > len(placement_order) - 2
+    assert plan.num_strides >= plan.lower_bound
+
+def test_replan_without_previous_plan() -> None:
+    placeable_bricks = _wall(8)
+    plan = replan_placement_order(placeable_bricks, None, 1300.0, 800)
+    _assert_finishes_wall(placeable_bricks, plan.placement_order)
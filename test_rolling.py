@@ -0,0 +1,58 @@
+import collections.abc as tyc
+
+from bonds import flemish_courses, native_wild_bond, stretcher_courses
+from brickifier import brickify_table
+from dependency_graph import brick_list_to_placeable_brick_list
+from placer import greedy_placement_order, stride_count_lower_bound
+from rolling import RollingStep, rolling_placement_order
+from validation import plan_violations
+
+def _take(courses: tyc.Iterable[list[float]], num_courses: int) -> list[list[float]]:
+    return [course for course, _ in zip(courses, range(num_courses))]
+
+def _strides(steps: tyc.Iterable[RollingStep]) -> list[list[int]]:
+    return [stride for step in steps for stride in step.strides]
+
+def test_rolling_plan_is_valid() -> None:
+    for courses, width, stride_height, stride_width in [
+        (lambda: flemish_courses(5.75), 5.75, 1300.0, 800),
+        (lambda: stretcher_courses(10.0), 10.0, 700.0, 430),
+        (lambda: iter(native_wild_bond(40, 8.0, seed=0)), 8.0, 1300.0, 800),
+    ]:
+        strides = _strides(rolling_placement_order(courses(), 40, width, stride_height, stride_width))
+        table = brickify_table(_take(courses(), 40), width)
+        assert plan_violations(table, strides, stride_height, stride_width) == []
+        placeable_bricks = brick_list_to_placeable_brick_list(stride_height, stride_width, table)
+        assert len(strides) >= stride_count_lower_bound(placeable_bricks, stride_height, stride_width)
+
+def test_rolling_costs_few_strides() -> None:
+    table = brickify_table(_take(flemish_courses(5.75), 60), 5.75)
+    greedy = greedy_placement_order(brick_list_to_placeable_brick_list(1300.0, 800, table))
+    strides = _strides(rolling_placement_order(flemish_courses(5.75), 60, 5.75, 1300.0, 800))
+    assert len(strides) <= len(greedy) + len(greedy) // 4
+
+def test_rolling_steps_are_bounded() -> None:
+    read = 0
+
+    def courses() -> tyc.Iterator[list[float]]:
+        nonlocal read
+        for course in flemish_courses(5.75):
+            read += 1
+            yield course
+
+    steps = rolling_placement_order(courses(), 400, 5.75, 1300.0, 800)
+    first = next(steps)
+    # the first strides only need the first horizon of the wall
+    assert len(first.strides) > 0
+    assert read <= first.end_course <= 2 * 21
+    largest = max([first, *steps], key=lambda step: step.num_bricks)
+    assert read == 400
+    # every step plans about a horizon's worth of bricks, however tall the wall
+    assert largest.num_bricks <= 3 * first.num_bricks
+
+def test_rolling_small_horizon_still_progresses() -> None:
+    # a horizon lower than a stride still commits at least a stride each step
+    table = brickify_table(_take(stretcher_courses(5.0), 15), 5.0)
+    strides = _strides(rolling_placement_order(stretcher_courses(5.0), 15, 5.0, 1300.0, 800, horizon_height=100.0))
+    assert plan_violations(table, strides, 1300.0, 800) == []
+    assert _strides(rolling_placement_order(stretcher_courses(5.0), 0, 5.0, 1300.0, 800)) == []
@@ -0,0 +1,67 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from service import PlanningService, request_plan, serve_socket
+
+def test_handle_reuses_plans() -> None:
+    service = PlanningService(planner='greedy')
+    first = service.handle({'name': 'north', 'bond': 'stretcher', 'width': 5.0, 'num_courses': 10})
+    assert not first['reused']
+    assert first['num_strides'] == len(first['strides']) > 0
+    assert sorted(brick_id for stride in first['strides'] for brick_id in stride) == list(range(sum(len(stride) for stride in first['strides'])))
+
+    # the same wall under another name
+    second = service.handle({'name': 'south', 'bond': 'stretcher', 'width': 5.0, 'num_courses': 10})
+    assert second['reused']
+    assert second['wall']['name'] == 'south'
+    assert second['strides'] == first['strides']
+
+    # but not with other stride sizes
+    third = service.handle({'bond': 'stretcher', 'width': 5.0, 'num_courses': 10, 'stride_height': 700, 'stride_width': 430})
+    assert not third['reused']
+    assert third['wall']['name'] == 'wall'
+
+def test_handle_line_errors() -> None:
+    service = PlanningService(planner='greedy')
+    assert 'error' in json.loads(service.handle_line('not json'))
+    assert 'error' in json.loads(service.handle_line(json.dumps({'bond': 'herringbone', 'width': 5.0, 'num_courses': 10})))
+    assert 'error' in json.loads(service.handle_line(json.dumps({'bond': 'stretcher', 'width': 5.0, 'num_courses': 10, 'planner': 'psychic'})))
+    assert 'error' in json.loads(service.handle_line(json.dumps({'bond': 'stretcher', 'width': 5.0})))
+
+def test_serve_stdio() -> None:
+    requests = io.StringIO(
+        json.dumps({'name': 'a', 'bond': 'flemish', 'width': 5.75, 'num_courses': 10}) + '\n\n'
+        + json.dumps({'name': 'b', 'bond': 'wild', 'width': 5.0, 'num_courses': 10, 'wild_generator': 'native', 'seed': 3}) + '\n'
+    )
+    responses = io.StringIO()
+    PlanningService(planner='greedy').serve_stdio(requests, responses)
+    lines = responses.getvalue().splitlines()
+    assert [json.loads(line)['wall']['name'] for line in lines] == ['a', 'b']
+
+def test_socket_round_trip() -> None:
+    # Unix socket paths have to be short, which pytest's tmp_path isn't always
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'planner.sock')
+        with serve_socket(PlanningService(planner='greedy'), path) as server:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                request = {'bond': 'cross', 'width': 5.5, 'num_courses': 10}
+                first = request_plan(path, request)
+                second = request_plan(path, request)
+                assert first['num_strides'] > 0 and not first['reused']
+                assert second['reused'] and second['strides'] == first['strides']
+                assert 'error' in request_plan(path, {'bond': 'cross'})
+            finally:
+                server.shutdown()
+                thread.join()
+
+def test_no_minizinc_until_solving() -> None:
+    # the greedy planner and the rest of the command line shouldn't pay for importing minizinc
+    code = "import sys, main, batch, service; assert 'minizinc' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
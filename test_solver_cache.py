@@ -0,0 +1,50 @@
+from datetime import timedelta
+import os
+
+from solver_cache import SolverCache
+
+def test_round_trip(tmp_path) -> None:
+    cache = SolverCache(str(tmp_path))
+    key = cache.key("strides.mzn", "gecode", {'n_bricks': 3}, timedelta(seconds=20))
+    assert cache.get(key) is None
+    cache.put(key, {'stride': [1, 1, 2]})
+    assert cache.get(key) == {'stride': [1, 1, 2]}
+
+def test_key_covers_params() -> None:
+    cache = SolverCache()
+    key = cache.key("strides.mzn", "gecode", {'n_bricks': 3}, timedelta(seconds=20))
+    assert key == cache.key("strides.mzn", "gecode", {'n_bricks': 3}, timedelta(seconds=20))
+    assert key != cache.key("strides.mzn", "gecode", {'n_bricks': 4}, timedelta(seconds=20))
+    assert key != cache.key("strides.mzn", "gecode", {'n_bricks': 3}, timedelta(seconds=10))
+    assert key != cache.key("strides.mzn", "chuffed", {'n_bricks': 3}, timedelta(seconds=20))
+    assert key != cache.key("strides_positional.mzn", "gecode", {'n_bricks': 3}, timedelta(seconds=20))
+    assert key == cache.key(["strides.mzn"], "gecode", {'n_bricks': 3}, timedelta(seconds=20))
+    assert key != cache.key(["strides.mzn", "strides_positional.mzn"], "gecode", {'n_bricks': 3}, timedelta(seconds=20))
+
+def test_modes(tmp_path) -> None:
+    SolverCache(str(tmp_path)).put('a', {'x': 1})
+
+    assert SolverCache(str(tmp_path), mode='bypass').get('a') is None
+    SolverCache(str(tmp_path), mode='bypass').put('b', {'x': 2})
+    assert SolverCache(str(tmp_path)).get('b') is None
+
+    refresh_cache = SolverCache(str(tmp_path), mode='refresh')
+    assert refresh_cache.get('a') is None
+    refresh_cache.put('a', {'x': 3})
+    assert SolverCache(str(tmp_path)).get('a') == {'x': 3}
+
+def test_eviction(tmp_path) -> None:
+    entry_size = len('{"padding": "' + 'x' * 50 + '"}')
+    cache = SolverCache(str(tmp_path), max_bytes=4 * entry_size)
+    for i in range(4):
+        cache.put(str(i), {'padding': 'x' * 50})
+        # make sure the mtimes are distinct and ordered
+        os.utime(tmp_path / f"{i}.json", (i, i))
+    # reading an entry makes it recently used
+    assert cache.get('0') is not None
+    cache.put('4', {'padding': 'x' * 50})
+
+    assert len(list(tmp_path.iterdir())) == 4
+    assert cache.get('0') is not None
+    assert cache.get('4') is not None
+    assert cache.get('1') is None
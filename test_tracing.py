@@ -0,0 +1,50 @@
+from datetime import timedelta
+import json
+
+from bonds import stretcher_bond
+from brickifier import brickify
+from dependency_graph import brick_list_to_placeable_brick_list
+import tracing
+
+def test_spans_and_counters(tmp_path) -> None:
+    # nothing is recorded unless tracing, but spans are still timed
+    with tracing.span('untraced') as untraced:
+        pass
+    assert untraced.seconds >= 0
+
+    tracer = tracing.start_tracing()
+    try:
+        with tracing.span('outer', bricks=3) as outer:
+            with tracing.span('inner'):
+                tracing.counter('objective', objective=5)
+            outer.args['strides'] = 2
+        tracing.solver_statistics('statistics', {'nodes': 10, 'flatTime': timedelta(milliseconds=1500)})
+    finally:
+        assert tracing.stop_tracing() is tracer
+    assert not tracing.is_tracing()
+
+    events = {event['name']: event for event in tracer.events}
+    assert [event['name'] for event in tracer.events] == ['objective', 'inner', 'outer', 'statistics']
+    assert events['outer']['ph'] == 'X'
+    assert events['outer']['args'] == {'bricks': 3, 'strides': 2}
+    assert events['outer']['ts'] <= events['inner']['ts'] <= events['objective']['ts']
+    assert events['outer']['dur'] >= events['inner']['dur']
+    assert events['objective']['ph'] == 'C'
+    assert events['statistics']['args'] == {'nodes': 10, 'flatTime': 1.5}
+
+    tracer.write(str(tmp_path / 'trace.json'))
+    with open(tmp_path / 'trace.json') as trace_file:
+        assert json.load(trace_file)['traceEvents'] == tracer.events
+    tracer.write(str(tmp_path / 'trace.jsonl'))
+    with open(tmp_path / 'trace.jsonl') as trace_file:
+        assert [json.loads(line) for line in trace_file] == tracer.events
+
+def test_dependency_graph_counts() -> None:
+    tracer = tracing.start_tracing()
+    try:
+        brick_list_to_placeable_brick_list(1300.0, 800, brickify(stretcher_bond(2, 2.0), 2.0))
+    finally:
+        tracing.stop_tracing()
+    [event] = tracer.events
+    # each brick of the second course sits on two of the first, and the whole wall fits in a stride
+    assert event['args'] == {'bricks': 5, 'dependency_edges': 4, 'same_stride_pairs': 10}
@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from bonds import cross_bond, flemish_bond, native_wild_bond, stretcher_bond
+from brickifier import brickify_table
+from dependency_graph import PlaceableBrickList, brick_list_to_placeable_brick_list
+from placer import PlacementOrder, apply_placement_order, greedy_placement_order
+from replanning import copy_placed, replan_placement_order
+from validation import placement_order_violations, plan_violations, wild_bond_violations
+
+# Fuzzing is seeded, so that a failure can be reproduced, and each case says what it was. Walls are
+# up to a few thousand bricks.
+_FUZZ_SEED = 2024
+_FUZZ_CASES = 8
+# the native wild bond is checked at every width from 0.5 up to this many quarter bricks
+_FUZZ_WILD_MAX_WIDTH_QUARTERS = 32
+_FUZZ_WILD_SEEDS = 3
+
+def _random_wall(rng: random.Random) -> tuple[str, float, int, float, int]:
+    """(bond, width, number of courses, stride height, stride width)"""
+    bond = rng.choice(['stretcher', 'flemish', 'cross', 'wild'])
+    if bond == 'stretcher':
+        width = rng.randint(2, 60) / 2
+    elif bond == 'flemish':
+        width = 1.25 + 1.5 * rng.randint(1, 20)
+    elif bond == 'cross':
+        width = 1.5 + rng.randint(0, 30)
+    else:
+        width = rng.randint(2, 100) / 4
+    # windows from about the smallest that fits every brick to several times the original one
+    return bond, width, rng.randint(5, 100), rng.uniform(120.0, 3000.0), rng.randint(220, 2500)
+
+def _bond(bond: str, width: float, num_courses: int, seed: int) -> list[list[float]]:
+    if bond == 'wild':
+        return native_wild_bond(num_courses, width, seed=seed)
+    return {'stretcher': stretcher_bond, 'flemish': flemish_bond, 'cross': cross_bond}[bond](num_courses, width)
+
+def _ids(placement_order: PlacementOrder) -> list[list[int]]:
+    return [[placeable_brick.brick_id for placeable_brick in stride] for stride in placement_order]
+
+def _wall(bond: str = 'flemish', width: float = 5.75, num_courses: int = 12, stride_height: float = 1300.0, stride_width: int = 800) -> PlaceableBrickList:
+    return brick_list_to_placeable_brick_list(stride_height, stride_width, brickify_table(_bond(bond, width, num_courses, 0), width))
+
+def test_plan_violations_catches_mistakes() -> None:
+    placeable_bricks = _wall()
+    table = placeable_bricks[0].table
+    assert table is not None
+    strides = _ids(greedy_placement_order(placeable_bricks))
+    assert plan_violations(table, strides, 1300.0, 800) == []
+
+    # strides in the wrong order put bricks before the ones they rest on
+    assert any("rests on" in violation for violation in plan_violations(table, strides[::-1], 1300.0, 800))
+    # within a stride too
+    assert any("rests on" in violation for violation in plan_violations(table, [stride[::-1] for stride in strides], 1300.0, 800))
+    # a brick left out, and one placed twice
+    assert any("never placed" in violation for violation in plan_violations(table, [strides[0][1:], *strides[1:]], 1300.0, 800))
+    assert any("twice" in violation for violation in plan_violations(table, [*strides, strides[0][:1]], 1300.0, 800))
+    # the strides don't fit a smaller window
+    assert any("window" in violation for violation in plan_violations(table, strides, 200.0, 800))
+    assert any("window" in violation for violation in plan_violations(table, strides, 1300.0, 400))
+    # everything in one stride
+    assert any("window" in violation for violation in plan_violations(table, [[brick_id for stride in strides for brick_id in stride]], 1300.0, 800))
+    assert any("empty" in violation for violation in plan_violations(table, [*strides, []], 1300.0, 800))
+    assert len(plan_violations(table, strides[::-1], 1300.0, 800, max_violations=3)) == 3
+
+def test_placement_order_violations_partly_built() -> None:
+    placeable_bricks = _wall()
+    placement_order = greedy_placement_order(placeable_bricks)
+    for _ in apply_placement_order(placement_order[:2]):
+        pass
+    assert placement_order_violations(placeable_bricks, placement_order[2:], 1300.0, 800) == []
+    assert any("already placed" in violation for violation in placement_order_violations(placeable_bricks, placement_order[1:], 1300.0, 800))
+    assert any("never placed" in violation for violation in placement_order_violations(placeable_bricks, placement_order[3:], 1300.0, 800))
+    with pytest.raises(ValueError):
+        placement_order_violations(placeable_bricks[1:], placement_order[2:], 1300.0, 800)
+
+def test_wild_bond_violations_catches_mistakes() -> None:
+    bond = native_wild_bond(20, 5.0, seed=0)
+    assert wild_bond_violations(bond, 5.0) == []
+    # wrong parity, off the end of the wall, and not on a quarter brick
+    assert len(wild_bond_violations([[0.25], *bond[1:]], 5.0)) > 0
+    assert len(wild_bond_violations([[*bond[0], 5.0], *bond[1:]], 5.0)) > 0
+    assert len(wild_bond_violations([[0.6], *bond[1:]], 5.0)) > 0
+    # a brick longer than a stretcher
+    assert any("longer than a stretcher" in violation for violation in wild_bond_violations([[0.5, 4.5], *bond[1:]], 5.0))
+    assert any("longer than a stretcher" in violation for violation in wild_bond_violations([[], *bond[1:]], 5.0))
+    # two half bricks next to each other
+    assert any("half bricks" in violation for violation in wild_bond_violations([[0.5, 1.0, 1.5, 2.5, 3.5, 4.5]], 5.0))
+    # the same joint in every course, less the quarter offset of every other course, is the vertical
+    # anti-pattern, and shifting it a quarter every course is the diagonal one
+    assert any("anti-pattern" in violation for violation in wild_bond_violations([[1.0, 2.0, 3.0, 4.0] if row % 2 == 0 else [0.75, 1.75, 2.75, 3.75] for row in range(5)], 5.0))
+    assert any("anti-pattern" in violation for violation in wild_bond_violations([[joint + row / 4 for joint in [0.5, 1.5, 2.5, 3.5]] for row in range(5)], 5.0))
+    # narrow walls have no stretcher-length windows, so anything goes
+    assert wild_bond_violations([[], [0.25], []], 1.0) == []
+
+def test_fuzz_greedy_plans() -> None:
+    rng = random.Random(_FUZZ_SEED)
+    for case in range(_FUZZ_CASES):
+        bond, width, num_courses, stride_height, stride_width = _random_wall(rng)
+        description = f"case {case}: {bond} bond {width}x{num_courses}, stride {stride_height:.0f}x{stride_width}"
+        placeable_bricks = _wall(bond, width, num_courses, stride_height, stride_width)
+        placement_order = greedy_placement_order(placeable_bricks, stride_height, stride_width)
+        assert placement_order_violations(placeable_bricks, placement_order, stride_height, stride_width) == [], description
+
+        # part way through, the stride size changes
+        for _ in apply_placement_order(placement_order[:rng.randint(0, len(placement_order))]):
+            pass
+        new_stride_height, new_stride_width = rng.uniform(120.0, 3000.0), rng.randint(220, 2500)
+        rebuilt = _wall(bond, width, num_courses, new_stride_height, new_stride_width)
+        copy_placed(placeable_bricks, rebuilt)
+        plan = replan_placement_order(rebuilt, placement_order, new_stride_height, new_stride_width)
+        assert placement_order_violations(rebuilt, plan.placement_order, new_stride_height, new_stride_width) == [], f"{description}, replanned with stride {new_stride_height:.0f}x{new_stride_width}"
+
+def test_fuzz_native_wild_bond() -> None:
+    # every width up to a few stretchers rather than a random few, since the narrow walls are where
+    # the rules run into the ends of the wall, and a few seeds each
+    rng = random.Random(_FUZZ_SEED)
+    for width_quarters in range(2, _FUZZ_WILD_MAX_WIDTH_QUARTERS + 1):
+        width = width_quarters / 4
+        for _ in range(_FUZZ_WILD_SEEDS):
+            num_courses, seed = rng.randint(1, 60), rng.randrange(1000)
+            bond = native_wild_bond(num_courses, width, seed=seed)
+            assert len(bond) == num_courses
+            assert wild_bond_violations(bond, width) == [], f"{width}x{num_courses} with seed {seed}"
@@ -0,0 +1,131 @@
+# Structured tracing of where the time goes: timed spans for each stage of the pipeline, counters
+# (eg the solver's objective over time) and instant events with solver statistics, written out as
+# either Chrome trace format (open it in chrome://tracing or https://ui.perfetto.dev) or JSON lines.
+#
+# There's one global tracer, like the logging module's root logger, so that the stages don't all
+# need to pass one around. Spans are always timed, so code can use them instead of time.time() for
+# its own progress messages, but nothing is recorded unless tracing was started, eg with --trace.
+# Worker processes (eg in the decomposed planner) don't inherit it, so their stages aren't traced.
+
+from __future__ import annotations
+
+import asyncio
+import collections.abc as tyc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+import json
+import os
+import threading
+import time
+import typing as ty
+
+if ty.TYPE_CHECKING:
+    import minizinc
+
+# One event in Chrome trace format, which is also what goes on each line in JSON lines format
+TraceEvent: ty.TypeAlias = dict[str, ty.Any]
+
+class Tracer:
+    def __init__(self) -> None:
+        self.events: list[TraceEvent] = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def timestamp(self, perf_counter: float | None = None) -> float:
+        """Microseconds since the tracer started, which is the unit of Chrome trace timestamps"""
+        if perf_counter is None:
+            perf_counter = time.perf_counter()
+        return (perf_counter - self._start) * 1e6
+
+    def add(self, name: str, phase: str, timestamp: float, **fields: ty.Any) -> None:
+        event = {'name': name, 'ph': phase, 'ts': round(timestamp, 1), 'pid': os.getpid(), 'tid': threading.get_ident(), **fields}
+        with self._lock:
+            self.events.append(event)
+
+    def write(self, path: str) -> None:
+        """Chrome trace format if `path` ends in .json, otherwise one JSON event per line"""
+        with open(path, 'w') as trace_file:
+            if path.endswith('.json'):
+                json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, trace_file)
+            else:
+                for event in self.events:
+                    trace_file.write(json.dumps(event) + '\n')
+
+_tracer: Tracer | None = None
+
+def start_tracing() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+def stop_tracing() -> Tracer | None:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+def is_tracing() -> bool:
+    """Whether events are being recorded, for callers to skip work that's only needed for a trace"""
+    return _tracer is not None
+
+@dataclass
+class Span:
+    name: str
+    # shown alongside the span in the trace; can be added to until the span ends
+    args: dict[str, ty.Any] = field(default_factory=dict)
+    # set once the span has ended
+    seconds: float = 0.0
+
+@contextmanager
+def span(name: str, **args: ty.Any) -> tyc.Iterator[Span]:
+    """Time a stage. The yielded `Span` has its duration in `seconds` once the block is done."""
+    current = Span(name, args)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        end = time.perf_counter()
+        current.seconds = end - start
+        tracer = _tracer
+        if tracer is not None:
+            tracer.add(name, 'X', tracer.timestamp(start), dur=round((end - start) * 1e6, 1), args=current.args)
+
+def counter(name: str, **values: float) -> None:
+    """Record the current value of one or more series, eg a solver's objective"""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.add(name, 'C', tracer.timestamp(), args=values)
+
+def instant(name: str, **args: ty.Any) -> None:
+    tracer = _tracer
+    if tracer is not None:
+        tracer.add(name, 'i', tracer.timestamp(), s='g', args=args)
+
+def solver_statistics(name: str, statistics: dict[str, ty.Any]) -> None:
+    """Record minizinc's statistics (flatten time, nodes, failures, ...) as an instant event"""
+    if is_tracing():
+        instant(name, **{key: value.total_seconds() if isinstance(value, timedelta) else value for key, value in statistics.items()})
+
+def solve(instance: minizinc.Instance, name: str, **kwargs: ty.Any) -> minizinc.Result:
+    """
+    Like `instance.solve(**kwargs)` for an optimization problem, but traces the objective of each
+    intermediate solution as a counter called `name`, and the final statistics.
+    """
+    import minizinc
+
+    async def solve_streaming() -> minizinc.Result:
+        status = minizinc.result.Status.UNKNOWN
+        solution = None
+        statistics: dict[str, ty.Any] = {}
+        async for result in instance.solutions(intermediate_solutions=True, **kwargs):
+            status = result.status
+            statistics.update(result.statistics)
+            if result.solution is not None:
+                solution = result.solution
+                if result.objective is not None:
+                    counter(name, objective=result.objective)
+        return minizinc.Result(status, solution, statistics)
+
+    result = asyncio.run(solve_streaming())
+    solver_statistics(f"{name} statistics", result.statistics)
+    return result
@@ -0,0 +1,169 @@
+# Independent checks of what the planners and bond generators produce, straight from the geometry
+# rather than from the dependency graph or the models they used, so a bug in either of those shows
+# up too. Both checks are linear in the size of the wall, so they can be run on walls of thousands
+# of bricks, eg in the fuzz tests in test_validation.py.
+#
+# They return a list of what's wrong rather than raising on the first problem, and stop looking
+# after `max_violations`, since one mistake in a plan usually causes many more after it.
+
+from array import array
+import collections.abc as tyc
+import typing as ty
+
+from brickifier import BrickTable
+from dependency_graph import PlaceableBrickList
+from placer import PlacementOrder
+
+_MAX_VIOLATIONS: ty.Final = 20
+
+def plan_violations(
+        table: BrickTable,
+        strides: tyc.Sequence[tyc.Sequence[int]],
+        stride_height: float,
+        stride_width: int,
+        already_placed: tyc.Iterable[int] = (),
+        max_violations: int = _MAX_VIOLATIONS,
+) -> list[str]:
+    """
+    Everything wrong with a plan for the bricks of the `table`, given as the brick ids in each
+    stride in placement order: every brick that isn't `already_placed` has to be placed exactly
+    once, each stride has to fit in the stride window, and every brick has to come after the bricks
+    it rests on, ie the bricks of the course below that it overlaps.
+    """
+    violations: list[str] = []
+    num_bricks = len(table)
+    # the position of each brick in the whole plan, or -1 if it isn't in it
+    position_of = array('q', [-1]) * num_bricks
+    placed_before = array('b', [0]) * num_bricks
+    for brick_id in already_placed:
+        placed_before[brick_id] = 1
+
+    position = 0
+    for stride_no, stride in enumerate(strides):
+        if len(stride) == 0:
+            violations.append(f"stride {stride_no} is empty")
+            continue
+        for brick_id in stride:
+            if not 0 <= brick_id < num_bricks:
+                violations.append(f"stride {stride_no} has brick {brick_id}, which isn't in the wall")
+            elif placed_before[brick_id]:
+                violations.append(f"brick {brick_id} in stride {stride_no} was already placed")
+            elif position_of[brick_id] != -1:
+                violations.append(f"brick {brick_id} in stride {stride_no} is placed twice")
+            else:
+                position_of[brick_id] = position
+                position += 1
+        brick_ids = [brick_id for brick_id in stride if 0 <= brick_id < num_bricks]
+        if len(brick_ids) > 0:
+            span_x = max(table.real_right_x[brick_id] for brick_id in brick_ids) - min(table.real_left_x[brick_id] for brick_id in brick_ids)
+            span_y = max(table.real_top_y[brick_id] for brick_id in brick_ids) - min(table.real_bottom_y[brick_id] for brick_id in brick_ids)
+            if span_x > stride_width or span_y > stride_height:
+                violations.append(f"stride {stride_no} spans {span_x}x{span_y:g}mm, more than the {stride_width}x{stride_height:g}mm window")
+        if len(violations) >= max_violations:
+            return violations[:max_violations]
+
+    missing = [brick_id for brick_id in range(num_bricks) if position_of[brick_id] == -1 and not placed_before[brick_id]]
+    if len(missing) > 0:
+        violations.append(f"{len(missing)} bricks are never placed, eg {missing[:5]}")
+
+    # The table is bottom-up and left-to-right, so each course is a run of ids sorted by x, and the
+    # overlapping pairs of bricks in neighbouring courses come out of a merge of the two courses,
+    # like merging two sorted lists.
+    course_starts = [0] + [brick_id for brick_id in range(1, num_bricks) if table.course_no[brick_id] != table.course_no[brick_id - 1]] + [num_bricks]
+    for below_start, start, end in zip(course_starts, course_starts[1:], course_starts[2:]):
+        if table.course_no[start] != table.course_no[below_start] + 1:
+            continue
+        below, above = below_start, start
+        while below < start and above < end:
+            if max(table.real_left_x[below], table.real_left_x[above]) <= min(table.real_right_x[below], table.real_right_x[above]):
+                if (not placed_before[above] and not placed_before[below]
+                        and position_of[above] != -1 and position_of[below] != -1 and position_of[below] > position_of[above]):
+                    violations.append(f"brick {above} is placed before brick {below}, which it rests on")
+                    if len(violations) >= max_violations:
+                        return violations
+            # whichever brick ends first can't overlap anything further along the other course
+            if table.real_right_x[below] < table.real_right_x[above]:
+                below += 1
+            else:
+                above += 1
+    return violations[:max_violations]
+
+def placement_order_violations(
+        placeable_brick_list: PlaceableBrickList,
+        placement_order: PlacementOrder,
+        stride_height: float,
+        stride_width: int,
+        max_violations: int = _MAX_VIOLATIONS,
+) -> list[str]:
+    """
+    `plan_violations` for a `PlacementOrder` of the bricks of a wall, before it's applied. The
+    bricks that are already placed (eg when it's the rest of a partly built wall, see
+    replanning.py) mustn't be in it, and all the others must. The bricks need to come from one
+    `BrickTable`, like the ones from `brick_list_to_placeable_brick_list`.
+    """
+    tables = {id(placeable_brick.table): placeable_brick.table for placeable_brick in placeable_brick_list}
+    if len(tables) != 1 or None in tables.values() or len(next(iter(tables.values()))) != len(placeable_brick_list):
+        raise ValueError("The bricks of the wall need to be all the bricks of one BrickTable")
+    table, = tables.values()
+    assert table is not None
+    return plan_violations(
+        table,
+        [[placeable_brick.brick_id for placeable_brick in stride] for stride in placement_order],
+        stride_height,
+        stride_width,
+        already_placed=[placeable_brick.brick_id for placeable_brick in placeable_brick_list if placeable_brick.placed_in_stride is not None],
+        max_violations=max_violations,
+    )
+
+# (course offset, position offset) of the other four joints of each anti-pattern in wild.mzn, from
+# its joint in the bottom course, and the lowest position and highest position (counting back from
+# the last) of that joint
+_WILD_ANTI_PATTERNS: tyc.Sequence[tuple[tuple[tuple[int, int], ...], int, int]] = (
+    # vertical, with initial movement to the left and to the right
+    (((1, -1), (2, 0), (3, -1), (4, 0)), 3, 0),
+    (((1, 1), (2, 0), (3, 1), (4, 0)), 1, -1),
+    # diagonal, to the left and to the right
+    (((1, -1), (2, -2), (3, -3), (4, -4)), 5, 0),
+    (((1, 1), (2, 2), (3, 3), (4, 4)), 1, -4),
+)
+
+def wild_bond_violations(bond: list[list[float]], width: float, max_violations: int = _MAX_VIOLATIONS) -> list[str]:
+    """
+    Everything about the `bond` (head joint positions of each course, bottom first) that breaks the
+    rules of wild.mzn. Positions are checked as quarter bricks, where position j is a joint at
+    relative x j/4.
+    """
+    violations: list[str] = []
+    last_index = int(width * 4) - 2
+    courses: list[set[int]] = []
+    for row, course in enumerate(bond):
+        joints: set[int] = set()
+        for joint in course:
+            position = round(joint * 4)
+            if position != joint * 4 or not 1 <= position <= last_index or position % 2 != row % 2:
+                violations.append(f"course {row} has a head joint at {joint}, which isn't a valid position in that course")
+            joints.add(position)
+        if len(joints) != len(course):
+            violations.append(f"course {row} has the same head joint twice")
+        courses.append(joints)
+    if len(violations) >= max_violations:
+        return violations[:max_violations]
+
+    for row, joints in enumerate(courses):
+        # every stretcher-length window (5 positions) has a joint, so no brick is longer than a
+        # stretcher, ie there are at most 4 positions without a joint between consecutive joints,
+        # or between a joint and the first or last position
+        window_joints = sorted(position for position in joints if 1 <= position <= last_index)
+        for previous, position in zip([0] + window_joints, window_joints + [last_index + 1]):
+            if position - previous - 1 >= 5:
+                violations.append(f"course {row} has no head joint from {(previous + 1) / 4} to {(position - 1) / 4}, so a brick is longer than a stretcher")
+        for position in joints:
+            if position + 2 in joints and position + 4 in joints:
+                violations.append(f"course {row} has two half bricks next to each other at {position / 4}")
+            for others, lowest, highest_from_last in _WILD_ANTI_PATTERNS:
+                if (lowest <= position <= last_index + highest_from_last and row + 4 < len(courses)
+                        and all(position + position_offset in courses[row + course_offset] for course_offset, position_offset in others)):
+                    violations.append(f"courses {row} to {row + 4} have an anti-pattern starting at {position / 4}")
+        if len(violations) >= max_violations:
+            return violations[:max_violations]
+    return violations